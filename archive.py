@@ -0,0 +1,515 @@
+"""
+Cold archive of closed months of the ledger.
+
+`transactions` only ever grows, and every as-of query scans it. `LedgerArchive.archive`
+moves the transactions of the months before a cutoff out of the hot table into immutable
+columnar partitions, one directory of NumPy `.npy` files per month:
+
+    ledger_archive/
+        manifest.json
+        2025-01.0/
+            id.npy  item.npy  transaction_type.npy  units.npy  units_null.npy  price.npy
+            transaction_day.npy  items.npy  <per-item totals>.npy
+
+Each partition carries its per-item net units and sales, pre-aggregated when it is written,
+and its cash total, recorded in the manifest. An as-of read therefore never touches the rows
+of a month that ends before the as-of date; only the month containing it is read, through
+memory-mapped arrays.
+
+`ArchivedStorage` puts an archive in front of a storage backend (see `storage.py`): reads
+combine the archive with the hot table, writes go to the hot table, and `transactions_after`
+includes archived transactions, so event replays and warehouse partitioning still see the
+whole ledger. Archived transactions are immutable, so rolling back below them is refused.
+
+    archive = LedgerArchive("ledger_archive")
+    archive.archive(get_data_access(), "2025-04-01")   # moves January to March
+
+Run `python archive.py --before 2025-04-01` to archive the shared database.
+"""
+
+import json
+import os
+import shutil
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ledger_dates import day_number, day_numbers, iso_dates, month_days
+from logging_config import get_logger
+from storage import TRANSACTION_TYPES, StorageBackend
+
+# Partitions and the manifest are written here by default
+ARCHIVE_DIR = "ledger_archive"
+
+MANIFEST_FILE = "manifest.json"
+
+# Layout of the partitions, recorded in the manifest; 2 stores dates as day numbers
+ARCHIVE_FORMAT = 2
+
+# As-of dates whose archived totals are kept before the cache is cleared
+TOTALS_CACHE_SIZE = 1024
+
+log = get_logger("db")
+
+_STOCK_ORDER, _SALE = TRANSACTION_TYPES.index("stock_orders"), TRANSACTION_TYPES.index("sales")
+
+# Row columns of a partition, read through memory maps
+_COLUMNS = ("id", "item", "transaction_type", "units", "units_null", "price", "transaction_day")
+
+# Totals per item slot (slot 0 holds transactions without an item)
+_TOTALS = ("item_rows", "unit_rows", "net_units", "sales_rows", "sales_unit_rows", "sales_units", "sales_revenue")
+
+
+def _aggregate(columns: Dict[str, np.ndarray], slots: int) -> Tuple[Dict[str, np.ndarray], float]:
+    # Per-slot totals and the cash total of the given rows
+    slot = columns["item"].astype(np.int64) + 1
+    types = columns["transaction_type"]
+    units = columns["units"]
+    prices = columns["price"]
+    has_units = ~columns["units_null"]
+    sales = types == _SALE
+
+    def count(mask=None, weights=None):
+        selected = slot if mask is None else slot[mask]
+        if weights is not None and mask is not None:
+            weights = weights[mask]
+        return np.bincount(selected, weights=weights, minlength=slots)
+
+    net_units = np.where(types == _STOCK_ORDER, units, np.where(sales, -units, 0))
+    totals = {
+        "item_rows": count(),
+        "unit_rows": count(weights=has_units),
+        "net_units": count(weights=net_units),
+        "sales_rows": count(sales),
+        "sales_unit_rows": count(sales, has_units),
+        "sales_units": count(sales, units),
+        "sales_revenue": count(sales, prices),
+    }
+    totals = {name: values if name == "sales_revenue" else values.astype(np.int64) for name, values in totals.items()}
+    cash = float(np.where(sales, prices, np.where(types == _STOCK_ORDER, -prices, 0.0)).sum())
+    return totals, cash
+
+
+class ArchivePartition:
+    """
+    Archived transactions dated in one month.
+
+    A month archived in several runs, e.g. after a backdated transaction, has one partition per run.
+    """
+
+    def __init__(self, directory: str, name: str, month: str, rows: int, min_id: int, max_id: int, cash: float):
+        self.path = os.path.join(directory, name)
+        self.name = name
+        self.month = month
+        self.rows = rows
+        self.min_id = min_id
+        self.max_id = max_id
+        self.cash = cash
+        self.first_day, self.last_day = month_days(month)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._items: Optional[List[str]] = None
+        self._totals: Optional[Dict[str, np.ndarray]] = None
+
+    @classmethod
+    def write(cls, directory: str, name: str, month: str, transactions: List[Tuple]) -> "ArchivePartition":
+        """Write `transactions` (as returned by `transactions_after`) as a new partition."""
+        items = sorted({item_name for _, item_name, _, _, _, _ in transactions if item_name is not None})
+        codes = {item_name: code for code, item_name in enumerate(items)}
+        columns = {
+            "id": np.array([row[0] for row in transactions], dtype=np.int64),
+            "item": np.array([-1 if row[1] is None else codes[row[1]] for row in transactions], dtype=np.int32),
+            "transaction_type": np.array([TRANSACTION_TYPES.index(row[2]) for row in transactions], dtype=np.int8),
+            "units": np.array([row[3] or 0 for row in transactions], dtype=np.int64),
+            "units_null": np.array([row[3] is None for row in transactions], dtype=np.bool_),
+            "price": np.array([row[4] for row in transactions], dtype=np.float64),
+            "transaction_day": day_numbers([row[5] for row in transactions]).astype(np.int32),
+        }
+        totals, cash = _aggregate(columns, len(items) + 1)
+
+        # Written aside and renamed into place, so a partition is either complete or absent
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column_name, values in {**columns, **totals, "items": np.array(items, dtype=str)}.items():
+            np.save(os.path.join(tmp_path, f"{column_name}.npy"), values)
+        os.replace(tmp_path, path)
+        return cls(directory, name, month, len(transactions), int(columns["id"].min()), int(columns["id"].max()), cash)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name, "month": self.month, "rows": self.rows,
+            "min_id": self.min_id, "max_id": self.max_id, "cash": self.cash,
+        }
+
+    def column(self, name: str) -> np.ndarray:
+        """A row column, memory-mapped on first use."""
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return column
+
+    @property
+    def items(self) -> List[str]:
+        """Item names, indexed by the `item` column."""
+        if self._items is None:
+            self._items = np.load(os.path.join(self.path, "items.npy")).tolist()
+        return self._items
+
+    def totals(self, as_of_date: str) -> Tuple[Optional[Dict[str, np.ndarray]], float]:
+        """
+        Per-slot totals and cash of the transactions on or before `as_of_date`, or (None, 0.0) if there are none.
+        """
+        as_of_day = day_number(as_of_date)
+        if as_of_day < self.first_day:
+            return None, 0.0
+        if as_of_day >= self.last_day:
+            # The whole month is on or before the date
+            if self._totals is None:
+                self._totals = {name: np.load(os.path.join(self.path, f"{name}.npy")) for name in _TOTALS}
+            return self._totals, self.cash
+
+        mask = self.column("transaction_day") <= as_of_day
+        if not mask.any():
+            return None, 0.0
+        return _aggregate({name: self.column(name)[mask] for name in _COLUMNS}, len(self.items) + 1)
+
+    def transactions_after(self, transaction_id: int) -> List[Tuple]:
+        """(id, item_name, transaction_type, units, price, transaction_date) of rows with an ID above `transaction_id`."""
+        if self.max_id <= transaction_id:
+            return []
+        rows = np.flatnonzero(self.column("id") > transaction_id)
+        items = self.items
+        columns = {name: self.column(name)[rows].tolist() for name in _COLUMNS if name != "transaction_day"}
+        columns["transaction_day"] = iso_dates(self.column("transaction_day")[rows]).tolist()
+        return [
+            (
+                row_id, None if item < 0 else items[item], TRANSACTION_TYPES[transaction_type],
+                None if units_null else units, price, transaction_date,
+            )
+            for row_id, item, transaction_type, units, units_null, price, transaction_date in zip(
+                *(columns[name] for name in _COLUMNS)
+            )
+        ]
+
+
+class LedgerArchive:
+    """
+    The archived partitions in `directory`.
+
+    The manifest is re-read whenever another process changes it, so a long-running reader
+    picks up partitions archived while it runs.
+
+    Args:
+        directory (str, optional): Where partitions and the manifest live. Default is `ARCHIVE_DIR`.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self.partitions: List[ArchivePartition] = []
+        self._manifest_stamp: Optional[Tuple[int, int]] = None
+        # `totals` results per (manifest stamp, as-of day), dropped whenever the manifest changes
+        self._totals_cache: Dict[Tuple[Optional[Tuple[int, int]], int], Tuple[Dict[Optional[str], np.ndarray], float]] = {}
+        self.refresh()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def refresh(self) -> None:
+        """
+        Reload the manifest if it changed since it was last read.
+
+        Raises:
+            ValueError: If the archive was written in an older `ARCHIVE_FORMAT`.
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            self.partitions = []
+            self._manifest_stamp = None
+            self._totals_cache.clear()
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return
+        self._totals_cache.clear()
+        with open(self.manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format", 1) != ARCHIVE_FORMAT:
+            raise ValueError(
+                f"Archive {self.directory} has format {data.get('format', 1)}, expected {ARCHIVE_FORMAT}; "
+                "it was written by an older version and must be re-created"
+            )
+        known = {partition.name: partition for partition in self.partitions}
+        self.partitions = [
+            known.get(entry["name"]) or ArchivePartition(self.directory, **entry) for entry in data["partitions"]
+        ]
+        self._manifest_stamp = stamp
+
+    def _save(self) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"format": ARCHIVE_FORMAT, "partitions": [partition.to_dict() for partition in self.partitions]},
+                f, indent=2,
+            )
+        os.replace(tmp_path, self.manifest_path)
+        stat = os.stat(self.manifest_path)
+        self._manifest_stamp = (stat.st_mtime_ns, stat.st_size)
+        self._totals_cache.clear()
+
+    def max_transaction_id(self) -> int:
+        """The largest archived transaction ID, or 0 if nothing is archived."""
+        self.refresh()
+        return max((partition.max_id for partition in self.partitions), default=0)
+
+    def archive(self, hot: StorageBackend, before_date: str) -> int:
+        """
+        Move the transactions dated in months before the month of `before_date` from `hot` into new partitions.
+
+        The newest transaction always stays in the hot table, so the IDs the database assigns keep
+        growing. If an earlier run stopped after writing its partitions but before deleting the rows
+        from the hot table, those rows are deleted first.
+
+        Args:
+            hot (StorageBackend): The hot ledger itself, not an `ArchivedStorage` in front of it.
+            before_date (str): Months before this date's month are archived.
+
+        Returns:
+            int: The number of transactions moved.
+        """
+        self.refresh()
+        transactions = hot.transactions_after(0)
+        archived_ids = set()
+        for partition in self.partitions:
+            archived_ids.update(partition.column("id").tolist())
+        leftover = [row[0] for row in transactions if row[0] in archived_ids]
+        if leftover:
+            hot.delete_transactions(leftover)
+            transactions = [row for row in transactions if row[0] not in archived_ids]
+        if not transactions:
+            return 0
+
+        cutoff = before_date[:7]
+        newest = max(row[0] for row in transactions)
+        months: Dict[str, List[Tuple]] = {}
+        for row in transactions:
+            month = row[5][:7]
+            if month < cutoff and row[0] != newest:
+                months.setdefault(month, []).append(row)
+        if not months:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        for month, rows in sorted(months.items()):
+            runs = sum(1 for partition in self.partitions if partition.month == month)
+            self.partitions.append(ArchivePartition.write(self.directory, f"{month}.{runs}", month, rows))
+        self._save()
+        moved = [row[0] for rows in months.values() for row in rows]
+        hot.delete_transactions(moved)
+        return len(moved)
+
+    def clear(self) -> None:
+        """Delete every partition and the manifest, e.g. when the ledger they were cut from is reset."""
+        for partition in self.partitions:
+            shutil.rmtree(partition.path, ignore_errors=True)
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        self.partitions = []
+        self._manifest_stamp = None
+        self._totals_cache.clear()
+
+    def totals(self, as_of_date: str) -> Tuple[Dict[Optional[str], np.ndarray], float]:
+        """
+        Archived totals on or before `as_of_date`.
+
+        Partitions never change once written, so the result is cached until the manifest does;
+        it is shared between callers and must be treated as read-only.
+
+        Returns:
+            Tuple: {item_name or None: values in `_TOTALS` order} and the cash total.
+        """
+        self.refresh()
+        key = (self._manifest_stamp, day_number(as_of_date))
+        cached = self._totals_cache.get(key)
+        if cached is not None:
+            return cached
+        merged: Dict[Optional[str], np.ndarray] = {}
+        cash = 0.0
+        for partition in self.partitions:
+            totals, partition_cash = partition.totals(as_of_date)
+            if totals is None:
+                continue
+            cash += partition_cash
+            stacked = np.stack([totals[name] for name in _TOTALS], axis=1)
+            for slot, item_name in enumerate([None] + partition.items):
+                if stacked[slot, 0]:
+                    if item_name in merged:
+                        merged[item_name] = merged[item_name] + stacked[slot]
+                    else:
+                        merged[item_name] = stacked[slot]
+        if len(self._totals_cache) >= TOTALS_CACHE_SIZE:
+            self._totals_cache.clear()
+        self._totals_cache[key] = (merged, cash)
+        return merged, cash
+
+    def transactions_after(self, transaction_id: int) -> List[Tuple]:
+        """Archived transactions with an ID above `transaction_id`, in ID order."""
+        self.refresh()
+        rows = [row for partition in self.partitions for row in partition.transactions_after(transaction_id)]
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+
+class ArchivedStorage:
+    """
+    A storage backend with its closed months in a `LedgerArchive`.
+
+    Methods not part of the storage interface, such as `MemoryLedger.reload`, are the hot backend's.
+
+    Args:
+        hot (StorageBackend): The backend holding the hot table; it receives every write.
+        archive (LedgerArchive): The archived months.
+    """
+
+    def __init__(self, hot: StorageBackend, archive: LedgerArchive):
+        self.hot = hot
+        self.archive = archive
+        self.database_path = hot.database_path
+
+    def __getattr__(self, name: str):
+        return getattr(self.hot, name)
+
+    def stock_level(self, item_name: str, as_of_date: str) -> int:
+        """Net units of `item_name` on or before `as_of_date`."""
+        archived, _ = self.archive.totals(as_of_date)
+        totals = archived.get(item_name)
+        return self.hot.stock_level(item_name, as_of_date) + (int(totals[2]) if totals is not None else 0)
+
+    def stock_levels(self, as_of_date: str) -> Dict[str, int]:
+        """Net units of every item with at least one transaction, including zero or negative stock."""
+        archived, _ = self.archive.totals(as_of_date)
+        levels = dict(self.hot.stock_levels(as_of_date))
+        for item_name, (_, unit_rows, net_units, *_) in archived.items():
+            if item_name is None:
+                continue
+            hot_units = levels.get(item_name)
+            if unit_rows:
+                levels[item_name] = (hot_units or 0) + int(net_units)
+            else:
+                levels[item_name] = hot_units
+        return {item_name: levels[item_name] for item_name in sorted(levels)}
+
+    def cash_balance(self, as_of_date: str) -> float:
+        """Sales revenue minus stock purchase costs on or before `as_of_date`."""
+        _, cash = self.archive.totals(as_of_date)
+        return self.hot.cash_balance(as_of_date) + cash
+
+    def top_sellers(self, as_of_date: str, limit: int = 5) -> List[Dict]:
+        """Best-selling items by revenue on or before `as_of_date`; a negative `limit` returns all."""
+        archived, _ = self.archive.totals(as_of_date)
+        sellers = {
+            seller["item_name"]: [seller["total_units"], seller["total_revenue"]]
+            for seller in self.hot.top_sellers(as_of_date, -1)
+        }
+        for item_name, (_, _, _, sales_rows, sales_unit_rows, sales_units, sales_revenue) in archived.items():
+            if not sales_rows:
+                continue
+            entry = sellers.setdefault(item_name, [None, 0.0])
+            if sales_unit_rows:
+                entry[0] = (entry[0] or 0) + int(sales_units)
+            entry[1] += float(sales_revenue)
+        ranked = sorted(sellers.items(), key=lambda seller: (seller[0] is not None, seller[0] or ""))
+        ranked.sort(key=lambda seller: seller[1][1], reverse=True)
+        if limit >= 0:
+            ranked = ranked[:limit]
+        return [
+            {"item_name": item_name, "total_units": units, "total_revenue": revenue}
+            for item_name, (units, revenue) in ranked
+        ]
+
+    def insert_transaction(
+        self,
+        item_name: Optional[str],
+        transaction_type: str,
+        quantity: Optional[int],
+        price: float,
+        date_str: str,
+    ) -> int:
+        """Record one transaction in the hot table and return its ID."""
+        return self.hot.insert_transaction(item_name, transaction_type, quantity, price, date_str)
+
+    def insert_transactions(
+        self,
+        rows: List[Tuple[Optional[str], str, Optional[int], float, str]],
+        validate: Optional[Callable[[], None]] = None,
+    ) -> List[int]:
+        """Record several transactions in the hot table together and return their IDs."""
+        return self.hot.insert_transactions(rows, validate)
+
+    def max_transaction_id(self) -> int:
+        """The largest transaction ID, archived or not, or 0 if the ledger is empty."""
+        return max(self.hot.max_transaction_id(), self.archive.max_transaction_id())
+
+    def transactions_after(self, transaction_id: int) -> List[Tuple]:
+        """Archived and hot transactions with an ID above `transaction_id`, in ID order."""
+        rows = self.archive.transactions_after(transaction_id) + self.hot.transactions_after(transaction_id)
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def delete_transactions_after(self, transaction_id: int) -> int:
+        """
+        Delete every hot transaction with an ID above `transaction_id`.
+
+        Raises:
+            ValueError: If transactions above `transaction_id` are archived.
+        """
+        if transaction_id < self.archive.max_transaction_id():
+            raise ValueError(f"Transactions after {transaction_id} are archived and cannot be rolled back")
+        return self.hot.delete_transactions_after(transaction_id)
+
+    def delete_transactions(self, transaction_ids: List[int]) -> int:
+        """Delete the given hot transactions."""
+        return self.hot.delete_transactions(transaction_ids)
+
+    def unit_price(self, item_name: str) -> Optional[float]:
+        return self.hot.unit_price(item_name)
+
+    def inventory_items(self) -> List[Tuple[str, str, float, int, int]]:
+        return self.hot.inventory_items()
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """Run an ad-hoc query against the database; archived transactions are not in its `transactions` table."""
+        return self.hot.query(sql, params)
+
+    def flush(self) -> int:
+        return self.hot.flush()
+
+    def close(self) -> None:
+        self.hot.close()
+
+
+def main(argv=None) -> int:
+    import argparse
+    import project_starter as ps
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Move closed months of the Munder Difflin ledger into the archive.")
+    parser.add_argument("--before", required=True, help="Archive the months before this date's month, e.g. 2025-04-01.")
+    parser.add_argument("--directory", default=ARCHIVE_DIR, help=f"Archive directory (default: {ARCHIVE_DIR}).")
+    parser.add_argument("--database", default=None, help="SQLite database file (default: the shared database).")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if args.database:
+        ps.use_database(f"sqlite:///{args.database}")
+    ps.use_archive(args.directory)
+    moved = ps.archive_ledger(args.before)
+    log.info("Archived %d transactions dated before %s into %s", moved, args.before[:7], args.directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Micro-benchmarks for the Munder Difflin multi-agent system.
+
+Each benchmark prints its measurements and returns False if it exceeded its budget,
+so the script can gate CI jobs:
+
+    python benchmarks.py              # run every benchmark
+    python benchmarks.py import_time  # run selected benchmarks by name
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+# Cold `import project_starter` in a fresh interpreter, median over several runs
+IMPORT_TIME_BUDGET_MS = 100.0
+
+# Modules that must not be loaded by a bare `import project_starter`
+HEAVY_MODULES = ("pandas", "numpy", "sqlalchemy", "openai", "pydantic", "dotenv")
+
+# Resetting the ledger between benchmark iterations from the cached template database
+RESET_DATABASE_BUDGET_MS = 20.0
+
+# Median per-call cost of the scalar tool helpers on the raw-cursor data-access layer
+TOOL_CALL_BUDGET_MS = 0.5
+
+# Median cost of a repeated memoized ledger read with no write in between
+MEMOIZED_READ_BUDGET_MS = 0.05
+
+# Median cost of reading the top 5 sellers from the maintained leaderboard
+TOP_SELLERS_BUDGET_MS = 0.05
+
+# Median cost of a ledger read or write on the in-memory storage backend
+MEMORY_STORAGE_BUDGET_MS = 0.05
+
+# Policy sweep of SIMULATOR_CONFIGURATIONS configurations over SIMULATOR_REQUESTS synthetic requests
+SIMULATOR_CONFIGURATIONS = 4096
+SIMULATOR_REQUESTS = 1000
+SIMULATOR_BUDGET_S = 5.0
+
+BENCHMARKS: Dict[str, Callable[[], bool]] = {}
+
+
+def benchmark(func: Callable[[], bool]) -> Callable[[], bool]:
+    BENCHMARKS[func.__name__.replace("bench_", "", 1)] = func
+    return func
+
+
+def _median_ms(samples: List[float]) -> float:
+    return statistics.median(samples) * 1000
+
+
+@benchmark
+def bench_import_time(runs: int = 7) -> bool:
+    """
+    Measure the cold import time of `project_starter` and check that no heavy dependency is loaded.
+    """
+    probe = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import project_starter\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(elapsed, ','.join(heavy))\n"
+    )
+
+    samples = []
+    heavy = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+        ).stdout.split()
+        samples.append(float(output[0]))
+        if len(output) > 1:
+            heavy.update(output[1].split(","))
+
+    median_ms = _median_ms(samples)
+    print(f"import_time: median {median_ms:.1f} ms over {runs} runs (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    if heavy:
+        print(f"import_time: heavy modules loaded at import: {', '.join(sorted(heavy))}")
+    return median_ms <= IMPORT_TIME_BUDGET_MS and not heavy
+
+
+@benchmark
+def bench_reset_database(runs: int = 20) -> bool:
+    """
+    Compare a full bulk load of the database with a reset from the cached template.
+    """
+    import os
+    import tempfile
+    from sqlalchemy import create_engine
+    import project_starter as ps
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+
+        start = time.perf_counter()
+        ps.init_database(engine, use_template=False)
+        bulk_ms = (time.perf_counter() - start) * 1000
+
+        ps.get_database_template()
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            ps.init_database(engine)
+            samples.append(time.perf_counter() - start)
+        engine.dispose()
+
+    median_ms = _median_ms(samples)
+    print(f"reset_database: bulk load {bulk_ms:.1f} ms, template reset median {median_ms:.2f} ms "
+          f"over {runs} runs (budget {RESET_DATABASE_BUDGET_MS:.0f} ms)")
+    return median_ms <= RESET_DATABASE_BUDGET_MS
+
+
+@benchmark
+def bench_tool_calls(runs: int = 200) -> bool:
+    """
+    Time the per-call overhead of the scalar tool helpers against the pandas-based lookup.
+
+    The memoization layer is bypassed via `__wrapped__`, so every call reaches the database.
+    """
+    import os
+    import tempfile
+    import project_starter as ps
+
+    def median_call_ms(func, *args) -> float:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+        return _median_ms(samples)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_url = ps.DB_URL
+        ps.use_database(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        try:
+            ps.reset_database()
+            timings = {
+                "get_stock_level (pandas)": median_call_ms(ps.get_stock_level.__wrapped__, "A4 paper", "2025-04-01"),
+                "check_stock_level": median_call_ms(ps.check_stock_level.__wrapped__, "A4 paper", "2025-04-01"),
+                "get_cash_balance": median_call_ms(ps.get_cash_balance.__wrapped__, "2025-04-01"),
+                "create_transaction": median_call_ms(
+                    ps.create_transaction, "A4 paper", "stock_orders", 1, 0.05, "2025-04-01"
+                ),
+            }
+        finally:
+            ps.use_database(previous_url)
+
+    for name, median_ms in timings.items():
+        print(f"tool_calls: {name}: median {median_ms:.3f} ms")
+    print(f"tool_calls: budget {TOOL_CALL_BUDGET_MS} ms per scalar helper call")
+    return all(
+        median_ms <= TOOL_CALL_BUDGET_MS for name, median_ms in timings.items() if "pandas" not in name
+    )
+
+
+@benchmark
+def bench_memoized_reads(runs: int = 200) -> bool:
+    """
+    Compare uncached and memoized ledger reads, and check that a write invalidates the cache.
+    """
+    import os
+    import tempfile
+    import project_starter as ps
+
+    reads = {
+        "get_all_inventory": (ps.get_all_inventory, ("2025-04-01",)),
+        "generate_financial_report": (ps.generate_financial_report, ("2025-04-01",)),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_url = ps.DB_URL
+        ps.use_database(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        try:
+            ps.reset_database()
+            timings = {}
+            for name, (func, args) in reads.items():
+                uncached = []
+                cached = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    func.__wrapped__(*args)
+                    uncached.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    func(*args)
+                    cached.append(time.perf_counter() - start)
+                timings[name] = (_median_ms(uncached), _median_ms(cached))
+
+            before = ps.get_cash_balance("2025-04-01")
+            ps.create_transaction("A4 paper", "sales", 1, 1.0, "2025-04-01")
+            invalidated = ps.get_cash_balance("2025-04-01") == before + 1.0
+        finally:
+            ps.use_database(previous_url)
+
+    for name, (uncached_ms, cached_ms) in timings.items():
+        print(f"memoized_reads: {name}: uncached median {uncached_ms:.3f} ms, memoized median {cached_ms:.4f} ms")
+    print(f"memoized_reads: budget {MEMOIZED_READ_BUDGET_MS} ms per memoized read")
+    if not invalidated:
+        print("memoized_reads: a write did not invalidate the cached cash balance")
+    return invalidated and all(cached_ms <= MEMOIZED_READ_BUDGET_MS for _, cached_ms in timings.values())
+
+
+@benchmark
+def bench_top_sellers(runs: int = 200) -> bool:
+    """
+    Compare the GROUP BY top-sellers query with reads from the maintained leaderboard.
+    """
+    import os
+    import tempfile
+    import project_starter as ps
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_url = ps.DB_URL
+        ps.use_database(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        try:
+            ps.reset_database()
+            data_access = ps.get_data_access()
+            leaderboard = ps.get_sales_leaderboard()
+            timings = {"query": [], "leaderboard": [], "leaderboard after sale": []}
+            for run in range(runs):
+                start = time.perf_counter()
+                data_access.top_sellers("2025-04-01", 5)
+                timings["query"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                leaderboard.top_sellers("2025-04-01", k=5)
+                timings["leaderboard"].append(time.perf_counter() - start)
+
+                # A sale invalidates the ranking; the next read re-ranks from the checkpoints
+                ps.create_transaction("A4 paper", "sales", 1, 0.05, "2025-04-01")
+                start = time.perf_counter()
+                leaderboard.top_sellers("2025-04-01", k=5)
+                timings["leaderboard after sale"].append(time.perf_counter() - start)
+
+            matches = leaderboard.top_sellers("2025-04-01", k=5) == data_access.top_sellers("2025-04-01", 5)
+        finally:
+            ps.use_database(previous_url)
+
+    for name, samples in timings.items():
+        print(f"top_sellers: {name}: median {_median_ms(samples):.4f} ms")
+    print(f"top_sellers: budget {TOP_SELLERS_BUDGET_MS} ms per leaderboard read")
+    if not matches:
+        print("top_sellers: leaderboard differs from the GROUP BY query")
+    return matches and _median_ms(timings["leaderboard"]) <= TOP_SELLERS_BUDGET_MS
+
+
+@benchmark
+def bench_storage(runs: int = 200) -> bool:
+    """
+    Compare ledger reads and writes on the SQLite and in-memory storage backends, and check
+    that both answer alike and that a flush leaves the database matching memory.
+    """
+    import os
+    import tempfile
+    import project_starter as ps
+    from storage import open_storage
+
+    def median_call_ms(func, *args) -> float:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+        return _median_ms(samples)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_url = ps.DB_URL
+        ps.use_database(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        try:
+            ps.reset_database()
+            backends = {name: open_storage(name, ps.get_data_access().database_path) for name in ("sqlite", "memory")}
+            timings = {}
+            for name, backend in backends.items():
+                timings[name] = {
+                    "stock_level": median_call_ms(backend.stock_level, "A4 paper", "2025-04-01"),
+                    "stock_levels": median_call_ms(backend.stock_levels, "2025-04-01"),
+                    "cash_balance": median_call_ms(backend.cash_balance, "2025-04-01"),
+                    "insert_transaction": median_call_ms(
+                        backend.insert_transaction, "A4 paper", "stock_orders", 1, 0.05, "2025-04-01"
+                    ),
+                }
+            sqlite, memory = backends["sqlite"], backends["memory"]
+            matches = (
+                sqlite.stock_levels("2025-04-01") == memory.stock_levels("2025-04-01")
+                and sqlite.cash_balance("2025-04-01") == memory.cash_balance("2025-04-01")
+                and sqlite.top_sellers("2025-04-01") == memory.top_sellers("2025-04-01")
+            )
+            # Flushing replaces the rows the SQLite backend wrote with the identical ones from memory
+            memory.flush()
+            flushed = sqlite.transactions_after(0) == memory.transactions_after(0)
+            for backend in backends.values():
+                backend.close()
+        finally:
+            ps.use_database(previous_url)
+
+    for name, calls in timings.items():
+        print(f"storage: {name}: " + ", ".join(f"{call} median {ms:.4f} ms" for call, ms in calls.items()))
+    print(f"storage: budget {MEMORY_STORAGE_BUDGET_MS} ms per in-memory call")
+    if not matches:
+        print("storage: the in-memory backend answered differently from SQLite")
+    if not flushed:
+        print("storage: the database does not match memory after a flush")
+    return matches and flushed and all(ms <= MEMORY_STORAGE_BUDGET_MS for ms in timings["memory"].values())
+
+
+@benchmark
+def bench_simulator() -> bool:
+    """
+    Time a what-if policy sweep over a synthetic request stream.
+    """
+    import os
+    import tempfile
+    import numpy as np
+    import project_starter as ps
+    from simulator import Catalog, PolicySweep, RequestStream, simulate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_url = ps.DB_URL
+        ps.use_database(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        try:
+            ps.reset_database()
+            catalog = Catalog.from_ledger("2025-03-31")
+        finally:
+            ps.use_database(previous_url)
+
+    rng = np.random.default_rng(0)
+    stream = RequestStream(
+        ("2025-04-01", [
+            (catalog.item_names[index], int(rng.integers(10, 1000)))
+            for index in rng.choice(len(catalog.item_names), size=rng.integers(1, 4), replace=False)
+        ])
+        for _ in range(SIMULATOR_REQUESTS)
+    )
+    sweep = PolicySweep.grid(
+        discount_threshold=np.linspace(250, 4000, 16),
+        discount_rate=np.linspace(0.0, 0.3, 16),
+        reorder_min_quantity=[100, 250, 500, 1000],
+        reorder_level_multiplier=[1.0, 1.5, 2.0, 3.0],
+    )
+
+    start = time.perf_counter()
+    results = simulate(catalog, stream, sweep)
+    elapsed = time.perf_counter() - start
+
+    best = int(np.argmax(results.total_assets))
+    print(f"simulator: {len(sweep)} configurations x {len(stream)} requests in {elapsed:.2f} s "
+          f"(budget {SIMULATOR_BUDGET_S:.0f} s)")
+    print(f"simulator: best total assets {results.total_assets[best]:.2f} with "
+          + ", ".join(f"{name}={values[best]:g}" for name, values in results.parameters.items()))
+    return elapsed <= SIMULATOR_BUDGET_S
+
+
+def main(argv: List[str]) -> int:
+    names = argv or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmarks: {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+        return 2
+
+    failed = []
+    for name in names:
+        start = time.perf_counter()
+        if not BENCHMARKS[name]():
+            failed.append(name)
+        print(f"{name}: finished in {time.perf_counter() - start:.2f} s\n")
+
+    if failed:
+        print(f"Over budget: {', '.join(failed)}")
+        return 1
+    print("All benchmarks within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
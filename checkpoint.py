@@ -0,0 +1,149 @@
+"""
+Checkpoints for resumable batch runs.
+
+A `RunCheckpoint` records which requests of a batch run have been committed, together
+with the transaction high-water mark (the largest `transactions.id`) at that point. A
+request only counts as committed once its result has been flushed to the results file,
+so after a crash `run_test_scenarios(resume=True)`:
+
+1. deletes any transactions above the high-water mark, i.e. the ledger writes of
+   requests that were in flight or not yet flushed,
+2. skips every committed request, and
+3. appends the remaining results to the existing results file.
+
+The checkpoint is a small JSON file, replaced atomically on every save.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+def request_key(request: str, request_date: str) -> str:
+    """
+    Identify a request by its content, so a resumed run can tell whether it was already processed.
+    """
+    return hashlib.sha1(f"{request_date}|{request}".encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class RunCheckpoint:
+    """
+    Progress of one batch run over a requests file.
+
+    Args:
+        path (str): JSON file holding the checkpoint.
+        requests_digest (str): Hash of the requests file the run processes.
+        results_path (str): File the run streams its results to.
+    """
+
+    def __init__(self, path: str, requests_digest: str, results_path: str):
+        self.path = path
+        self.requests_digest = requests_digest
+        self.results_path = results_path
+        self.completed: Dict[int, str] = {}
+        self.transaction_high_water = 0
+        self.finished = False
+        self._pending: Dict[int, str] = {}
+        self._pending_high_water: Optional[int] = None
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RunCheckpoint"]:
+        """Read a checkpoint from `path`, or return None if there is none."""
+        if not os.path.exists(path):
+            return None
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        checkpoint = cls(path, data["requests_digest"], data["results_path"])
+        checkpoint.completed = {int(request_id): key for request_id, key in data["completed"].items()}
+        checkpoint.transaction_high_water = data["transaction_high_water"]
+        checkpoint.finished = data.get("finished", False)
+        return checkpoint
+
+    @property
+    def last_request_id(self) -> Optional[int]:
+        """The most recent committed request ID."""
+        return max(self.completed) if self.completed else None
+
+    def is_done(self, request_id: int, key: str) -> bool:
+        """
+        Whether `request_id` was committed by an earlier run.
+
+        Raises:
+            ValueError: If the request was committed with different content.
+        """
+        committed_key = self.completed.get(request_id)
+        if committed_key is None:
+            return False
+        if committed_key != key:
+            raise ValueError(f"Request {request_id} differs from the one recorded in checkpoint {self.path}")
+        return True
+
+    def mark_pending(self, request_id: int, key: str, transaction_high_water: int) -> None:
+        """
+        Note a processed request whose result has not been flushed yet, together with the
+        ledger high-water mark right after it finished.
+        """
+        self._pending[request_id] = key
+        self._pending_high_water = transaction_high_water
+
+    def commit(self, transaction_high_water: Optional[int] = None) -> None:
+        """
+        Mark all pending requests as committed and save.
+
+        The high-water mark is the one recorded with the latest pending request, so writes
+        made after it (e.g. by a request that failed midway) are never covered. Pass
+        `transaction_high_water` to set it explicitly, e.g. for a freshly initialized ledger.
+        """
+        if transaction_high_water is None:
+            transaction_high_water = self._pending_high_water
+        if transaction_high_water is not None:
+            self.transaction_high_water = transaction_high_water
+
+        self.completed.update(self._pending)
+        self._pending.clear()
+        self._pending_high_water = None
+        self.save()
+
+    def finish(self) -> None:
+        self.finished = True
+        self.save()
+
+    def save(self) -> None:
+        data = {
+            "requests_digest": self.requests_digest,
+            "results_path": self.results_path,
+            "transaction_high_water": self.transaction_high_water,
+            "last_request_id": self.last_request_id,
+            "finished": self.finished,
+            "completed": {str(request_id): key for request_id, key in sorted(self.completed.items())},
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def committed_result_ids(results_path: str, result_format: Optional[str] = None) -> List[int]:
+    """
+    Request IDs already present in a CSV or JSONL results file.
+
+    Used on resume to avoid writing a result twice when a run stopped between flushing
+    its results and saving its checkpoint.
+    """
+    if not os.path.exists(results_path):
+        return []
+
+    import csv
+
+    with open(results_path, newline="", encoding="utf-8") as f:
+        if result_format == "jsonl" or (result_format is None and results_path.endswith((".jsonl", ".json", ".ndjson"))):
+            return [json.loads(line)["request_id"] for line in f if line.strip()]
+        return [int(row["request_id"]) for row in csv.DictReader(f)]
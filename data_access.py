@@ -0,0 +1,457 @@
+"""
+Thin data-access layer over raw sqlite3 cursors.
+
+The per-call tool helpers in `project_starter` (stock lookups, cash balance, new
+transactions, catalog prices) used to go through `pd.read_sql` / `DataFrame.to_sql`,
+paying for DataFrame construction and dtype inference on every call. `DataAccess`
+runs the same queries on a raw DB-API connection and returns plain scalars, tuples
+and dicts. All SQL is held in module constants, so sqlite3's per-connection statement
+cache prepares each statement once and reuses it afterwards.
+
+pandas remains in use for bulk loads and report-style paths. Catalog and ledger reads are
+cached for the duration of an active unit of work (see `unit_of_work`). `DataAccess` is the
+SQLite storage backend; `storage.MemoryLedger` serves the same queries from memory.
+
+As-of filters compare the integer `transaction_day` column (see `ledger_dates`). Databases
+created before that column existed are never changed behind a reader's back: `init_database`
+replaces them with the current schema, or they are migrated in place with
+
+    python data_access.py --migrate munder_difflin.db
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ledger_dates import day_number
+from logging_config import get_logger
+from unit_of_work import unit_of_work_read
+
+log = get_logger("db")
+
+_STOCK_LEVEL_SQL = """
+    SELECT COALESCE(SUM(CASE
+        WHEN transaction_type = 'stock_orders' THEN units
+        WHEN transaction_type = 'sales' THEN -units
+        ELSE 0
+    END), 0)
+    FROM transactions
+    WHERE item_name = ? AND transaction_day <= ?
+"""
+
+_STOCK_LEVELS_SQL = """
+    SELECT
+        item_name,
+        SUM(CASE
+            WHEN transaction_type = 'stock_orders' THEN units
+            WHEN transaction_type = 'sales' THEN -units
+            ELSE 0
+        END) AS stock
+    FROM transactions
+    WHERE item_name IS NOT NULL AND transaction_day <= ?
+    GROUP BY item_name
+"""
+
+_CASH_BALANCE_SQL = """
+    SELECT COALESCE(SUM(CASE
+        WHEN transaction_type = 'sales' THEN price
+        WHEN transaction_type = 'stock_orders' THEN -price
+        ELSE 0
+    END), 0.0)
+    FROM transactions
+    WHERE transaction_day <= ?
+"""
+
+# Net change per later transaction day, in day order, for the lowest running level from a date on
+_DAILY_STOCK_CHANGES_SQL = """
+    SELECT transaction_day, SUM(CASE
+        WHEN transaction_type = 'stock_orders' THEN units
+        WHEN transaction_type = 'sales' THEN -units
+        ELSE 0
+    END)
+    FROM transactions
+    WHERE item_name = ? AND transaction_day > ?
+    GROUP BY transaction_day
+    ORDER BY transaction_day
+"""
+
+_DAILY_CASH_CHANGES_SQL = """
+    SELECT transaction_day, SUM(CASE
+        WHEN transaction_type = 'sales' THEN price
+        WHEN transaction_type = 'stock_orders' THEN -price
+        ELSE 0
+    END)
+    FROM transactions
+    WHERE transaction_day > ?
+    GROUP BY transaction_day
+    ORDER BY transaction_day
+"""
+
+_INSERT_TRANSACTION_SQL = """
+    INSERT INTO transactions (item_name, transaction_type, units, price, transaction_date, transaction_day)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_TRANSACTION_ROW_SQL = """
+    INSERT INTO transactions (id, item_name, transaction_type, units, price, transaction_date, transaction_day)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_MAX_TRANSACTION_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM transactions"
+
+_TRANSACTIONS_AFTER_SQL = """
+    SELECT id, item_name, transaction_type, units, price, transaction_date
+    FROM transactions
+    WHERE id > ?
+    ORDER BY id
+"""
+
+_DELETE_TRANSACTIONS_AFTER_SQL = "DELETE FROM transactions WHERE id > ?"
+
+_DELETE_TRANSACTION_SQL = "DELETE FROM transactions WHERE id = ?"
+
+_UNIT_PRICE_SQL = "SELECT unit_price FROM inventory WHERE item_name = ?"
+
+_INVENTORY_ITEMS_SQL = "SELECT item_name, category, unit_price, current_stock, min_stock_level FROM inventory"
+
+_TOP_SELLERS_SQL = """
+    SELECT item_name, SUM(units) AS total_units, SUM(price) AS total_revenue
+    FROM transactions
+    WHERE transaction_type = 'sales' AND transaction_day <= ?
+    GROUP BY item_name
+    ORDER BY total_revenue DESC
+    LIMIT ?
+"""
+
+
+# Adds and fills `transaction_day` in a ledger created before it existed, and stores every
+# date in YYYY-MM-DD form; julianday() of 1970-01-01 is 2440587.5
+_MIGRATE_TRANSACTION_DAYS_SQL = """
+    ALTER TABLE transactions ADD COLUMN transaction_day INTEGER;
+    UPDATE transactions SET
+        transaction_date = substr(transaction_date, 1, 10),
+        transaction_day = CAST(julianday(substr(transaction_date, 1, 10)) - 2440587.5 AS INTEGER);
+    DROP INDEX IF EXISTS idx_transactions_item_date;
+    CREATE INDEX idx_transactions_item_day ON transactions (item_name, transaction_day);
+"""
+
+
+def needs_transaction_days(conn: sqlite3.Connection) -> bool:
+    """Whether the database has a `transactions` table without the `transaction_day` column."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)").fetchall()]
+    return bool(columns) and "transaction_day" not in columns
+
+
+def migrate_transaction_days(conn: sqlite3.Connection) -> bool:
+    """
+    Add the `transaction_day` column and its index to a ledger that predates them.
+
+    This rewrites every `transaction_date` into YYYY-MM-DD form, so it is only run when
+    asked for (`python data_access.py --migrate`), never by a read.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the database to migrate.
+
+    Returns:
+        bool: True if the database was migrated, False if it had no `transactions` table or
+              was already up to date.
+    """
+    if not needs_transaction_days(conn):
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-checked under the write lock: another process may have just migrated it
+        if not needs_transaction_days(conn):
+            conn.execute("ROLLBACK")
+            return False
+        for statement in _MIGRATE_TRANSACTION_DAYS_SQL.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return True
+
+
+# Tables the helpers read, all created by `init_database`
+REQUIRED_TABLES = ("transactions", "inventory", "quotes", "quote_requests", "quote_lines")
+
+
+def check_schema(database_path: str) -> None:
+    """
+    Fail fast on a database that predates the current schema, instead of on every read.
+
+    Raises:
+        RuntimeError: Saying what is missing and how to migrate or reset the database.
+    """
+    if not os.path.exists(database_path):
+        raise RuntimeError(f"{database_path} does not exist; create it with init_database")
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [table for table in REQUIRED_TABLES if table not in tables]
+        if missing:
+            raise RuntimeError(
+                f"{database_path} has no {', '.join(missing)} table; reset it with init_database "
+                f"(e.g. `python service.py --init-db`)"
+            )
+        if needs_transaction_days(conn):
+            raise RuntimeError(
+                f"{database_path} predates the transaction_day column; migrate it with "
+                f"`python data_access.py --migrate {database_path}` or reset it with init_database"
+            )
+    finally:
+        conn.close()
+
+
+def sqlite_path_from_url(url: str) -> str:
+    """
+    Extract the file path from a `sqlite:///path` SQLAlchemy URL.
+    """
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        raise ValueError(f"Only file-based SQLite URLs are supported, got {url!r}")
+    return url[len(prefix):]
+
+
+# Every live `DataAccess`, so a single fork hook can reset them all; the set holds them
+# weakly, so instances that are replaced (e.g. by `use_database`) are still freed
+_instances: "weakref.WeakSet[DataAccess]" = weakref.WeakSet()
+
+
+def _forget_connections_in_child() -> None:
+    for data_access in list(_instances):
+        data_access._forget_connections()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_connections_in_child)
+
+
+class DataAccess:
+    """
+    Scalar-returning queries against the Munder Difflin SQLite database.
+
+    Each thread gets its own autocommit connection, and connections are discarded in
+    forked child processes so that workers never share a parent's file handle.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+    """
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self._local = threading.local()
+        self._schema_checked = False
+        _instances.add(self)
+
+    def _forget_connections(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.database_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            if not self._schema_checked:
+                self._schema_checked = True
+                if needs_transaction_days(conn):
+                    log.warning(
+                        "%s predates the transaction_day column, so as-of queries will fail; migrate it with "
+                        "`python data_access.py --migrate %s` or reset it with init_database",
+                        self.database_path, self.database_path,
+                    )
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close the calling thread's connection, if any."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @unit_of_work_read()
+    def stock_level(self, item_name: str, as_of_date: str) -> int:
+        """Net units of `item_name` on or before `as_of_date`."""
+        return self.connection.execute(_STOCK_LEVEL_SQL, (item_name, day_number(as_of_date))).fetchone()[0]
+
+    @unit_of_work_read()
+    def stock_levels(self, as_of_date: str) -> Dict[str, int]:
+        """Net units of every item with at least one transaction, including zero or negative stock."""
+        return dict(self.connection.execute(_STOCK_LEVELS_SQL, (day_number(as_of_date),)).fetchall())
+
+    @unit_of_work_read()
+    def cash_balance(self, as_of_date: str) -> float:
+        """Sales revenue minus stock purchase costs on or before `as_of_date`."""
+        return float(self.connection.execute(_CASH_BALANCE_SQL, (day_number(as_of_date),)).fetchone()[0])
+
+    def insert_transaction(
+        self,
+        item_name: Optional[str],
+        transaction_type: str,
+        quantity: Optional[int],
+        price: float,
+        date_str: str,
+    ) -> int:
+        """Insert one transaction and return its ID."""
+        cursor = self.connection.execute(
+            _INSERT_TRANSACTION_SQL, (item_name, transaction_type, quantity, price, date_str, day_number(date_str))
+        )
+        return cursor.lastrowid
+
+    def insert_transactions(
+        self,
+        rows: List[Tuple[Optional[str], str, Optional[int], float, str]],
+        validate: Optional[Callable[[], None]] = None,
+    ) -> List[int]:
+        """
+        Insert several transactions in one database transaction and return their IDs.
+
+        Args:
+            rows (List[Tuple]): (item_name, transaction_type, quantity, price, date_str) per transaction.
+            validate (Callable, optional): Called after the inserts and before the commit, while this
+                                           thread's connection already sees the new rows. If it raises,
+                                           none of them is kept.
+        """
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            transaction_ids = [
+                conn.execute(
+                    _INSERT_TRANSACTION_SQL,
+                    (item_name, transaction_type, quantity, price, date_str, day_number(date_str)),
+                ).lastrowid
+                for item_name, transaction_type, quantity, price, date_str in rows
+            ]
+            if validate is not None:
+                validate()
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return transaction_ids
+
+    def lowest_stock_level(self, item_name: str, from_date: str) -> int:
+        """Lowest net units of `item_name` as of `from_date` or of any later transaction day."""
+        day = day_number(from_date)
+        conn = self.connection
+        level = lowest = conn.execute(_STOCK_LEVEL_SQL, (item_name, day)).fetchone()[0]
+        for _, change in conn.execute(_DAILY_STOCK_CHANGES_SQL, (item_name, day)).fetchall():
+            level += change or 0
+            lowest = min(lowest, level)
+        return lowest
+
+    def lowest_cash_balance(self, from_date: str) -> float:
+        """Lowest cash balance as of `from_date` or of any later transaction day."""
+        day = day_number(from_date)
+        conn = self.connection
+        balance = lowest = float(conn.execute(_CASH_BALANCE_SQL, (day,)).fetchone()[0])
+        for _, change in conn.execute(_DAILY_CASH_CHANGES_SQL, (day,)).fetchall():
+            balance += change or 0.0
+            lowest = min(lowest, balance)
+        return lowest
+
+    def max_transaction_id(self) -> int:
+        """The largest transaction ID, or 0 if the ledger is empty."""
+        return self.connection.execute(_MAX_TRANSACTION_ID_SQL).fetchone()[0]
+
+    def transactions_after(self, transaction_id: int) -> List[Tuple]:
+        """(id, item_name, transaction_type, units, price, transaction_date) of every transaction with an ID above `transaction_id`."""
+        return self.connection.execute(_TRANSACTIONS_AFTER_SQL, (transaction_id,)).fetchall()
+
+    def delete_transactions_after(self, transaction_id: int) -> int:
+        """Delete every transaction with an ID above `transaction_id` and return how many were removed."""
+        return self.connection.execute(_DELETE_TRANSACTIONS_AFTER_SQL, (transaction_id,)).rowcount
+
+    def delete_transactions(self, transaction_ids: List[int]) -> int:
+        """Delete the given transactions in one database transaction and return how many were removed."""
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.executemany(_DELETE_TRANSACTION_SQL, [(transaction_id,) for transaction_id in transaction_ids]).rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return removed
+
+    def replace_transactions_after(self, transaction_id: int, rows: List[Tuple]) -> None:
+        """
+        Replace every transaction with an ID above `transaction_id` by `rows`, in one database transaction.
+
+        Args:
+            transaction_id (int): Transactions above this ID are deleted.
+            rows (List[Tuple]): (id, item_name, transaction_type, units, price, transaction_date) to insert.
+        """
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(_DELETE_TRANSACTIONS_AFTER_SQL, (transaction_id,))
+            conn.executemany(_INSERT_TRANSACTION_ROW_SQL, [(*row, day_number(row[5])) for row in rows])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def flush(self) -> int:
+        """Transactions are committed as they are inserted, so there is nothing to write."""
+        return 0
+
+    @unit_of_work_read(ledger=False)
+    def unit_price(self, item_name: str) -> Optional[float]:
+        """Catalog unit price of `item_name`, or None if the item is not stocked."""
+        row = self.connection.execute(_UNIT_PRICE_SQL, (item_name,)).fetchone()
+        return None if row is None else row[0]
+
+    @unit_of_work_read(ledger=False)
+    def inventory_items(self) -> List[Tuple[str, str, float, int, int]]:
+        """(item_name, category, unit_price, current_stock, min_stock_level) for every stocked item."""
+        return self.connection.execute(_INVENTORY_ITEMS_SQL).fetchall()
+
+    def top_sellers(self, as_of_date: str, limit: int = 5) -> List[Dict]:
+        """Best-selling items by revenue on or before `as_of_date`."""
+        rows = self.connection.execute(_TOP_SELLERS_SQL, (day_number(as_of_date), limit)).fetchall()
+        return [
+            {"item_name": item_name, "total_units": total_units, "total_revenue": total_revenue}
+            for item_name, total_units, total_revenue in rows
+        ]
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """Run an ad-hoc query and return its rows as dicts."""
+        cursor = self.connection.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Maintain a Munder Difflin SQLite database.")
+    parser.add_argument("database", help="SQLite database file.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Add the integer transaction_day column to a ledger created before it existed.")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if not args.migrate:
+        parser.error("nothing to do; pass --migrate")
+    conn = sqlite3.connect(args.database, timeout=30.0, isolation_level=None)
+    try:
+        if migrate_transaction_days(conn):
+            log.info("Migrated %s to integer transaction days", args.database)
+        else:
+            log.info("%s is already up to date", args.database)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Bounded request history for the orchestrator.
+
+`RequestHistory` keeps the most recent requests in an in-memory ring buffer of compact
+`HistoryRecord` tuples. When the buffer is full, the oldest record is spilled to an
+append-only SQLite log, indexed by customer, so that long-running processes stay at a
+constant memory footprint while queries such as "last N requests for this customer"
+remain cheap.
+
+Records are numbered in the order they are appended. A record's `seq` is provisional while
+it is in memory: the spill log numbers rows itself (`AUTOINCREMENT`), so several histories,
+e.g. of concurrent processes, can share one log file without handing out the same number.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class HistoryRecord(NamedTuple):
+    """A compact summary of one processed customer request."""
+    seq: int
+    date: str
+    customer: Optional[str]
+    request: str
+    items: Tuple[Tuple[str, int], ...]
+    status: str
+    total_amount: float
+    cash_balance: Optional[float]
+
+    def to_dict(self) -> Dict:
+        record = self._asdict()
+        record["items"] = [{"item_name": name, "quantity": qty} for name, qty in self.items]
+        return record
+
+
+_LOG_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS request_history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        customer TEXT,
+        request TEXT,
+        items TEXT,
+        status TEXT,
+        total_amount REAL,
+        cash_balance REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_request_history_customer ON request_history (customer, seq);
+"""
+
+
+class RequestHistory:
+    """
+    Ring buffer of recent `HistoryRecord`s with an optional on-disk spill log.
+
+    Args:
+        capacity (int, optional): Maximum number of records kept in memory. Default is 1000.
+        log_path (str, optional): SQLite file that receives records evicted from memory.
+                                  If None, evicted records are dropped.
+    """
+
+    def __init__(self, capacity: int = 1000, log_path: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+
+        self.capacity = capacity
+        self.log_path = log_path
+        self._recent = deque()
+        self._by_customer: Dict[Optional[str], deque] = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+        if log_path:
+            self._log = sqlite3.connect(log_path, check_same_thread=False)
+            self._log.executescript(_LOG_SCHEMA)
+            # Continue the log's numbering; while no other history shares the file, every
+            # record keeps the same `seq` when it is spilled
+            row = self._log.execute("SELECT COALESCE(MAX(seq), 0) FROM request_history").fetchone()
+            self._next_seq = row[0] + 1
+        else:
+            self._next_seq = 1
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return iter(list(self._recent))
+
+    def append(
+        self,
+        request: str,
+        date: str,
+        items: List[Dict],
+        status: str,
+        total_amount: float = 0.0,
+        cash_balance: Optional[float] = None,
+        customer: Optional[str] = None,
+    ) -> HistoryRecord:
+        """
+        Record a processed request, spilling the oldest in-memory record if the buffer is full.
+
+        Returns:
+            HistoryRecord: The stored record.
+        """
+        with self._lock:
+            record = HistoryRecord(
+                seq=self._next_seq,
+                date=date,
+                customer=customer,
+                request=request,
+                items=tuple((item["item_name"], int(item["quantity"])) for item in items),
+                status=status,
+                total_amount=float(total_amount or 0.0),
+                cash_balance=cash_balance,
+            )
+            self._next_seq += 1
+
+            self._recent.append(record)
+            self._by_customer.setdefault(customer, deque()).append(record)
+
+            if len(self._recent) > self.capacity:
+                self._evict(self._recent.popleft())
+
+            return record
+
+    def _evict(self, record: HistoryRecord) -> None:
+        # The evicted record is always the oldest one held for its customer
+        customer_records = self._by_customer[record.customer]
+        customer_records.popleft()
+        if not customer_records:
+            del self._by_customer[record.customer]
+
+        if self._log is not None:
+            self._log.execute(
+                "INSERT INTO request_history VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.date,
+                    record.customer,
+                    record.request,
+                    json.dumps(record.items),
+                    record.status,
+                    record.total_amount,
+                    record.cash_balance,
+                ),
+            )
+            self._log.commit()
+
+    def last(self, n: int) -> List[HistoryRecord]:
+        """
+        Return the `n` most recent records, newest first, reading the spill log if needed.
+        """
+        with self._lock:
+            records = list(self._recent)[-n:][::-1] if n > 0 else []
+            return records + self._read_log(None, n - len(records), any_customer=True)
+
+    def last_for_customer(self, customer: Optional[str], n: int) -> List[HistoryRecord]:
+        """
+        Return the `n` most recent records for `customer`, newest first.
+
+        Records still in memory are served from a per-customer index; only the remainder
+        is read from the spill log through its (customer, seq) index.
+        """
+        with self._lock:
+            in_memory = self._by_customer.get(customer, ())
+            records = list(in_memory)[-n:][::-1] if n > 0 else []
+            return records + self._read_log(customer, n - len(records))
+
+    def _read_log(
+        self,
+        customer: Optional[str],
+        n: int,
+        any_customer: bool = False,
+    ) -> List[HistoryRecord]:
+        # Only the oldest records are ever spilled, so every logged record predates the
+        # ones still in memory
+        if n <= 0 or self._log is None:
+            return []
+
+        if any_customer:
+            rows = self._log.execute(
+                "SELECT * FROM request_history ORDER BY seq DESC LIMIT ?",
+                (n,),
+            )
+        elif customer is None:
+            rows = self._log.execute(
+                "SELECT * FROM request_history WHERE customer IS NULL ORDER BY seq DESC LIMIT ?",
+                (n,),
+            )
+        else:
+            rows = self._log.execute(
+                "SELECT * FROM request_history WHERE customer = ? ORDER BY seq DESC LIMIT ?",
+                (customer, n),
+            )
+
+        return [
+            HistoryRecord(
+                seq=row[0],
+                date=row[1],
+                customer=row[2],
+                request=row[3],
+                items=tuple((name, qty) for name, qty in json.loads(row[4])),
+                status=row[5],
+                total_amount=row[6],
+                cash_balance=row[7],
+            )
+            for row in rows
+        ]
+
+    def close(self) -> None:
+        """Spill every in-memory record to the log (if any) and close it."""
+        with self._lock:
+            while self._recent:
+                self._evict(self._recent.popleft())
+            if self._log is not None:
+                self._log.close()
+                self._log = None
@@ -0,0 +1,22 @@
+"""
+Percentiles for the latency reports of the scheduler, the model router and the call policy.
+
+Each of them keeps a bounded window of recent timings and reports p50/p95/p99 from it.
+The windows are small, so a percentile is read off the sorted samples directly (nearest
+rank, rounding down) instead of interpolating:
+
+    percentile(sorted([0.2, 0.4, 0.3, 1.5]), 0.95)     # 1.5
+"""
+
+from typing import List
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    The value below which `fraction` of `sorted_values` lie.
+
+    Args:
+        sorted_values (List[float]): Samples in ascending order; must not be empty.
+        fraction (float): Between 0 and 1, e.g. 0.95 for the p95.
+    """
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
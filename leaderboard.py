@@ -0,0 +1,147 @@
+"""
+Incrementally maintained top-sellers leaderboard.
+
+`generate_financial_report` used to rank products with a `GROUP BY ... ORDER BY
+total_revenue DESC LIMIT 5` over every sale on each call. `SalesLeaderboard` instead
+subscribes to the ledger event stream (see `ledger_events`) and keeps, per transaction
+day (see `ledger_dates`), the units and revenue sold per item. Cumulative totals are
+checkpointed per day, so the totals as of any date, or over a trailing window of days,
+are the difference of two checkpoints. Each ranking is computed once and cached until a sale changes it, so
+reading the top k is O(k):
+
+    leaderboard = SalesLeaderboard().attach(project_starter.get_ledger_events())
+    leaderboard.top_sellers("2025-04-15", k=5, window_days=30)
+"""
+
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+from ledger_dates import day_number
+from ledger_events import LedgerEvent, Projection
+
+# Trailing windows offered by the reports, in days
+WINDOWS = (7, 30, 90)
+
+# Cached rankings kept before the cache is cleared
+MAX_CACHED_RANKINGS = 256
+
+# Per item: [number of sales rows, units (None if no row had units), revenue]
+_Totals = Dict[Optional[str], List]
+
+
+def _ranking_key(entry: Tuple[Optional[str], Optional[int], float]) -> Tuple:
+    item_name, _, revenue = entry
+    # Highest revenue first; ties by item name, with the item-less cash entry first
+    return (-revenue, item_name is not None, item_name or "")
+
+
+class SalesLeaderboard(Projection):
+    """
+    Units sold and revenue per item, ranked by revenue as of any date.
+    """
+
+    def reset(self) -> None:
+        self._days: List[int] = []
+        self._deltas: Dict[int, _Totals] = {}
+        self._cumulative: Dict[int, _Totals] = {}
+        self._rankings: Dict[Tuple[Optional[int], Optional[int]], List[Dict]] = {}
+
+    def apply(self, event: LedgerEvent) -> None:
+        if event.transaction_type != "sales":
+            return
+
+        day = day_number(event.transaction_date)
+        delta = self._deltas.get(day)
+        if delta is None:
+            insort(self._days, day)
+            delta = self._deltas[day] = {}
+        _add(delta, event.item_name, 1, event.units, event.price)
+
+        # Checkpoints from this day on now include the sale
+        for checkpoint_day in self._days[bisect_right(self._days, day) - 1:]:
+            self._cumulative.pop(checkpoint_day, None)
+        self._rankings = {
+            (start, end): ranking for (start, end), ranking in self._rankings.items()
+            if end is None or end < day or (start is not None and start >= day)
+        }
+
+    def top_sellers(self, as_of_date: str, k: int = 5, window_days: Optional[int] = None) -> List[Dict]:
+        """
+        Best-selling items by revenue.
+
+        Args:
+            as_of_date (str): Count sales dated on or before this date.
+            k (int, optional): Number of items to return. Default is 5.
+            window_days (int, optional): Only count sales within this many days up to
+                                         `as_of_date`, e.g. one of `WINDOWS`. Default is all sales.
+
+        Returns:
+            List[Dict]: 'item_name', 'total_units' and 'total_revenue' per item, highest revenue first.
+        """
+        as_of_day = day_number(as_of_date)
+        end = self._last_day_on_or_before(as_of_day)
+        start = None
+        if window_days is not None:
+            start = self._last_day_on_or_before(as_of_day - window_days)
+
+        ranking = self._rankings.get((start, end))
+        if ranking is None:
+            ranking = self._rank(start, end)
+            if len(self._rankings) >= MAX_CACHED_RANKINGS:
+                self._rankings.clear()
+            self._rankings[(start, end)] = ranking
+        return ranking[:k]
+
+    def _last_day_on_or_before(self, day: int) -> Optional[int]:
+        index = bisect_right(self._days, day)
+        return self._days[index - 1] if index else None
+
+    def _rank(self, start: Optional[int], end: Optional[int]) -> List[Dict]:
+        totals = self._totals_through(end)
+        before = self._totals_through(start)
+
+        entries = []
+        for item_name, (rows, units, revenue) in totals.items():
+            earlier = before.get(item_name)
+            if earlier is not None:
+                if rows == earlier[0]:
+                    continue
+                if earlier[1] is not None:
+                    units -= earlier[1]
+                revenue -= earlier[2]
+            entries.append((item_name, units, revenue))
+
+        entries.sort(key=_ranking_key)
+        return [
+            {"item_name": item_name, "total_units": units, "total_revenue": revenue}
+            for item_name, units, revenue in entries
+        ]
+
+    def _totals_through(self, day: Optional[int]) -> _Totals:
+        # Cumulative totals of every sale dated on or before `day`, built from the nearest checkpoint
+        if day is None:
+            return {}
+
+        end = bisect_right(self._days, day)
+        index = end
+        while index > 0 and self._days[index - 1] not in self._cumulative:
+            index -= 1
+        totals = self._cumulative[self._days[index - 1]] if index else {}
+
+        for checkpoint_day in self._days[index:end]:
+            totals = {item_name: list(entry) for item_name, entry in totals.items()}
+            for item_name, (rows, units, revenue) in self._deltas[checkpoint_day].items():
+                _add(totals, item_name, rows, units, revenue)
+            self._cumulative[checkpoint_day] = totals
+        return totals
+
+
+def _add(totals: _Totals, item_name: Optional[str], rows: int, units: Optional[int], revenue: float) -> None:
+    entry = totals.get(item_name)
+    if entry is None:
+        totals[item_name] = [rows, units, revenue]
+        return
+    entry[0] += rows
+    if units is not None:
+        entry[1] = (entry[1] or 0) + units
+    entry[2] += revenue
@@ -0,0 +1,95 @@
+"""
+Integer day numbers for ledger dates.
+
+Transaction dates used to be stored and compared as text, so an as-of filter was a string
+comparison that depended on the format: the seed rows' `2025-01-01T00:00:00` sorts after
+`2025-01-01`, and is therefore excluded from an as-of read for that very day. The ledger
+now also stores every date as a day number, the number of days since 1970-01-01 (the
+NumPy `datetime64[D]` epoch), in the indexed `transactions.transaction_day` column, and
+every as-of filter compares integers. A date string's day is that of its first ten
+characters, so a timestamp counts towards its calendar day.
+
+The scalar helpers cache their results, since the same few as-of dates are converted over
+and over; the vectorized ones convert whole NumPy columns at once:
+
+    day_number("2025-04-15")                                # 20193
+    iso_date(20193)                                         # '2025-04-15'
+    day_numbers(["2025-01-01T00:00:00", "2025-04-15"])      # array([20089, 20193])
+    iso_dates(np.array([20089, 20193]))                     # array(['2025-01-01', '2025-04-15'])
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, Tuple, Union
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _parse_day(text: str) -> int:
+    return date.fromisoformat(text[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def day_number(value: Union[str, date, datetime]) -> int:
+    """
+    Day number of an ISO date or timestamp string, a date or a datetime.
+
+    Raises:
+        ValueError: If a string does not start with a YYYY-MM-DD date.
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    return _parse_day(value)
+
+
+@lru_cache(maxsize=4096)
+def iso_date(day: int) -> str:
+    """The YYYY-MM-DD date of a day number."""
+    return date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+
+
+def normalize_date(value: Union[str, date, datetime]) -> str:
+    """The YYYY-MM-DD form in which the ledger stores `value`."""
+    return iso_date(day_number(value))
+
+
+def month_days(month: str) -> Tuple[int, int]:
+    """First and last day number of a YYYY-MM month."""
+    first = date.fromisoformat(f"{month}-01")
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.toordinal() - _EPOCH_ORDINAL, following.toordinal() - _EPOCH_ORDINAL - 1
+
+
+def day_numbers(values: Iterable):
+    """
+    Day numbers of a sequence or array of ISO date strings, dates or `datetime64` values.
+
+    Returns:
+        np.ndarray: int64 day numbers.
+
+    Raises:
+        ValueError: If a string does not start with a YYYY-MM-DD date.
+    """
+    import numpy as np
+
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[D]").astype(np.int64)
+    if values.dtype.kind == "O":
+        return np.array([day_number(value) for value in values.ravel()], dtype=np.int64).reshape(values.shape)
+    # Keep the date part of timestamps; casting to a 10-character string truncates
+    return values.astype("U10").astype("datetime64[D]").astype(np.int64)
+
+
+def iso_dates(days):
+    """
+    YYYY-MM-DD strings of an array of day numbers.
+
+    Returns:
+        np.ndarray: A `<U10` array.
+    """
+    import numpy as np
+
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("U10")
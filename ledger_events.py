@@ -0,0 +1,301 @@
+"""
+Change-data-capture stream of committed ledger transactions.
+
+Every row that `create_transaction` inserts is published to a `LedgerEventStream` as a
+`LedgerEvent` whose offset is the row's transaction ID. Subscribers receive each event
+once, in offset order, and can keep derived state (stock per item, cash, top sellers)
+up to date incrementally instead of re-querying SQLite:
+
+    stock = StockProjection().attach(project_starter.get_ledger_events())
+    stock.units["A4 paper"]
+
+A new subscriber first replays every committed transaction after its starting offset
+from the ledger itself (an indexed range scan on the primary key), then receives live
+events, so it can never miss or double-count a transaction. When the ledger is reset
+or rolled back, subscribers are told to reset and are replayed from the start.
+
+The stream is in-process. With an optional append-only JSONL log, every event is also
+made durable for consumers in other processes; `read_event_log` replays it.
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class LedgerEvent(NamedTuple):
+    """One committed row of the `transactions` table."""
+    offset: int
+    item_name: Optional[str]
+    transaction_type: str
+    units: Optional[int]
+    price: float
+    transaction_date: str
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+class Subscription:
+    """
+    A registered subscriber and the offset of the last event delivered to it.
+    """
+
+    __slots__ = ("callback", "on_reset", "offset", "_stream")
+
+    def __init__(self, stream: "LedgerEventStream", callback: Callable[[LedgerEvent], None],
+                 on_reset: Optional[Callable[[], None]], offset: int):
+        self._stream = stream
+        self.callback = callback
+        self.on_reset = on_reset
+        self.offset = offset
+
+    def deliver(self, event: LedgerEvent) -> None:
+        if event.offset > self.offset:
+            self.callback(event)
+            self.offset = event.offset
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self._stream.unsubscribe(self)
+
+
+class LedgerEventStream:
+    """
+    Publish/subscribe hub for committed ledger transactions.
+
+    Args:
+        source (Callable): Returns the committed transactions with an ID above the given
+                           offset as (id, item_name, transaction_type, units, price,
+                           transaction_date) tuples, in ID order. Used for replays.
+        log_path (str, optional): JSONL file every published event is appended to.
+    """
+
+    def __init__(self, source: Callable[[int], Iterable[Tuple]], log_path: Optional[str] = None):
+        self.source = source
+        self.log_path = log_path
+        self.offset = 0
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.RLock()
+        self._log = None
+        self._logged_offset = 0
+
+        if log_path:
+            self._logged_offset = _last_logged_offset(log_path)
+            self._log = open(log_path, "a", encoding="utf-8")
+            # Bring the log up to date with writes made while no stream was running
+            self.offset = self._logged_offset
+            self.catch_up()
+
+    def replay(self, after_offset: int = 0) -> Iterator[LedgerEvent]:
+        """Committed events with an offset above `after_offset`, read from the ledger."""
+        for row in self.source(after_offset):
+            yield LedgerEvent(*row)
+
+    def subscribe(
+        self,
+        callback: Callable[[LedgerEvent], None],
+        after_offset: Optional[int] = 0,
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> Subscription:
+        """
+        Register `callback` for every committed event after `after_offset`.
+
+        Args:
+            callback (Callable): Called with each `LedgerEvent`, in offset order.
+            after_offset (int, optional): Replay committed events after this offset before
+                                          delivering live ones. Pass None to receive live
+                                          events only. Default is 0 (the whole ledger).
+            on_reset (Callable, optional): Called when the ledger is reset or rolled back,
+                                           before the subscriber is replayed from the start.
+
+        Returns:
+            Subscription: Handle whose `close()` stops delivery.
+        """
+        with self._lock:
+            subscription = Subscription(self, callback, on_reset, self.offset if after_offset is None else after_offset)
+            for event in self.replay(subscription.offset):
+                subscription.deliver(event)
+            self._subscriptions.append(subscription)
+            self.offset = max(self.offset, subscription.offset)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event: LedgerEvent) -> None:
+        """Append `event` to the log and deliver it to every subscriber."""
+        with self._lock:
+            if self._log is not None and event.offset > self._logged_offset:
+                self._log.write(json.dumps(event.to_dict()))
+                self._log.write("\n")
+                self._log.flush()
+                self._logged_offset = event.offset
+            for subscription in self._subscriptions:
+                subscription.deliver(event)
+            self.offset = max(self.offset, event.offset)
+
+    def catch_up(self) -> int:
+        """
+        Publish transactions committed outside this stream, e.g. by the ledger-writer process.
+
+        Returns:
+            int: Number of events published.
+        """
+        with self._lock:
+            if self.log_path:
+                # The other process may have appended to the log already
+                self._logged_offset = _last_logged_offset(self.log_path)
+            published = 0
+            for event in self.replay(self.offset):
+                self.publish(event)
+                published += 1
+            return published
+
+    def rewind(self) -> None:
+        """
+        Resynchronize after the ledger was reset or rolled back.
+
+        The log is rewritten from the ledger, and every subscriber is reset and replayed.
+        """
+        with self._lock:
+            self.offset = 0
+            if self._log is not None:
+                self._log.close()
+                self._log = open(self.log_path, "w", encoding="utf-8")
+                self._logged_offset = 0
+
+            for subscription in self._subscriptions:
+                if subscription.on_reset is not None:
+                    subscription.on_reset()
+                subscription.offset = 0
+            self.catch_up()
+
+    def close(self) -> None:
+        with self._lock:
+            self._subscriptions.clear()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _last_logged_offset(log_path: str) -> int:
+    if not os.path.exists(log_path):
+        return 0
+
+    last_line = b""
+    with open(log_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        # Read backwards until the last complete line is found
+        while position > 0 and last_line.count(b"\n") < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            last_line = f.read(step) + last_line
+    lines = [line for line in last_line.splitlines() if line.strip()]
+    return json.loads(lines[-1])["offset"] if lines else 0
+
+
+def read_event_log(log_path: str, after_offset: int = 0) -> Iterator[LedgerEvent]:
+    """
+    Replay a durable event log written by a `LedgerEventStream`.
+
+    Args:
+        log_path (str): The JSONL log.
+        after_offset (int, optional): Skip events up to and including this offset. Default is 0.
+    """
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                event = LedgerEvent(**json.loads(line))
+                if event.offset > after_offset:
+                    yield event
+
+
+class Projection(ABC):
+    """
+    Derived state maintained from the event stream.
+
+    Subclasses implement `apply` and `reset`; `attach` subscribes the projection and
+    replays the ledger into it.
+    """
+
+    def __init__(self):
+        self.subscription: Optional[Subscription] = None
+        self.reset()
+
+    def attach(self, stream: LedgerEventStream) -> "Projection":
+        self.subscription = stream.subscribe(self.apply, on_reset=self.reset)
+        return self
+
+    def detach(self) -> None:
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    @abstractmethod
+    def apply(self, event: LedgerEvent) -> None:
+        """Fold one event into the derived state."""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Clear the derived state; called on creation and when the ledger is reset or rolled back."""
+
+
+class StockProjection(Projection):
+    """Net units per item: stock orders minus sales."""
+
+    def reset(self) -> None:
+        self.units: Dict[str, int] = {}
+
+    def apply(self, event: LedgerEvent) -> None:
+        if event.item_name is None:
+            return
+        if event.transaction_type == "stock_orders":
+            self.units[event.item_name] = self.units.get(event.item_name, 0) + event.units
+        elif event.transaction_type == "sales":
+            self.units[event.item_name] = self.units.get(event.item_name, 0) - event.units
+
+
+class CashProjection(Projection):
+    """Sales revenue minus stock purchase costs."""
+
+    def reset(self) -> None:
+        self.balance = 0.0
+
+    def apply(self, event: LedgerEvent) -> None:
+        if event.transaction_type == "sales":
+            self.balance += event.price
+        elif event.transaction_type == "stock_orders":
+            self.balance -= event.price
+
+
+class SalesProjection(Projection):
+    """Units sold and revenue per item."""
+
+    def reset(self) -> None:
+        self.units: Dict[Optional[str], int] = {}
+        self.revenue: Dict[Optional[str], float] = {}
+
+    def apply(self, event: LedgerEvent) -> None:
+        if event.transaction_type != "sales":
+            return
+        if event.units is None:
+            # Matches SQL SUM over rows without units, e.g. the initial cash entry
+            self.units.setdefault(event.item_name, None)
+        else:
+            self.units[event.item_name] = (self.units.get(event.item_name) or 0) + event.units
+        self.revenue[event.item_name] = self.revenue.get(event.item_name, 0.0) + event.price
+
+    def top_sellers(self, limit: int = 5) -> List[Dict]:
+        """Best-selling items by revenue."""
+        ranked = sorted(self.revenue, key=self.revenue.get, reverse=True)[:limit]
+        return [
+            {"item_name": item_name, "total_units": self.units[item_name], "total_revenue": self.revenue[item_name]}
+            for item_name in ranked
+        ]
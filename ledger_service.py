@@ -0,0 +1,364 @@
+"""
+Multi-process worker mode for the Munder Difflin multi-agent system.
+
+`run_parallel_scenarios` spreads the sample requests over N worker processes, each
+running its own `OrchestratorAgent`. SQLite allows many readers but only one writer,
+so none of the workers write to the ledger directly: every `create_transaction` call
+is forwarded over a pipe to a single ledger-writer process, which performs the INSERT
+and publishes the ID of the last committed transaction in shared memory. Since writes
+are serialized there, the writer is also where they are checked against the ledger:
+workers finish out of date order, so a sale must leave the item's stock non-negative on
+its date and every later day, and a stock order must do the same for the cash balance.
+An order's lines arrive in one message and are committed together, or refused together.
+
+Run it from the command line with:
+
+    python project_starter.py --workers 4
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing.connection import Connection, wait
+from typing import Dict, List, Optional, Tuple
+
+from logging_config import get_logger, shutdown_logging
+from unit_of_work import unit_of_work
+
+log = get_logger("runner")
+
+# Seconds between checks that the workers are still alive while waiting for results
+RESULT_POLL_INTERVAL = 1.0
+
+
+class RemoteLedgerWriter:
+    """
+    Transaction writer installed in worker processes via `set_transaction_writer`.
+
+    Each call sends the transactions to the ledger-writer process and blocks until they
+    have been committed, so `create_transactions` keeps returning the new transaction IDs.
+    """
+
+    def __init__(self, conn: Connection, committed: "mp.sharedctypes.Synchronized"):
+        self.conn = conn
+        self.committed = committed
+        self._lock = threading.Lock()
+
+    def __call__(self, transactions: List[Tuple[str, str, int, float]], date_str: str) -> List[int]:
+        with self._lock:
+            self.conn.send((date_str, transactions))
+            status, payload = self.conn.recv()
+
+        if status == "refused":
+            import project_starter as ps
+            raise ps.TransactionRefused(f"Ledger writer refused the transactions: {payload}")
+        if status != "ok":
+            raise RuntimeError(f"Ledger writer failed to record the transactions: {payload}")
+        return payload
+
+    @property
+    def last_committed_id(self) -> int:
+        """ID of the most recent transaction committed by the ledger writer."""
+        return self.committed.value
+
+
+def _check_new_transactions(data_access, transactions: List[Tuple[str, str, int, float]], date_str: str) -> None:
+    """
+    Check transactions already written, but not committed, against every day from `date_str` on.
+
+    Raises:
+        TransactionRefused: If a sale leaves its item's stock, or a stock order the cash balance,
+                            below zero on `date_str` or any later day.
+    """
+    from project_starter import TransactionRefused
+
+    sold: Dict[str, int] = {}
+    spent = 0.0
+    for item_name, transaction_type, quantity, price in transactions:
+        if transaction_type == "sales" and item_name is not None:
+            sold[item_name] = sold.get(item_name, 0) + (quantity or 0)
+        elif transaction_type == "stock_orders":
+            spent += price
+    for item_name, quantity in sold.items():
+        lowest = data_access.lowest_stock_level(item_name, date_str)
+        if lowest < 0:
+            raise TransactionRefused(
+                f"Insufficient stock of {item_name} from {date_str} on: "
+                f"{lowest + quantity} units left, {quantity} requested"
+            )
+    if spent:
+        lowest = data_access.lowest_cash_balance(date_str)
+        if lowest < 0:
+            raise TransactionRefused(
+                f"Insufficient cash from {date_str} on: ${lowest + spent:.2f} left, ${spent:.2f} required"
+            )
+
+
+def _ledger_writer_main(conns: List[Connection], committed: "mp.sharedctypes.Synchronized") -> None:
+    """
+    Serve transaction writes from all workers until every worker has hung up.
+    """
+    import project_starter as ps
+
+    # Never reuse connections inherited from the parent process
+    ps.get_db_engine().dispose(close=False)
+    data_access = ps.get_data_access()
+
+    open_conns = list(conns)
+    while open_conns:
+        for conn in wait(open_conns):
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = None
+
+            # Workers send None when they are done; forked processes may still hold
+            # copies of the pipe, so EOF alone is not a reliable hang-up signal
+            if message is None:
+                open_conns.remove(conn)
+                continue
+
+            date_str, transactions = message
+
+            try:
+                # Inserted, checked and committed in one SQLite transaction, or rolled back
+                transaction_ids = ps.create_transactions(
+                    [(*transaction, None) for transaction in transactions],
+                    date_str,
+                    validate=lambda: _check_new_transactions(data_access, transactions, date_str),
+                )
+            except ps.TransactionRefused as e:
+                conn.send(("refused", str(e)))
+                continue
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+                continue
+
+            committed.value = transaction_ids[-1]
+            conn.send(("ok", transaction_ids))
+
+    # Forked processes exit without running atexit handlers: flush queued log records now
+    shutdown_logging()
+
+
+def _worker_main(
+    worker_id: int,
+    ledger_conn: Connection,
+    committed: "mp.sharedctypes.Synchronized",
+    tasks: "mp.Queue",
+    results: "mp.Queue",
+    route_models: bool = False,
+    llm_deadline: Optional[float] = None,
+) -> None:
+    """
+    Process requests from `tasks` with a private orchestrator until a None sentinel arrives.
+    """
+    import project_starter as ps
+
+    ps.get_db_engine().dispose(close=False)
+    ps.set_transaction_writer(RemoteLedgerWriter(ledger_conn, committed))
+    # Other workers write too: memoized reads must follow the shared commit counter
+    ps.set_ledger_version_source(lambda: committed.value)
+    ps.use_local_ledger_events()
+    orchestrator = ps.OrchestratorAgent()
+    if route_models:
+        from model_router import ModelRouter
+        orchestrator.model_router = ModelRouter.from_settings(ps.get_settings())
+    if llm_deadline is not None:
+        from llm_policy import CallPolicy
+        orchestrator.call_policy = CallPolicy(deadline=llm_deadline)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        request_id, row = task
+        request_date = row["request_date"]
+        request_with_date = f"{row['request']} (Date of request: {request_date})"
+
+        with unit_of_work(version=ps.get_ledger_version):
+            try:
+                response = orchestrator.process_request(
+                    request=request_with_date,
+                    date=request_date,
+                    job_type=row["job"],
+                    event_type=row["event"],
+                    items=row.get("items"),
+                )
+            except Exception as e:
+                response = f"Error processing request: {e}"
+
+            # Inside a `try` too: a worker that died here would leave its result missing
+            try:
+                report = ps.generate_financial_report(request_date)
+            except Exception as e:
+                log.error("[worker %d] Financial report for request %d failed: %s", worker_id, request_id, e,
+                          extra={"worker_id": worker_id, "request_id": request_id})
+                report = {"cash_balance": None, "inventory_value": None}
+        log.info("[worker %d] Request %d (%s) done", worker_id, request_id, request_date,
+                 extra={"worker_id": worker_id, "request_id": request_id})
+
+        results.put({
+            "request_id": request_id,
+            "request_date": request_date,
+            "cash_balance": report["cash_balance"],
+            "inventory_value": report["inventory_value"],
+            "response": response,
+        })
+
+        time.sleep(1)
+
+    if orchestrator.model_router is not None:
+        ps.log_model_routes(orchestrator.model_router, worker_id=worker_id)
+    if orchestrator.call_policy is not None:
+        ps.log_llm_calls(orchestrator.call_policy, worker_id=worker_id)
+    orchestrator.close()
+
+    ledger_conn.send(None)
+    ledger_conn.close()
+    shutdown_logging()
+
+
+def run_parallel_scenarios(
+    workers: int,
+    requests_path: str = "quote_requests_sample.csv",
+    results_path: str = "test_results.csv",
+    results_format: Optional[str] = None,
+    flush_every: int = 1,
+    extraction_batch_size: int = 1,
+    route_models: bool = False,
+    llm_deadline: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Run the test scenarios across `workers` processes sharing one ledger-writer process.
+
+    Requests are handed out in date order from a shared queue, so a worker picks up the
+    next request as soon as it is free. Because requests run concurrently, one request's
+    stock or cash check may not yet see what another worker committed, possibly for a later
+    day; the ledger writer then refuses the order or stock order that would oversell or
+    overspend, and it fails as a whole.
+
+    Results are streamed to `results_path` in completion order as they arrive.
+
+    Args:
+        workers (int): Number of worker processes to start.
+        requests_path (str, optional): CSV file with the requests to process.
+        results_path (str, optional): Where to stream results. Default is 'test_results.csv'.
+        results_format (str, optional): 'csv', 'jsonl' or 'parquet'; inferred from the extension if omitted.
+        flush_every (int, optional): Flush the results file after this many results. Default is 1.
+        extraction_batch_size (int, optional): If above 1, the items of all requests are extracted
+                                               up front in batches of this size, one model call per
+                                               batch, before they are handed to the workers.
+        route_models (bool, optional): Route the model calls of each worker by complexity
+                                       (see `run_test_scenarios`). Default is False.
+        llm_deadline (float, optional): Bound, hedge and circuit-break the model calls of each
+                                        worker (see `run_test_scenarios`). Default is None.
+
+    Returns:
+        List[Dict]: One result per request, ordered by request ID, with the same fields
+                    as `run_test_scenarios` writes to the results file.
+    """
+    import project_starter as ps
+    from result_sinks import open_result_sink
+
+    log.info("Initializing Database...")
+    ps.init_database(ps.get_db_engine())
+    with ps.get_db_engine().connect() as conn:
+        # Let workers keep reading while the ledger writer commits
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    ps.get_db_engine().dispose()
+
+    quote_requests_sample = ps.load_test_requests(requests_path)
+    if quote_requests_sample is None:
+        return []
+
+    ctx = mp.get_context()
+    committed = ctx.Value("q", 0)
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+
+    worker_conns, writer_conns = zip(*(ctx.Pipe() for _ in range(workers)))
+    writer = ctx.Process(target=_ledger_writer_main, args=(list(writer_conns), committed), name="ledger-writer")
+    writer.start()
+
+    processes = []
+    for worker_id, conn in enumerate(worker_conns, start=1):
+        process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, conn, committed, tasks, results, route_models, llm_deadline),
+            name=f"worker-{worker_id}",
+        )
+        process.start()
+        processes.append(process)
+
+    # The children hold their own copies of the pipe ends
+    for conn in list(worker_conns) + list(writer_conns):
+        conn.close()
+
+    extracted = {}
+    if extraction_batch_size > 1:
+        extractor = ps.OrchestratorAgent()
+        extractor.extraction_batch_size = extraction_batch_size
+        if route_models:
+            from model_router import ModelRouter
+            extractor.model_router = ModelRouter.from_settings(ps.get_settings())
+        if llm_deadline is not None:
+            from llm_policy import CallPolicy
+            extractor.call_policy = CallPolicy(deadline=llm_deadline)
+        extracted = extractor.extract_items_batch({
+            idx + 1: f"{row['request']} (Date of request: {row['request_date'].strftime('%Y-%m-%d')})"
+            for idx, row in quote_requests_sample.iterrows()
+        })
+
+    for idx, row in quote_requests_sample.iterrows():
+        tasks.put((idx + 1, {
+            "request": row["request"],
+            "request_date": row["request_date"].strftime("%Y-%m-%d"),
+            "job": row["job"],
+            "event": row["event"],
+            "items": extracted.get(idx + 1),
+        }))
+    for _ in processes:
+        tasks.put(None)
+
+    collected = []
+    with open_result_sink(results_path, results_format, flush_every=flush_every) as sink:
+        while len(collected) < len(quote_requests_sample):
+            try:
+                result = results.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                # A worker that died holds its request forever: stop waiting once none is left
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    log.error(
+                        "All workers exited with %d of %d results outstanding",
+                        len(quote_requests_sample) - len(collected), len(quote_requests_sample),
+                    )
+                    break
+                continue
+            sink.write(result)
+            collected.append(result)
+    for process in processes:
+        process.join()
+    crashed = [process.name for process in processes if process.exitcode]
+    if crashed:
+        log.error("Workers exited abnormally: %s", ", ".join(crashed))
+        # The writer waits for hang-ups the crashed workers never sent. Every worker has
+        # exited, so no write is in flight and stopping it loses nothing
+        writer.join(timeout=RESULT_POLL_INTERVAL)
+        if writer.is_alive():
+            writer.terminate()
+    writer.join()
+    ps.ledger_written_elsewhere()
+
+    collected.sort(key=lambda result: result["request_id"])
+
+    final_date = quote_requests_sample["request_date"].max().strftime("%Y-%m-%d")
+    final_report = ps.generate_financial_report(final_date)
+    log.info(
+        "\n===== FINAL FINANCIAL REPORT =====\nFinal Cash: $%.2f\nFinal Inventory: $%.2f",
+        final_report["cash_balance"], final_report["inventory_value"],
+    )
+
+    return collected
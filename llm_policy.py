@@ -0,0 +1,272 @@
+"""
+Deadlines, hedging and a circuit breaker for the orchestrator's model calls.
+
+A model call used to wait for as long as the provider took, so one slow response stalled
+its request and, in a serial run, every request after it. `CallPolicy.run` bounds each
+call instead:
+
+- **deadline**: the call gives up after `deadline` seconds with `DeadlineExceeded`. Each
+  attempt also passes the time left as the HTTP timeout, so an abandoned attempt ends by
+  the deadline too.
+- **hedging**: when the first attempt has not answered after the hedge delay, the p95 of
+  recent attempt latencies, a duplicate request is sent. The first answer wins; the other
+  attempt is cancelled if it has not started yet and otherwise ignored. Hedging after the
+  p95 duplicates about one call in twenty while cutting off the slowest tail.
+- **circuit breaker**: after `failure_threshold` consecutive provider failures the circuit
+  opens, and calls fail at once with `CircuitOpenError` for `reset_timeout` seconds, so the
+  callers' fallbacks answer without waiting on a degraded provider. Then a single probe call
+  is let through; its success closes the circuit.
+
+Only provider failures count towards the breaker: timeouts, connection errors, rate limits
+and server errors. A rejected request (e.g. a prompt over the context length) is the
+caller's problem and is raised unchanged.
+
+    policy = CallPolicy(deadline=20)
+    response = policy.run(lambda timeout: client.chat.completions.create(..., timeout=timeout))
+    policy.stats()["p99_latency"]
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from latency_stats import percentile
+from logging_config import get_logger
+
+log = get_logger("llm")
+
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the circuit is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when no attempt of a call answered within its deadline."""
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Whether `error` says the provider is degraded rather than that the request was bad."""
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status in (408, 409, 429)
+
+
+class CallPolicy:
+    """
+    Per-call deadlines, p95-delayed hedging and a circuit breaker around blocking calls.
+
+    Thread-safe: one policy may be shared by the threads of a run or a service, and should
+    be, since the breaker and the hedge delay learn from every call.
+    """
+
+    # Attempt latencies kept for the hedge delay and the percentiles in `stats`
+    latency_window = 1000
+    # Attempts measured before the hedge delay follows their p95
+    min_latency_samples = 20
+
+    def __init__(
+        self,
+        deadline: float = 30.0,
+        hedge: bool = True,
+        hedge_delay: float = 5.0,
+        min_hedge_delay: float = 0.5,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_workers: int = 32,
+    ):
+        """
+        Args:
+            deadline (float, optional): Seconds a call may take, hedge included. Default is 30.
+            hedge (bool, optional): Send a duplicate request for slow calls. Default is True.
+            hedge_delay (float, optional): Hedge delay in seconds until `min_latency_samples`
+                attempts have been measured. Default is 5.
+            min_hedge_delay (float, optional): Lower bound of the adaptive hedge delay, so a
+                fast provider is not flooded with duplicates. Default is 0.5.
+            failure_threshold (int, optional): Consecutive provider failures that open the
+                circuit. Default is 5.
+            reset_timeout (float, optional): Seconds the circuit stays open before a probe
+                call is let through. Default is 30.
+            max_workers (int, optional): Attempts in flight at once across all callers. Default is 32.
+        """
+        self.deadline = deadline
+        self.hedge = hedge
+        self.initial_hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self._consecutive_failures = 0
+        self._attempt_latencies = deque(maxlen=self.latency_window)
+        self._latencies = deque(maxlen=self.latency_window)
+        self._counts = {
+            "calls": 0, "succeeded": 0, "failed": 0, "deadline_exceeded": 0,
+            "rejected": 0, "hedged": 0, "hedge_wins": 0, "circuit_opened": 0,
+        }
+
+    @property
+    def state(self) -> str:
+        """The circuit state, one of `CIRCUIT_STATES`."""
+        with self._lock:
+            return self._state
+
+    def hedge_delay(self) -> float:
+        """Seconds after which a still unanswered call is hedged: the p95 of recent attempts."""
+        with self._lock:
+            if len(self._attempt_latencies) < self.min_latency_samples:
+                return self.initial_hedge_delay
+            p95 = percentile(sorted(self._attempt_latencies), 0.95)
+        return max(p95, self.min_hedge_delay)
+
+    def run(self, call: Callable[[float], Any], deadline: Optional[float] = None) -> Any:
+        """
+        Make one call under the policy.
+
+        Args:
+            call (Callable[[float], Any]): Makes the request with the given timeout in seconds,
+                the time left before the deadline, and returns the response. It may run twice,
+                concurrently, when the call is hedged.
+            deadline (float, optional): Overrides the policy's deadline for this call.
+
+        Returns:
+            Any: The response of the first attempt that answered.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            DeadlineExceeded: If no attempt answered in time.
+            Exception: Whatever the last failed attempt raised.
+        """
+        self._admit()
+        started = time.monotonic()
+        end = started + (self.deadline if deadline is None else deadline)
+        hedge_at = started + self.hedge_delay() if self.hedge else None
+        attempts: Dict[Future, bool] = {self._submit(call, end): False}
+        error: Optional[BaseException] = None
+
+        while attempts:
+            waiting_to_hedge = hedge_at is not None and len(attempts) == 1 and not any(attempts.values())
+            wake = min(end, hedge_at) if waiting_to_hedge else end
+            done, _ = wait(attempts, timeout=max(wake - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                is_hedge = attempts.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for loser in attempts:
+                    loser.cancel()
+                self._succeeded(time.monotonic() - started, is_hedge)
+                return value
+
+            now = time.monotonic()
+            if now >= end:
+                break
+            if waiting_to_hedge and attempts and now >= hedge_at:
+                attempts[self._submit(call, end)] = True
+                with self._lock:
+                    self._counts["hedged"] += 1
+
+        if attempts:
+            for future in attempts:
+                future.cancel()
+            error = DeadlineExceeded(f"No response within {end - started:.1f}s")
+            with self._lock:
+                self._counts["deadline_exceeded"] += 1
+        self._failed(error)
+        raise error
+
+    def _submit(self, call: Callable[[float], Any], end: float) -> Future:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-call")
+        return self._executor.submit(self._attempt, call, end)
+
+    def _attempt(self, call: Callable[[float], Any], end: float) -> Any:
+        started = time.monotonic()
+        value = call(max(end - started, 0.001))
+        # Losing attempts are measured too: timing only the winners would pull the
+        # p95 down with every hedge, and the hedge delay with it
+        with self._lock:
+            self._attempt_latencies.append(time.monotonic() - started)
+        return value
+
+    def _admit(self) -> None:
+        with self._lock:
+            self._counts["calls"] += 1
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._counts["rejected"] += 1
+                    raise CircuitOpenError("Model provider circuit is open after repeated failures")
+                self._state = "half_open"
+            if self._state == "half_open":
+                if self._probing:
+                    self._counts["rejected"] += 1
+                    raise CircuitOpenError("Model provider circuit is half-open; a probe call is in flight")
+                self._probing = True
+
+    def _succeeded(self, elapsed: float, is_hedge: bool) -> None:
+        with self._lock:
+            self._counts["succeeded"] += 1
+            if is_hedge:
+                self._counts["hedge_wins"] += 1
+            self._latencies.append(elapsed)
+            self._consecutive_failures = 0
+            self._probing = False
+            if self._state != "closed":
+                self._state = "closed"
+                log.info("Model provider circuit closed")
+
+    def _failed(self, error: BaseException) -> None:
+        with self._lock:
+            self._counts["failed"] += 1
+            probing, self._probing = self._probing, False
+            if not is_provider_failure(error):
+                # The provider answered, so it is not the one failing
+                self._consecutive_failures = 0
+                if probing:
+                    self._state = "closed"
+                return
+            self._consecutive_failures += 1
+            if probing or (self._state == "closed" and self._consecutive_failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._counts["circuit_opened"] += 1
+                log.warning(
+                    "Model provider circuit opened after %d consecutive failures (last: %s); "
+                    "calls fail fast for %gs",
+                    self._consecutive_failures, error, self.reset_timeout,
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Call outcomes, hedging and latency, in seconds.
+
+        Returns:
+            Dict[str, Any]: Counts of 'calls', 'succeeded', 'failed', 'deadline_exceeded',
+                            'rejected' (while the circuit was open), 'hedged', 'hedge_wins'
+                            and 'circuit_opened'; the 'hedge_rate' of calls, the 'circuit'
+                            state, the current 'hedge_delay', and the mean, p50, p95 and
+                            p99 'latency' of recent successful calls.
+        """
+        hedge_delay = self.hedge_delay()
+        with self._lock:
+            report: Dict[str, Any] = dict(self._counts)
+            report["hedge_rate"] = report["hedged"] / report["calls"] if report["calls"] else 0.0
+            report["circuit"] = self._state
+            report["hedge_delay"] = hedge_delay
+            latencies: List[float] = sorted(self._latencies)
+        if latencies:
+            report["mean_latency"] = sum(latencies) / len(latencies)
+            report["p50_latency"] = percentile(latencies, 0.50)
+            report["p95_latency"] = percentile(latencies, 0.95)
+            report["p99_latency"] = percentile(latencies, 0.99)
+        return report
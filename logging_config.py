@@ -0,0 +1,158 @@
+"""
+Structured, queue-backed logging for the Munder Difflin system.
+
+Every component logs through its own logger under the `munder_difflin` namespace:
+
+    munder_difflin.inventory      stock checks, reorders, supplier delivery estimates
+    munder_difflin.quoting        quotes
+    munder_difflin.ordering       sales
+    munder_difflin.orchestrator   request handling and LLM calls
+    munder_difflin.llm            deadlines, hedging and the circuit breaker (see `llm_policy`)
+    munder_difflin.db             database setup and ledger writes
+    munder_difflin.runner         batch runs and their progress reports
+    munder_difflin.service        the HTTP service (see `service`)
+
+`configure_logging` attaches a `QueueHandler` to the namespace, so a log call only
+formats and enqueues the record; a `QueueListener` thread does the terminal or file I/O.
+Output is either plain text (the message, with the level for warnings and errors) or one
+JSON object per line, including any fields passed with `extra=`. Until
+`configure_logging` is called, only warnings and errors reach stderr (Python's
+last-resort handler), so importing the module as a library stays quiet.
+
+Hot paths log at DEBUG with %-style arguments, which costs one cached level check when
+debug logging is off.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+from typing import Optional, TextIO
+
+LOGGER_NAMESPACE = "munder_difflin"
+COMPONENTS = ("inventory", "quoting", "ordering", "orchestrator", "db", "runner", "service", "llm")
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# logging.handlers pulls in socket and friends; it is imported by `configure_logging`
+_listener: Optional["logging.handlers.QueueListener"] = None
+_queue_handler: Optional["logging.handlers.QueueHandler"] = None
+
+
+def get_logger(component: str) -> logging.Logger:
+    """
+    Return the logger of a component, e.g. `get_logger("inventory")`.
+    """
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{component}")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, any `extra=` fields and,
+    for `logger.exception`, the formatted traceback.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    The bare message for INFO and DEBUG records, prefixed with the level and component otherwise.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if record.levelno >= logging.WARNING:
+            component = record.name.rpartition(".")[2]
+            return f"{record.levelname} ({component}): {message}"
+        return message
+
+
+def configure_logging(
+    level: str = "INFO",
+    json_output: bool = False,
+    stream: Optional[TextIO] = None,
+    log_file: Optional[str] = None,
+) -> None:
+    """
+    Route every component logger through a non-blocking queue to stdout or a file.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level (str, optional): Minimum level, e.g. 'DEBUG', 'INFO' or 'WARNING'. Default is 'INFO'.
+        json_output (bool, optional): Write one JSON object per record. Default is False.
+        stream (TextIO, optional): Where to write records. Default is stdout.
+        log_file (str, optional): Append records to this file instead of `stream`.
+    """
+    import logging.handlers
+    import queue
+
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    if log_file:
+        handler = logging.FileHandler(log_file, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if json_output else ConsoleFormatter())
+
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    logger.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and detach the queue handler.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger(LOGGER_NAMESPACE).removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def _restart_listener_in_child() -> None:
+    # The listener thread does not survive fork: give a forked worker its own queue and thread
+    import logging.handlers
+    import queue
+
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    logger.removeHandler(_queue_handler)
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    logger.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+atexit.register(shutdown_logging)
@@ -0,0 +1,297 @@
+"""
+Route each model call of the orchestrator to the cheapest model that can handle it.
+
+Without routing every call goes to the single configured model, whether the request
+names one item or twelve and whether the reply confirms a plain order or explains a
+partial fill. `ModelRouter.route` scores a call's complexity from the number of items,
+how vague the request is and, for customer replies, the outcome being explained:
+
+- **template**: trivial `completed` / `quote_only` replies are rendered from the result
+  with no model call at all (`render_response`).
+- **fast**: everything of ordinary complexity goes to the small, fast model.
+- **strong**: high-scoring calls go straight to the stronger model.
+
+`ModelRouter.complete` runs a call on the chosen model and escalates to the strong model
+when the fast model errors or its answer fails the caller's validation, so a hard case
+the score missed still gets a good answer. A call that ran out of its deadline, or was
+failed fast by an open circuit (see `llm_policy`), is not escalated: the strong model
+would get a fresh deadline, doubling the wait, or be failed fast as well. Per-route call
+counts, fallback rates and latencies are available from `stats()`.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from latency_stats import percentile
+from llm_policy import CircuitOpenError, DeadlineExceeded
+
+ROUTES = ("template", "fast", "strong")
+
+# Wording that leaves the quantities or the items open to interpretation
+_VAGUE = re.compile(
+    r"\b(?:about|around|approximately|roughly|some|several|a few|a couple|maybe|or so|assorted|various|"
+    r"variety|mix|any|whatever|either|if possible|not sure|depending)\b",
+    re.IGNORECASE,
+)
+# A number followed by a word ("500 sheets"), so prices, percentages and dates do not count
+_QUANTITY = re.compile(r"(?<![\w$.,/:-])(?:\d{1,3}(?:,\d{3})+|\d+)(?=\s+[A-Za-z])")
+
+
+class RouteDecision(NamedTuple):
+    """Where one model call goes and why."""
+
+    route: str
+    model: Optional[str]
+    score: int
+    kind: str
+
+
+def score_complexity(
+    kind: str,
+    request: str = "",
+    items: Optional[List[Dict]] = None,
+    result: Optional[Dict] = None,
+) -> int:
+    """
+    Score how hard a model call is; 0 is trivial.
+
+    Args:
+        kind (str): 'extract_items', 'extract_context' or 'response'.
+        request (str, optional): The customer request.
+        items (List[Dict], optional): The extracted items, if known. Otherwise the lines of
+            `result`, or before extraction the number of quantities mentioned in the
+            request, stand in for the item count.
+        result (Dict, optional): The processing result a customer reply explains.
+
+    Returns:
+        int: One point per item beyond the first, per vague phrase (at most 3) and for a
+             long request, plus points for outcomes that need explaining: 3 for a failed
+             order or a partial fill, 1 for a quote with nothing available, 1 for a discount.
+    """
+    if kind == "extract_context":
+        return 0
+
+    if items is None and result is not None:
+        items = (result.get("order") or result.get("quote") or {}).get("items")
+    if items is not None:
+        item_count = len(items)
+    else:
+        item_count = len(_QUANTITY.findall(request))
+    score = max(item_count - 1, 0)
+    score += min(len(_VAGUE.findall(request)), 3)
+    if len(request.split()) > 150:
+        score += 1
+
+    if kind == "response" and result is not None:
+        status = result.get("status")
+        if status == "failed" or result.get("error"):
+            score += 3
+        elif status == "quote_only":
+            lines = (result.get("quote") or {}).get("items", [])
+            available = sum(1 for line in lines if line.get("available"))
+            score += 3 if 0 < available < len(lines) else 1
+        quote = result.get("quote") or {}
+        if quote.get("discount_applied"):
+            score += 1
+    return score
+
+
+def render_response(result: Dict) -> str:
+    """
+    Write the customer reply for a `completed` or `quote_only` result without a model.
+
+    Args:
+        result (Dict): The processing result, as `OrchestratorAgent._settle_quote` returns it.
+
+    Returns:
+        str: The reply text.
+    """
+    if result.get("status") == "completed":
+        lines = (result.get("order") or {}).get("items", [])
+        ordered = _join(f"{line['quantity']} x {line['item_name']}" for line in lines)
+        return (
+            f"Thank you for your order! We have confirmed {ordered}. "
+            f"Your total comes to ${result.get('total_amount', 0):.2f}, and your items will be processed promptly. "
+            "We appreciate your business!"
+        )
+
+    quote = result.get("quote") or {}
+    lines = quote.get("items", [])
+    unavailable = [line for line in lines if not line.get("available")]
+    available = [line for line in lines if line.get("available")]
+    parts = ["Thank you for your inquiry."]
+    if unavailable:
+        parts.append(
+            f"Unfortunately we cannot currently supply {_join(line['item_name'] for line in unavailable)} "
+            "in the quantity requested."
+        )
+    if available:
+        priced = _join(
+            f"{line['quantity']} x {line['item_name']} (${line.get('item_total', 0):.2f})" for line in available
+        )
+        parts.append(f"We can offer {priced}.")
+    parts.append("Please let us know how you would like to proceed, and thank you for considering us.")
+    return " ".join(parts)
+
+
+def _join(parts) -> str:
+    parts = list(parts)
+    if len(parts) <= 1:
+        return "".join(parts)
+    return f"{', '.join(parts[:-1])} and {parts[-1]}"
+
+
+class ModelRouter:
+    """
+    Complexity-based routing between a template renderer, a fast model and a strong model.
+
+    Thread-safe: one router may be shared by the threads of a run or a service.
+    """
+
+    # Latencies kept per route for the percentiles in `stats`
+    latency_window = 1000
+
+    def __init__(
+        self,
+        fast_model: str,
+        strong_model: str,
+        strong_threshold: int = 4,
+        template_max_score: int = 1,
+        templates: bool = True,
+    ):
+        """
+        Args:
+            fast_model (str): Model for calls of ordinary complexity.
+            strong_model (str): Model for hard calls and for fallbacks from the fast model.
+            strong_threshold (int, optional): Calls scoring at least this go to the strong model. Default is 4.
+            template_max_score (int, optional): `completed` and `quote_only` replies scoring at most
+                this are rendered without a model. Default is 1.
+            templates (bool, optional): Allow the template route at all. Default is True.
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.strong_threshold = strong_threshold
+        self.template_max_score = template_max_score
+        self.templates = templates
+        self._lock = threading.Lock()
+        self._calls = {route: 0 for route in ROUTES}
+        self._fallbacks = {route: 0 for route in ROUTES}
+        self._errors = {route: 0 for route in ROUTES}
+        self._latencies = {route: deque(maxlen=self.latency_window) for route in ROUTES}
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Optional[str]]) -> "ModelRouter":
+        """Build a router from the 'fast_model_id' and 'strong_model_id' of `get_settings()`."""
+        return cls(fast_model=settings["fast_model_id"], strong_model=settings["strong_model_id"])
+
+    def route(
+        self,
+        kind: str,
+        request: str = "",
+        items: Optional[List[Dict]] = None,
+        result: Optional[Dict] = None,
+    ) -> RouteDecision:
+        """
+        Choose the route for one model call; see `score_complexity` for the arguments.
+
+        Returns:
+            RouteDecision: The route, the model to call (None for the template route) and the score.
+        """
+        score = score_complexity(kind, request, items, result)
+        if (
+            kind == "response"
+            and self.templates
+            and result is not None
+            and result.get("status") in ("completed", "quote_only")
+            and score <= self.template_max_score
+        ):
+            return RouteDecision("template", None, score, kind)
+        if score >= self.strong_threshold:
+            return RouteDecision("strong", self.strong_model, score, kind)
+        return RouteDecision("fast", self.fast_model, score, kind)
+
+    def complete(
+        self,
+        decision: RouteDecision,
+        call: Callable[[str], Any],
+        validate: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        """
+        Run a model call on the decided route, escalating from the fast to the strong model.
+
+        Args:
+            decision (RouteDecision): From `route`; must not be the template route.
+            call (Callable[[str], Any]): Makes the call for a model name and returns the response.
+            validate (Callable, optional): Turns the response into the caller's value, raising
+                if the answer is unusable; that counts as a failure of the route.
+
+        Returns:
+            Any: The validated value (or the raw response without `validate`).
+
+        Raises:
+            DeadlineExceeded, CircuitOpenError: If the fast model's call raised them; these are
+                                                not escalated.
+            Exception: Whatever the strong model's call or validation raised.
+        """
+        if decision.route == "fast":
+            try:
+                return self._timed("fast", decision.model, call, validate)
+            except (DeadlineExceeded, CircuitOpenError):
+                raise
+            except Exception:
+                with self._lock:
+                    self._fallbacks["fast"] += 1
+        return self._timed("strong", self.strong_model, call, validate)
+
+    def render(self, result: Dict) -> str:
+        """Render a reply on the template route, recording it like a model call."""
+        return self._timed("template", None, lambda _: render_response(result), None)
+
+    def _timed(self, route: str, model: Optional[str], call: Callable[[str], Any], validate) -> Any:
+        started = time.perf_counter()
+        try:
+            response = call(model)
+            value = validate(response) if validate is not None else response
+        except Exception:
+            with self._lock:
+                self._errors[route] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._calls[route] += 1
+                self._latencies[route].append(elapsed)
+        return value
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Calls, failures and latency per route, in seconds.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per route that was used: 'calls', 'share' of all calls,
+                                         'errors', 'fallbacks' (failed fast calls retried on the
+                                         strong model) and 'fallback_rate', and the mean, p50
+                                         and p95 'latency' of the recent calls.
+        """
+        with self._lock:
+            calls = dict(self._calls)
+            total = sum(calls.values())
+            report = {}
+            for route in ROUTES:
+                if not calls[route]:
+                    continue
+                latencies = sorted(self._latencies[route])
+                report[route] = {
+                    "calls": calls[route],
+                    "share": calls[route] / total,
+                    "errors": self._errors[route],
+                    "fallbacks": self._fallbacks[route],
+                    "fallback_rate": self._fallbacks[route] / calls[route],
+                    "mean_latency": sum(latencies) / len(latencies),
+                    "p50_latency": percentile(latencies, 0.50),
+                    "p95_latency": percentile(latencies, 0.95),
+                }
+        return report
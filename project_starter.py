@@ -1,19 +1,522 @@
-import pandas as pd
-import numpy as np
+from __future__ import annotations
+
 import os
+import sys
 import time
-import dotenv
 import ast
-from sqlalchemy.sql import text
-from datetime import datetime, timedelta
-from typing import Dict, List, Union, Any, Callable
-from sqlalchemy import create_engine, Engine
-from pydantic import BaseModel, Field
-from openai import OpenAI
-from dotenv import load_dotenv
+import json
+import threading
+import contextvars
+from datetime import datetime
+from collections import deque
+from itertools import groupby
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union, Any, Callable, Optional
+from checkpoint import RunCheckpoint, committed_result_ids, file_digest, request_key
+from data_access import DataAccess, check_schema, sqlite_path_from_url
+from history_store import RequestHistory
+from ledger_dates import day_number, iso_date, normalize_date
+from leaderboard import SalesLeaderboard
+from logging_config import configure_logging, get_logger
+from ledger_events import LedgerEvent, LedgerEventStream
+from records import Order, Quote, QuoteLine
+from result_sinks import RESULT_FORMATS, open_result_sink
+from scheduler import POLICIES as SCHEDULE_POLICIES, RequestScheduler, parse_deadline
+from step_graph import StepGraph
+from unit_of_work import unit_of_work
+
+# pandas, numpy, SQLAlchemy and openai are imported where they are first needed, so that
+# importing this module (e.g. for a single helper such as `get_supplier_delivery_date`)
+# stays cheap. The database engine and the OpenAI client are created on first use.
+if TYPE_CHECKING:
+    import argparse
+    import pandas as pd
+    from openai import OpenAI
+    from sqlalchemy import Engine
+    from archive import LedgerArchive
+    from llm_policy import CallPolicy
+    from model_router import ModelRouter
+    from storage import StorageBackend
+    from warehouses import WarehouseNetwork
+
+# Per-component loggers, see logging_config.py
+db_log = get_logger("db")
+inventory_log = get_logger("inventory")
+quoting_log = get_logger("quoting")
+ordering_log = get_logger("ordering")
+orchestrator_log = get_logger("orchestrator")
+runner_log = get_logger("runner")
+
+# SQLite database used by all helpers
+DB_URL = "sqlite:///munder_difflin.db"
+
+_db_engine: Optional[Engine] = None
+_data_access: Optional[StorageBackend] = None
+# Storage backend behind `get_data_access` (see storage.py and `use_storage`)
+_storage_backend = "sqlite"
+# Cold archive of closed months in front of the storage backend (see archive.py and `use_archive`)
+_archive: Optional[LedgerArchive] = None
+_client: Optional[OpenAI] = None
+_settings: Optional[Dict[str, Optional[str]]] = None
+_ledger_events: Optional[LedgerEventStream] = None
+_sales_leaderboard: Optional[SalesLeaderboard] = None
+_init_lock = threading.Lock()
+
+# Optional durable JSONL log of committed ledger events (see `ledger_events`)
+LEDGER_EVENT_LOG = os.getenv("LEDGER_EVENT_LOG")
+
+def get_db_engine() -> Engine:
+    """
+    Return the shared SQLAlchemy engine, creating it on first use.
+
+    Returns:
+        Engine: The engine connected to `DB_URL`.
+    """
+    global _db_engine
+    if _db_engine is None:
+        with _init_lock:
+            if _db_engine is None:
+                from sqlalchemy import create_engine
+                _db_engine = create_engine(DB_URL)
+    return _db_engine
+
+def get_data_access() -> StorageBackend:
+    """
+    Return the shared storage backend for the ledger and the catalog, creating it on first use.
+
+    Returns:
+        StorageBackend: `DataAccess` queries against the `DB_URL` database, or a `MemoryLedger`
+                        loaded from it after `use_storage("memory")`.
+    """
+    global _data_access
+    if _data_access is None:
+        with _init_lock:
+            if _data_access is None:
+                if _storage_backend == "sqlite":
+                    data_access = DataAccess(sqlite_path_from_url(DB_URL))
+                else:
+                    from storage import open_storage
+                    data_access = open_storage(_storage_backend, sqlite_path_from_url(DB_URL))
+                if _archive is not None:
+                    from archive import ArchivedStorage
+                    data_access = ArchivedStorage(data_access, _archive)
+                _data_access = data_access
+    return _data_access
+
+def check_database() -> None:
+    """
+    Fail fast if the `DB_URL` database predates the current schema, e.g. before serving requests.
+
+    Raises:
+        RuntimeError: Saying what is missing and how to migrate or reset the database.
+    """
+    check_schema(sqlite_path_from_url(DB_URL))
+
+def use_storage(backend: str) -> None:
+    """
+    Choose where the helpers keep the ledger and the catalog.
+
+    With "memory", the next use loads them from the `DB_URL` database and every read and
+    write is then served from memory; transactions reach the database file only when the
+    backend is flushed (`get_data_access().flush()`, done by `run_test_scenarios` whenever
+    it saves results). Unflushed transactions are dropped when the backend is switched.
+
+    Args:
+        backend (str): 'sqlite' (the default) or 'memory'.
+
+    Raises:
+        ValueError: If `backend` is not supported.
+    """
+    global _storage_backend, _data_access
+    if backend not in ("sqlite", "memory"):
+        raise ValueError(f"Unsupported storage backend {backend!r}; expected 'sqlite' or 'memory'")
+    with _init_lock:
+        if _data_access is not None:
+            _data_access.close()
+        _storage_backend = backend
+        _data_access = None
+    if os.path.exists(sqlite_path_from_url(DB_URL)):
+        ledger_rewound()
+
+def use_archive(directory: Optional[str]) -> Optional[LedgerArchive]:
+    """
+    Read the ledger together with the archive of closed months in `directory`, or stop using one.
+
+    Transactions are moved into the archive by `archive_ledger`. Reads then combine the
+    archive with the hot `transactions` table; rolling back archived transactions is refused.
+
+    Args:
+        directory (str or None): The archive directory (see `archive.ARCHIVE_DIR`); None for no archive.
+
+    Returns:
+        LedgerArchive or None: The archive in use.
+    """
+    global _archive, _data_access
+    if directory is not None:
+        from archive import ArchivedStorage, LedgerArchive
+    with _init_lock:
+        hot = getattr(_data_access, "hot", _data_access)
+        _archive = LedgerArchive(directory) if directory is not None else None
+        _data_access = ArchivedStorage(hot, _archive) if (hot is not None and _archive is not None) else hot
+    if os.path.exists(sqlite_path_from_url(DB_URL)):
+        ledger_rewound()
+    return _archive
+
+def archive_ledger(before_date: str) -> int:
+    """
+    Move the transactions of every month before the month of `before_date` into the archive.
+
+    Args:
+        before_date (str): E.g. '2025-04-01' archives everything dated up to the end of March.
+
+    Returns:
+        int: The number of transactions moved.
+
+    Raises:
+        ValueError: If no archive is in use (see `use_archive`).
+    """
+    if _archive is None:
+        raise ValueError("No ledger archive in use; call use_archive first")
+    moved = _archive.archive(get_data_access().hot, before_date)
+    ledger_rewound()
+    db_log.info("Archived %d transactions dated before %s", moved, before_date[:7])
+    return moved
+
+def get_ledger_events() -> LedgerEventStream:
+    """
+    Return the change-data-capture stream of committed transactions, creating it on first use.
+
+    Returns:
+        LedgerEventStream: Publishes every transaction this process writes; replays read the
+                           current database, so the stream follows `use_database`.
+    """
+    global _ledger_events
+    if _ledger_events is None:
+        # The stream replays from the ledger while it is created, outside `_init_lock`
+        get_data_access()
+        with _init_lock:
+            if _ledger_events is None:
+                _ledger_events = LedgerEventStream(
+                    lambda offset: get_data_access().transactions_after(offset), log_path=LEDGER_EVENT_LOG
+                )
+    return _ledger_events
+
+def get_sales_leaderboard() -> SalesLeaderboard:
+    """
+    Return the top-sellers leaderboard, attached to the ledger event stream on first use.
+
+    Returns:
+        SalesLeaderboard: Per-item units and revenue, kept current by `create_transaction`.
+    """
+    global _sales_leaderboard
+    if _sales_leaderboard is None:
+        events = get_ledger_events()
+        with _init_lock:
+            if _sales_leaderboard is None:
+                _sales_leaderboard = SalesLeaderboard().attach(events)
+    return _sales_leaderboard
+
+def use_local_ledger_events() -> None:
+    """
+    Drop the event stream and leaderboard inherited from a parent process.
+
+    Used by parallel workers: the ledger-writer process owns the durable event log, and the
+    worker's own stream is rebuilt from the ledger on first use.
+    """
+    global LEDGER_EVENT_LOG, _ledger_events, _sales_leaderboard
+    LEDGER_EVENT_LOG = None
+    _ledger_events = None
+    _sales_leaderboard = None
+
+def use_database(url: str) -> None:
+    """
+    Point every helper at a different SQLite database, e.g. a scratch file for benchmarks.
+
+    Args:
+        url (str): A `sqlite:///path` URL.
+    """
+    global DB_URL, _db_engine, _data_access
+    with _init_lock:
+        if _db_engine is not None:
+            _db_engine.dispose()
+        if _data_access is not None:
+            _data_access.close()
+        DB_URL = url
+        _db_engine = None
+        _data_access = None
+    if os.path.exists(sqlite_path_from_url(url)):
+        ledger_rewound()
+    else:
+        # Nothing to replay until the new database is initialized
+        bump_ledger_version()
+
+# Fulfillment sites with partitioned ledgers (see warehouses.py); None keeps the single ledger
+_warehouses: Optional[WarehouseNetwork] = None
+_warehouse_layout: Optional[tuple] = None
+
+def use_warehouses(
+    shares: Optional[Dict[str, float]],
+    directory: Optional[str] = None,
+    create: bool = True,
+) -> Optional[WarehouseNetwork]:
+    """
+    Partition the ledger across fulfillment sites, or go back to the single ledger.
 
-# Create an SQLite database
-db_engine = create_engine("sqlite:///munder_difflin.db")
+    The site databases are created from the current ledger, and recreated whenever
+    `init_database` resets it. Sales and stock orders are then booked at a site, while
+    reads fan out across all of them. The event stream, the leaderboard and resumable
+    checkpoints follow the main database only, so they are not used while sites are active.
+
+    Args:
+        shares (Dict[str, float] or None): Share of the stock held by each site, e.g.
+                                           {"east": 0.5, "west": 0.5}; None for a single ledger.
+        directory (str, optional): Where the site databases are created. Default is `warehouses.WAREHOUSE_DIR`.
+        create (bool, optional): Create the site databases now; if False they are created by the
+                                 next `init_database`, e.g. before the main database exists. Default is True.
+
+    Returns:
+        WarehouseNetwork or None: The new network, or None if it is not created yet.
+    """
+    global _warehouses, _warehouse_layout
+    if _warehouses is not None:
+        _warehouses.close()
+    _warehouses = None
+    _warehouse_layout = (dict(shares), directory) if shares else None
+    if shares and create:
+        from warehouses import WAREHOUSE_DIR, WarehouseNetwork
+        _warehouses = WarehouseNetwork.partition(get_data_access(), shares, directory or WAREHOUSE_DIR)
+    bump_ledger_version()
+    return _warehouses
+
+def get_warehouses() -> Optional[WarehouseNetwork]:
+    """The active warehouse network, or None when the ledger is not partitioned."""
+    return _warehouses
+
+def get_ledger() -> Union[StorageBackend, WarehouseNetwork]:
+    """
+    Where stock and cash are read and transactions are written.
+
+    Returns:
+        StorageBackend or WarehouseNetwork: The warehouse network if sites are active, else the storage backend.
+    """
+    return _warehouses if _warehouses is not None else get_data_access()
+
+def get_settings() -> Dict[str, Optional[str]]:
+    """
+    Load the `.env` file on first use and return the OpenAI connection settings.
+
+    Returns:
+        Dict: 'api_key', 'api_base' and 'model_id', plus the 'fast_model_id' and
+              'strong_model_id' used by model routing (see model_router.py).
+    """
+    global _settings
+    if _settings is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _settings = {
+            "api_key": os.getenv("OPENAI_API_KEY"),
+            "api_base": os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1"),
+            "model_id": os.getenv("OPENAI_MODEL_ID", "gpt-4o-mini"),
+        }
+        _settings["fast_model_id"] = os.getenv("OPENAI_FAST_MODEL_ID", _settings["model_id"])
+        _settings["strong_model_id"] = os.getenv("OPENAI_STRONG_MODEL_ID", "gpt-4o")
+    return _settings
+
+def get_model_id() -> str:
+    """Return the configured model ID."""
+    return get_settings()["model_id"]
+
+def get_openai_client(timeout: Optional[float] = None) -> OpenAI:
+    """
+    Return the shared OpenAI client, creating it on first use.
+
+    Args:
+        timeout (float, optional): Per-request timeout in seconds. If given, a copy of the
+                                   shared client with this timeout is returned.
+
+    Returns:
+        OpenAI: A client configured from `get_settings()`.
+    """
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                from openai import OpenAI
+                settings = get_settings()
+                _client = OpenAI(api_key=settings["api_key"], base_url=settings["api_base"])
+    if timeout is not None:
+        return _client.with_options(timeout=timeout)
+    return _client
+
+# Module attributes kept for code written against the eager globals
+_LAZY_ATTRIBUTES = {
+    "db_engine": get_db_engine,
+    "client": get_openai_client,
+    "MODEL_ID": get_model_id,
+    "API_KEY": lambda: get_settings()["api_key"],
+    "API_BASE": lambda: get_settings()["api_base"],
+}
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class TransactionRefused(RuntimeError):
+    """Raised when the ledger refuses transactions it cannot take, e.g. a sale of stock already sold."""
+
+# Optional replacement for the local INSERT in `create_transactions`. Worker processes
+# install a writer that forwards the transactions to the ledger-writer process
+# (see ledger_service.py), so that a single process owns all ledger writes.
+_transaction_writer: Optional[Callable[[List[Tuple[str, str, int, float]], str], List[int]]] = None
+
+def set_transaction_writer(writer: Optional[Callable[[List[Tuple[str, str, int, float]], str], List[int]]]) -> None:
+    """
+    Route `create_transactions` writes through `writer` instead of the local database.
+
+    Args:
+        writer (Callable or None): Called as writer(transactions, date_str) with one
+                                   (item_name, transaction_type, quantity, price) per transaction;
+                                   must record all of them and return the new transaction IDs, or
+                                   record none and raise (`TransactionRefused` for a refusal).
+                                   Pass None to restore local writes.
+    """
+    global _transaction_writer
+    _transaction_writer = writer
+
+# Monotonically increasing ledger version, bumped by every write to the database.
+# Read helpers decorated with `ledger_memoize` reuse results computed at the current version.
+_ledger_version = 0
+_ledger_version_lock = threading.Lock()
+_ledger_version_source: Optional[Callable[[], int]] = None
+
+# Held from a request's quote to its sale and reorders, so requests processed concurrently in
+# one process (e.g. by the service's workers) never sell stock another request already sold
+_settlement_lock = threading.RLock()
+
+def get_ledger_version() -> int:
+    """
+    Return the current ledger version.
+
+    Returns:
+        int: The local write counter, plus the value of the source installed with
+             `set_ledger_version_source` (e.g. the ledger writer's last committed ID in worker mode).
+             Both only ever grow, so the sum never repeats a version cached before the switch.
+    """
+    if _ledger_version_source is not None:
+        return _ledger_version + _ledger_version_source()
+    return _ledger_version
+
+def bump_ledger_version() -> int:
+    """
+    Advance the ledger version, invalidating every memoized read.
+
+    Returns:
+        int: The new version.
+    """
+    global _ledger_version
+    with _ledger_version_lock:
+        _ledger_version += 1
+        return _ledger_version
+
+def set_ledger_version_source(source: Optional[Callable[[], int]]) -> None:
+    """
+    Derive the ledger version from `source` instead of the local write counter.
+
+    Args:
+        source (Callable or None): Returns a value that changes whenever the ledger does.
+                                   Pass None to use the local counter again.
+    """
+    global _ledger_version_source
+    _ledger_version_source = source
+    bump_ledger_version()
+
+def ledger_rewound() -> None:
+    """
+    Invalidate all derived ledger state after the ledger was reset, rolled back or replaced.
+
+    Bumps the ledger version and resynchronizes the event stream and its subscribers.
+    """
+    bump_ledger_version()
+    if _ledger_events is not None or LEDGER_EVENT_LOG:
+        get_ledger_events().rewind()
+
+def ledger_written_elsewhere() -> None:
+    """
+    Pick up transactions committed by another process, e.g. the ledger writer of a parallel run.
+    """
+    bump_ledger_version()
+    if _ledger_events is not None:
+        _ledger_events.catch_up()
+
+def _freeze(value: Any) -> Any:
+    # Hashable stand-in for (possibly nested) dict and list arguments
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+# Set by `skip_ledger_memoize` during a memoized read whose result must not be cached
+_memoize_skipped = contextvars.ContextVar("memoize_skipped", default=False)
+
+def skip_ledger_memoize() -> None:
+    """
+    Keep the result of the memoized read in progress out of the cache, e.g. an error fallback.
+
+    Memoized reads that call it, directly or through other memoized reads, are not cached either.
+    """
+    _memoize_skipped.set(True)
+
+def ledger_memoize(func: Callable = None, *, maxsize: int = 1024) -> Callable:
+    """
+    Memoize a ledger read helper on (function, arguments, ledger version).
+
+    A result is only reused while no transaction has been written since it was computed,
+    so memoized reads can never be stale. Cached results are shared between callers and
+    must be treated as read-only. A read that falls back on an error calls
+    `skip_ledger_memoize`, so the next call retries instead of reusing the fallback.
+
+    Args:
+        func (Callable): The read helper to wrap.
+        maxsize (int, optional): Entries kept per version before the cache is cleared. Default is 1024.
+    """
+    import functools
+
+    def decorator(func: Callable) -> Callable:
+        cache: Dict[Any, Any] = {}
+        state = {"version": None}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            version = get_ledger_version()
+            if state["version"] != version or len(cache) >= maxsize:
+                cache.clear()
+                state["version"] = version
+
+            key = (_freeze(args), _freeze(kwargs))
+            try:
+                return cache[key]
+            except KeyError:
+                token = _memoize_skipped.set(False)
+                try:
+                    result = func(*args, **kwargs)
+                    skipped = _memoize_skipped.get()
+                finally:
+                    _memoize_skipped.reset(token)
+                if skipped:
+                    # Enclosing memoized reads were computed from this result
+                    _memoize_skipped.set(True)
+                # Only keep the result if no write happened while computing it
+                elif get_ledger_version() == version:
+                    cache[key] = result
+                return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
 
 # List containing the different kinds of papers 
 paper_supplies = [
@@ -74,31 +577,24 @@ paper_supplies = [
 
 # Given below are some utility functions you can use to implement your multi-agent system
 
-def generate_sample_inventory(paper_supplies: list, coverage: float = 0.4, seed: int = 137) -> pd.DataFrame:
+def sample_inventory_records(paper_supplies: list, coverage: float = 0.4, seed: int = 137) -> List[Dict]:
     """
-    Generate inventory for exactly a specified percentage of items from the full paper supply list.
+    Generate inventory records for a specified percentage of items from the full paper supply list.
 
-    This function randomly selects exactly `coverage` × N items from the `paper_supplies` list,
-    and assigns each selected item:
-    - a random stock quantity between 200 and 800,
-    - a minimum stock level between 50 and 150.
-
-    The random seed ensures reproducibility of selection and stock levels.
+    This is the record-level core of `generate_sample_inventory`, used by the bulk database loader
+    so that it does not need pandas. See `generate_sample_inventory` for the selection rules.
 
     Args:
-        paper_supplies (list): A list of dictionaries, each representing a paper item with
-                               keys 'item_name', 'category', and 'unit_price'.
+        paper_supplies (list): A list of dictionaries with keys 'item_name', 'category', and 'unit_price'.
         coverage (float, optional): Fraction of items to include in the inventory (default is 0.4, or 40%).
         seed (int, optional): Random seed for reproducibility (default is 137).
 
     Returns:
-        pd.DataFrame: A DataFrame with the selected items and assigned inventory values, including:
-                      - item_name
-                      - category
-                      - unit_price
-                      - current_stock
-                      - min_stock_level
+        List[Dict]: One dict per selected item with keys 'item_name', 'category', 'unit_price',
+                    'current_stock' and 'min_stock_level'.
     """
+    import numpy as np
+
     # Ensure reproducible random output
     np.random.seed(seed)
 
@@ -122,14 +618,240 @@ def generate_sample_inventory(paper_supplies: list, coverage: float = 0.4, seed:
             "item_name": item["item_name"],
             "category": item["category"],
             "unit_price": item["unit_price"],
-            "current_stock": np.random.randint(200, 800),  # Realistic stock range
-            "min_stock_level": np.random.randint(50, 150)  # Reasonable threshold for reordering
+            "current_stock": int(np.random.randint(200, 800)),  # Realistic stock range
+            "min_stock_level": int(np.random.randint(50, 150))  # Reasonable threshold for reordering
         })
 
+    return inventory
+
+def generate_sample_inventory(paper_supplies: list, coverage: float = 0.4, seed: int = 137) -> pd.DataFrame:
+    """
+    Generate inventory for exactly a specified percentage of items from the full paper supply list.
+
+    This function randomly selects exactly `coverage` × N items from the `paper_supplies` list,
+    and assigns each selected item:
+    - a random stock quantity between 200 and 800,
+    - a minimum stock level between 50 and 150.
+
+    The random seed ensures reproducibility of selection and stock levels.
+
+    Args:
+        paper_supplies (list): A list of dictionaries, each representing a paper item with
+                               keys 'item_name', 'category', and 'unit_price'.
+        coverage (float, optional): Fraction of items to include in the inventory (default is 0.4, or 40%).
+        seed (int, optional): Random seed for reproducibility (default is 137).
+
+    Returns:
+        pd.DataFrame: A DataFrame with the selected items and assigned inventory values, including:
+                      - item_name
+                      - category
+                      - unit_price
+                      - current_stock
+                      - min_stock_level
+    """
+    import pandas as pd
+
     # Return inventory as a pandas DataFrame
-    return pd.DataFrame(inventory)
+    return pd.DataFrame(sample_inventory_records(paper_supplies, coverage, seed))
+
+# Prebuilt databases are cached here, keyed by a hash of everything that goes into them
+DB_TEMPLATE_DIR = ".db_templates"
+
+# Bump when the schema, the seeding logic below or the quote_lines parser changes, to
+# invalidate cached templates
+DB_TEMPLATE_VERSION = 3
+
+DB_SCHEMA = """
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY,
+        item_name TEXT,
+        transaction_type TEXT,  -- 'stock_orders' or 'sales'
+        units INTEGER,          -- Quantity involved
+        price REAL,             -- Total price for the transaction
+        transaction_date TEXT,  -- YYYY-MM-DD
+        transaction_day INTEGER -- The same date as days since 1970-01-01, see ledger_dates.py
+    );
+    CREATE INDEX idx_transactions_item_day ON transactions (item_name, transaction_day);
+    CREATE TABLE quote_requests (
+        mood TEXT, job TEXT, need_size TEXT, event TEXT, response TEXT, id INTEGER
+    );
+    CREATE TABLE quotes (
+        request_id INTEGER, total_amount NUMERIC, quote_explanation TEXT, order_date TEXT,
+        job_type TEXT, order_size TEXT, event_type TEXT
+    );
+    CREATE TABLE quote_lines (
+        request_id INTEGER,     -- The quote the line was parsed from
+        item_name TEXT,         -- Catalog item, NULL if the text names none
+        item_text TEXT,         -- Item phrase as written in the explanation
+        quantity INTEGER,
+        unit_price REAL,        -- NULL if the explanation states none
+        discount_rate REAL,     -- Quote-level rate, NULL if unknown
+        order_size TEXT, event_type TEXT, job_type TEXT
+    );
+    CREATE INDEX idx_quote_lines_item_quantity ON quote_lines (item_name, quantity);
+    CREATE TABLE inventory (
+        item_name TEXT, category TEXT, unit_price REAL, current_stock INTEGER, min_stock_level INTEGER
+    );
+"""
+
+def _database_template_key(seed: int) -> str:
+    """
+    Hash the CSV inputs, the seed, the supply catalog and the template version.
+    """
+    import hashlib
+
+    digest = hashlib.sha256(f"{DB_TEMPLATE_VERSION}|{seed}|{paper_supplies!r}".encode())
+    for path in ("quote_requests.csv", "quotes.csv"):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def _read_csv_records(path: str) -> List[Dict[str, Optional[str]]]:
+    import csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        return [{key: (value if value != "" else None) for key, value in row.items()} for row in csv.DictReader(f)]
+
+def _to_number(value: Optional[str]) -> Optional[Union[int, float]]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def bulk_load_database(conn: Any, seed: int = 137) -> None:
+    """
+    Create all tables and seed records on a raw sqlite3 connection in a single transaction.
+
+    Rows are inserted with `executemany`; no pandas DataFrames are built. The quote
+    explanations are parsed once here into the indexed `quote_lines` table.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to an empty (or disposable) database.
+        seed (int, optional): Random seed for the generated inventory. Default is 137.
+    """
+    # Set a consistent starting date
+    initial_date = datetime(2025, 1, 1).isoformat()
+
+    quote_requests = _read_csv_records("quote_requests.csv")
+    quotes = _read_csv_records("quotes.csv")
+    inventory = sample_inventory_records(paper_supplies, seed=seed)
+
+    quote_rows = []
+    for request_id, quote in enumerate(quotes, start=1):
+        # Unpack metadata fields (job_type, order_size, event_type) if present
+        metadata = ast.literal_eval(quote["request_metadata"]) if quote.get("request_metadata") else {}
+        quote_rows.append((
+            request_id,
+            _to_number(quote["total_amount"]),
+            quote["quote_explanation"],
+            initial_date,
+            metadata.get("job_type", ""),
+            metadata.get("order_size", ""),
+            metadata.get("event_type", ""),
+        ))
+
+    from quote_lines import parse_quote_history
+
+    quote_line_rows = [
+        (
+            line["request_id"], line["item_name"], line["item_text"], line["quantity"], line["unit_price"],
+            line["discount_rate"], line["order_size"], line["event_type"], line["job_type"],
+        )
+        for line in parse_quote_history(
+            (
+                {
+                    "request_id": request_id, "quote_explanation": explanation, "total_amount": total_amount,
+                    "job_type": job_type, "order_size": order_size, "event_type": event_type,
+                }
+                for request_id, total_amount, explanation, _, job_type, order_size, event_type in quote_rows
+            ),
+            (item["item_name"] for item in paper_supplies),
+        )
+    ]
+
+    # Starting cash balance via a dummy sales transaction, then one stock order per inventory item
+    ledger_date, ledger_day = normalize_date(initial_date), day_number(initial_date)
+    transaction_rows = [(None, "sales", None, 50000.0, ledger_date, ledger_day)]
+    transaction_rows.extend(
+        (
+            item["item_name"], "stock_orders", item["current_stock"], item["current_stock"] * item["unit_price"],
+            ledger_date, ledger_day,
+        )
+        for item in inventory
+    )
+
+    with conn:
+        for table in ("transactions", "quote_requests", "quotes", "quote_lines", "inventory"):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in DB_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+
+        conn.executemany(
+            "INSERT INTO quote_requests VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (row["mood"], row["job"], row["need_size"], row["event"], row["response"], request_id)
+                for request_id, row in enumerate(quote_requests, start=1)
+            ],
+        )
+        conn.executemany("INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?)", quote_rows)
+        conn.executemany("INSERT INTO quote_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", quote_line_rows)
+        conn.executemany(
+            "INSERT INTO transactions (item_name, transaction_type, units, price, transaction_date, transaction_day) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            transaction_rows,
+        )
+        conn.executemany(
+            "INSERT INTO inventory VALUES (?, ?, ?, ?, ?)",
+            [
+                (item["item_name"], item["category"], item["unit_price"], item["current_stock"], item["min_stock_level"])
+                for item in inventory
+            ],
+        )
+
+def get_database_template(seed: int = 137) -> str:
+    """
+    Return the path of the prebuilt template database for `seed`, building it if needed.
+
+    Templates live in `DB_TEMPLATE_DIR` and are named after a hash of their inputs, so editing
+    either CSV file, the supply catalog or the seed produces a fresh template.
 
-def init_database(db_engine: Engine, seed: int = 137) -> Engine:    
+    Args:
+        seed (int, optional): Random seed for the generated inventory. Default is 137.
+
+    Returns:
+        str: Path to the template SQLite file.
+    """
+    import glob
+    import sqlite3
+
+    path = os.path.join(DB_TEMPLATE_DIR, f"munder_difflin_{_database_template_key(seed)}.db")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(DB_TEMPLATE_DIR, exist_ok=True)
+    # Build next to the final path and rename, so concurrent builders never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    try:
+        bulk_load_database(conn, seed)
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+    # Drop templates built from older inputs
+    for stale in glob.glob(os.path.join(DB_TEMPLATE_DIR, "munder_difflin_*.db")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    return path
+
+def init_database(db_engine: Engine, seed: int = 137, use_template: bool = True) -> Engine:    
     """
     Set up the Munder Difflin database with all required tables and initial records.
 
@@ -137,13 +859,19 @@ def init_database(db_engine: Engine, seed: int = 137) -> Engine:
     - Creates the 'transactions' table for logging stock orders and sales
     - Loads customer inquiries from 'quote_requests.csv' into a 'quote_requests' table
     - Loads previous quotes from 'quotes.csv' into a 'quotes' table, extracting useful metadata
-    - Generates a random subset of paper inventory using `generate_sample_inventory`
+    - Parses each quote explanation into line items in an indexed 'quote_lines' table
+    - Generates a random subset of paper inventory using `sample_inventory_records`
     - Inserts initial financial records including available cash and starting stock levels
 
+    The tables are built once into a cached template database (see `get_database_template`)
+    and copied into the target with the SQLite backup API, so repeated resets take milliseconds.
+
     Args:
         db_engine (Engine): A SQLAlchemy engine connected to the SQLite database.
         seed (int, optional): A random seed used to control reproducibility of inventory stock levels.
                               Default is 137.
+        use_template (bool, optional): Copy from the cached template instead of loading the
+                                       CSV files directly into the target. Default is True.
 
     Returns:
         Engine: The same SQLAlchemy engine, after initializing all necessary tables and records.
@@ -151,103 +879,57 @@ def init_database(db_engine: Engine, seed: int = 137) -> Engine:
     Raises:
         Exception: If an error occurs during setup, the exception is printed and raised.
     """
-    try:
-        # ----------------------------
-        # 1. Create an empty 'transactions' table schema
-        # ----------------------------
-        transactions_schema = pd.DataFrame({
-            "id": [],
-            "item_name": [],
-            "transaction_type": [],  # 'stock_orders' or 'sales'
-            "units": [],             # Quantity involved
-            "price": [],             # Total price for the transaction
-            "transaction_date": [],  # ISO-formatted date
-        })
-        transactions_schema.to_sql("transactions", db_engine, if_exists="replace", index=False)
-
-        # Set a consistent starting date
-        initial_date = datetime(2025, 1, 1).isoformat()
+    import sqlite3
 
-        # ----------------------------
-        # 2. Load and initialize 'quote_requests' table
-        # ----------------------------
-        quote_requests_df = pd.read_csv("quote_requests.csv")
-        quote_requests_df["id"] = range(1, len(quote_requests_df) + 1)
-        quote_requests_df.to_sql("quote_requests", db_engine, if_exists="replace", index=False)
-
-        # ----------------------------
-        # 3. Load and transform 'quotes' table
-        # ----------------------------
-        quotes_df = pd.read_csv("quotes.csv")
-        quotes_df["request_id"] = range(1, len(quotes_df) + 1)
-        quotes_df["order_date"] = initial_date
-
-        # Unpack metadata fields (job_type, order_size, event_type) if present
-        if "request_metadata" in quotes_df.columns:
-            quotes_df["request_metadata"] = quotes_df["request_metadata"].apply(
-                lambda x: ast.literal_eval(x) if isinstance(x, str) else x
-            )
-            quotes_df["job_type"] = quotes_df["request_metadata"].apply(lambda x: x.get("job_type", ""))
-            quotes_df["order_size"] = quotes_df["request_metadata"].apply(lambda x: x.get("order_size", ""))
-            quotes_df["event_type"] = quotes_df["request_metadata"].apply(lambda x: x.get("event_type", ""))
-
-        # Retain only relevant columns
-        quotes_df = quotes_df[[
-            "request_id",
-            "total_amount",
-            "quote_explanation",
-            "order_date",
-            "job_type",
-            "order_size",
-            "event_type"
-        ]]
-        quotes_df.to_sql("quotes", db_engine, if_exists="replace", index=False)
-
-        # ----------------------------
-        # 4. Generate inventory and seed stock
-        # ----------------------------
-        inventory_df = generate_sample_inventory(paper_supplies, seed=seed)
-
-        # Seed initial transactions
-        initial_transactions = []
-
-        # Add a starting cash balance via a dummy sales transaction
-        initial_transactions.append({
-            "item_name": None,
-            "transaction_type": "sales",
-            "units": None,
-            "price": 50000.0,
-            "transaction_date": initial_date,
-        })
-
-        # Add one stock order transaction per inventory item
-        for _, item in inventory_df.iterrows():
-            initial_transactions.append({
-                "item_name": item["item_name"],
-                "transaction_type": "stock_orders",
-                "units": item["current_stock"],
-                "price": item["current_stock"] * item["unit_price"],
-                "transaction_date": initial_date,
-            })
-
-        # Commit transactions to database
-        pd.DataFrame(initial_transactions).to_sql("transactions", db_engine, if_exists="append", index=False)
-
-        # Save the inventory reference table
-        inventory_df.to_sql("inventory", db_engine, if_exists="replace", index=False)
+    try:
+        raw_conn = db_engine.raw_connection()
+        try:
+            target = raw_conn.driver_connection
+            if use_template:
+                template = sqlite3.connect(get_database_template(seed))
+                try:
+                    template.backup(target)
+                finally:
+                    template.close()
+            else:
+                bulk_load_database(target, seed)
+        finally:
+            raw_conn.close()
+            if _archive is not None:
+                # The archived months belong to the ledger that was just replaced
+                _archive.clear()
+            if _storage_backend == "memory" and _data_access is not None:
+                # The in-memory ledger still holds the old transactions
+                _data_access.reload()
+            if _warehouse_layout is not None:
+                use_warehouses(*_warehouse_layout)
+            ledger_rewound()
 
         return db_engine
 
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        db_log.error("Error initializing database: %s", e)
         raise
 
+def reset_database(seed: int = 137) -> Engine:
+    """
+    Restore the shared database to its initial state from the cached template.
+
+    Args:
+        seed (int, optional): Random seed for the generated inventory. Default is 137.
+
+    Returns:
+        Engine: The shared engine returned by `get_db_engine()`.
+    """
+    return init_database(get_db_engine(), seed=seed)
+
 def create_transaction(
     item_name: str,
     transaction_type: str,
     quantity: int,
     price: float,
     date: Union[str, datetime],
+    warehouse: Optional[str] = None,
 ) -> int:
     """
     This function records a transaction of type 'stock_orders' or 'sales' with a specified
@@ -258,43 +940,96 @@ def create_transaction(
         transaction_type (str): Either 'stock_orders' or 'sales'.
         quantity (int): Number of units involved in the transaction.
         price (float): Total price of the transaction.
-        date (str or datetime): Date of the transaction in ISO 8601 format.
+        date (str or datetime): Date of the transaction in ISO 8601 format; it is stored as its
+                                YYYY-MM-DD date, a timestamp counting towards its calendar day.
+        warehouse (str, optional): Site to book the transaction at when the ledger is partitioned
+                                   (see `use_warehouses`). Default is the first site.
 
     Returns:
         int: The ID of the newly inserted transaction.
 
     Raises:
-        ValueError: If `transaction_type` is not 'stock_orders' or 'sales'.
+        ValueError: If `transaction_type` is not 'stock_orders' or 'sales', or `date` is not an ISO date.
         Exception: For other database or execution errors.
     """
-    try:
-        # Convert datetime to ISO string if necessary
-        date_str = date.isoformat() if isinstance(date, datetime) else date
+    return create_transactions([(item_name, transaction_type, quantity, price, warehouse)], date)[0]
 
-        # Validate transaction type
-        if transaction_type not in {"stock_orders", "sales"}:
-            raise ValueError("Transaction type must be 'stock_orders' or 'sales'")
+def create_transactions(
+    transactions: List[Tuple[Optional[str], str, Optional[int], float, Optional[str]]],
+    date: Union[str, datetime],
+    validate: Optional[Callable[[], None]] = None,
+) -> List[int]:
+    """
+    Record several transactions of one date together, e.g. the lines of an order: either all
+    of them are recorded or none is.
 
-        # Prepare transaction record as a single-row DataFrame
-        transaction = pd.DataFrame([{
-            "item_name": item_name,
-            "transaction_type": transaction_type,
-            "units": quantity,
-            "price": price,
-            "transaction_date": date_str,
-        }])
+    A worker process sends them to the ledger writer in one message (see ledger_service.py),
+    and the storage backends insert them in one database transaction. The exception are
+    partitioned warehouse sites: each transaction is booked at its own site's database.
 
-        # Insert the record into the database
-        transaction.to_sql("transactions", db_engine, if_exists="append", index=False)
+    Args:
+        transactions (List[Tuple]): (item_name, transaction_type, quantity, price, warehouse) per
+                                    transaction, with the same meaning as in `create_transaction`.
+        date (str or datetime): Date of the transactions in ISO 8601 format.
+        validate (Callable, optional): Called once the transactions are written and before they are
+                                       committed, when ledger reads already see them; if it raises
+                                       (`TransactionRefused` to refuse them), none of them is kept.
+                                       Not supported in worker processes or with warehouse sites.
 
-        # Fetch and return the ID of the inserted row
-        result = pd.read_sql("SELECT last_insert_rowid() as id", db_engine)
-        return int(result.iloc[0]["id"])
+    Returns:
+        List[int]: The IDs of the new transactions, in order.
 
+    Raises:
+        ValueError: If a transaction type is not 'stock_orders' or 'sales', or `date` is not an ISO date.
+        TransactionRefused: If `validate` or the ledger writer refused the transactions.
+        Exception: For other database or execution errors.
+    """
+    try:
+        # Every backend, event and checkpoint sees the date in one form
+        date_str = normalize_date(date)
+
+        # Validate transaction types
+        if any(transaction_type not in {"stock_orders", "sales"} for _, transaction_type, _, _, _ in transactions):
+            raise ValueError("Transaction type must be 'stock_orders' or 'sales'")
+        if validate is not None and (_transaction_writer is not None or _warehouses is not None):
+            raise ValueError("Validated writes need a local ledger without warehouse sites")
+
+        rows = [
+            (item_name, transaction_type, quantity, price, date_str)
+            for item_name, transaction_type, quantity, price, _ in transactions
+        ]
+        # Hand the writes to the ledger-writer process when running as a worker
+        if _transaction_writer is not None:
+            transaction_ids = _transaction_writer([row[:4] for row in rows], date_str)
+        elif _warehouses is not None:
+            # Book each row at its site; only the main ledger feeds the event stream
+            transaction_ids = [
+                _warehouses.insert_transaction(*row, warehouse=warehouse)
+                for row, (_, _, _, _, warehouse) in zip(rows, transactions)
+            ]
+        else:
+            # Insert the records and get the IDs of the inserted rows
+            transaction_ids = get_data_access().insert_transactions(rows, validate)
+            # Publish where the rows are written; the ledger-writer process publishes remote writes
+            if _ledger_events is not None or LEDGER_EVENT_LOG:
+                events = get_ledger_events()
+                for transaction_id, row in zip(transaction_ids, rows):
+                    events.publish(LedgerEvent(transaction_id, *row))
+
+        bump_ledger_version()
+        return transaction_ids
+
+    except TransactionRefused:
+        # Not a failure: the caller reports the refusal
+        raise
     except Exception as e:
-        print(f"Error creating transaction: {e}")
+        db_log.error(
+            "Error creating transactions: %s", e,
+            extra={"transactions": [(item_name, transaction_type) for item_name, transaction_type, _, _, _ in transactions]},
+        )
         raise
 
+@ledger_memoize
 def get_all_inventory(as_of_date: str) -> Dict[str, int]:
     """
     Retrieve a snapshot of available inventory as of a specific date.
@@ -310,28 +1045,11 @@ def get_all_inventory(as_of_date: str) -> Dict[str, int]:
     Returns:
         Dict[str, int]: A dictionary mapping item names to their current stock levels.
     """
-    # SQL query to compute stock levels per item as of the given date
-    query = """
-        SELECT
-            item_name,
-            SUM(CASE
-                WHEN transaction_type = 'stock_orders' THEN units
-                WHEN transaction_type = 'sales' THEN -units
-                ELSE 0
-            END) as stock
-        FROM transactions
-        WHERE item_name IS NOT NULL
-        AND transaction_date <= :as_of_date
-        GROUP BY item_name
-        HAVING stock > 0
-    """
-
-    # Execute the query with the date parameter
-    result = pd.read_sql(query, db_engine, params={"as_of_date": as_of_date})
-
-    # Convert the result into a dictionary {item_name: stock}
-    return dict(zip(result["item_name"], result["stock"]))
+    # Net stock per item as of the given date, keeping only items in stock
+    stock_levels = get_ledger().stock_levels(as_of_date)
+    return {item_name: stock for item_name, stock in stock_levels.items() if stock > 0}
 
+@ledger_memoize
 def get_stock_level(item_name: str, as_of_date: Union[str, datetime]) -> pd.DataFrame:
     """
     Retrieve the stock level of a specific item as of a given date.
@@ -346,30 +1064,15 @@ def get_stock_level(item_name: str, as_of_date: Union[str, datetime]) -> pd.Data
     Returns:
         pd.DataFrame: A single-row DataFrame with columns 'item_name' and 'current_stock'.
     """
+    import pandas as pd
+
     # Convert date to ISO string format if it's a datetime object
     if isinstance(as_of_date, datetime):
         as_of_date = as_of_date.isoformat()
 
-    # SQL query to compute net stock level for the item
-    stock_query = """
-        SELECT
-            item_name,
-            COALESCE(SUM(CASE
-                WHEN transaction_type = 'stock_orders' THEN units
-                WHEN transaction_type = 'sales' THEN -units
-                ELSE 0
-            END), 0) AS current_stock
-        FROM transactions
-        WHERE item_name = :item_name
-        AND transaction_date <= :as_of_date
-    """
-
-    # Execute query and return result as a DataFrame
-    return pd.read_sql(
-        stock_query,
-        db_engine,
-        params={"item_name": item_name, "as_of_date": as_of_date},
-    )
+    # Net stock level for the item from the active storage backend
+    current_stock = get_ledger().stock_level(item_name, as_of_date)
+    return pd.DataFrame({"item_name": [item_name], "current_stock": [current_stock]})
 
 def get_supplier_delivery_date(input_date_str: str, quantity: int) -> str:
     """
@@ -388,16 +1091,15 @@ def get_supplier_delivery_date(input_date_str: str, quantity: int) -> str:
     Returns:
         str: Estimated delivery date in ISO format (YYYY-MM-DD).
     """
-    # Debug log (comment out in production if needed)
-    print(f"FUNC (get_supplier_delivery_date): Calculating for qty {quantity} from date string '{input_date_str}'")
+    inventory_log.debug("get_supplier_delivery_date: calculating for qty %s from date string '%s'", quantity, input_date_str)
 
-    # Attempt to parse the input date
+    # Attempt to parse the input date (cached per distinct date string)
     try:
-        input_date_dt = datetime.fromisoformat(input_date_str.split("T")[0])
+        input_day = day_number(input_date_str)
     except (ValueError, TypeError):
         # Fallback to current date on format error
-        print(f"WARN (get_supplier_delivery_date): Invalid date format '{input_date_str}', using today as base.")
-        input_date_dt = datetime.now()
+        inventory_log.warning("get_supplier_delivery_date: invalid date format '%s', using today as base.", input_date_str)
+        input_day = day_number(datetime.now())
 
     # Determine delivery delay based on quantity
     if quantity <= 10:
@@ -409,12 +1111,10 @@ def get_supplier_delivery_date(input_date_str: str, quantity: int) -> str:
     else:
         days = 7
 
-    # Add delivery days to the starting date
-    delivery_date_dt = input_date_dt + timedelta(days=days)
-
-    # Return formatted delivery date
-    return delivery_date_dt.strftime("%Y-%m-%d")
+    # Add delivery days to the starting date and return it as YYYY-MM-DD
+    return iso_date(input_day + days)
 
+@ledger_memoize
 def get_cash_balance(as_of_date: Union[str, datetime]) -> float:
     """
     Calculate the current cash balance as of a specified date.
@@ -433,26 +1133,17 @@ def get_cash_balance(as_of_date: Union[str, datetime]) -> float:
         if isinstance(as_of_date, datetime):
             as_of_date = as_of_date.isoformat()
 
-        # Query all transactions on or before the specified date
-        transactions = pd.read_sql(
-            "SELECT * FROM transactions WHERE transaction_date <= :as_of_date",
-            db_engine,
-            params={"as_of_date": as_of_date},
-        )
-
-        # Compute the difference between sales and stock purchases
-        if not transactions.empty:
-            total_sales = transactions.loc[transactions["transaction_type"] == "sales", "price"].sum()
-            total_purchases = transactions.loc[transactions["transaction_type"] == "stock_orders", "price"].sum()
-            return float(total_sales - total_purchases)
-
-        return 0.0
+        # Difference between sales and stock purchases on or before the specified date
+        return get_ledger().cash_balance(as_of_date)
 
     except Exception as e:
-        print(f"Error getting cash balance: {e}")
+        db_log.error("Error getting cash balance: %s", e)
+        # A transient error, e.g. a locked database, must not stick for the whole ledger version
+        skip_ledger_memoize()
         return 0.0
 
 
+@ledger_memoize
 def generate_financial_report(as_of_date: Union[str, datetime]) -> Dict:
     """
     Generate a complete financial report for the company as of a specific date.
@@ -483,36 +1174,35 @@ def generate_financial_report(as_of_date: Union[str, datetime]) -> Dict:
     # Get current cash balance
     cash = get_cash_balance(as_of_date)
 
-    # Get current inventory snapshot
-    inventory_df = pd.read_sql("SELECT * FROM inventory", db_engine)
+    # Get current inventory snapshot, with all stock levels from a single query
+    data_access = get_data_access()
+    stock_levels = get_ledger().stock_levels(as_of_date)
     inventory_value = 0.0
     inventory_summary = []
 
     # Compute total inventory value and summary by item
-    for _, item in inventory_df.iterrows():
-        stock_info = get_stock_level(item["item_name"], as_of_date)
-        stock = stock_info["current_stock"].iloc[0]
-        item_value = stock * item["unit_price"]
+    for item_name, _, unit_price, _, _ in data_access.inventory_items():
+        stock = stock_levels.get(item_name, 0)
+        item_value = stock * unit_price
         inventory_value += item_value
 
         inventory_summary.append({
-            "item_name": item["item_name"],
+            "item_name": item_name,
             "stock": stock,
-            "unit_price": item["unit_price"],
+            "unit_price": unit_price,
             "value": item_value,
         })
 
-    # Identify top-selling products by revenue
-    top_sales_query = """
-        SELECT item_name, SUM(units) as total_units, SUM(price) as total_revenue
-        FROM transactions
-        WHERE transaction_type = 'sales' AND transaction_date <= :date
-        GROUP BY item_name
-        ORDER BY total_revenue DESC
-        LIMIT 5
-    """
-    top_sales = pd.read_sql(top_sales_query, db_engine, params={"date": as_of_date})
-    top_selling_products = top_sales.to_dict(orient="records")
+    # Identify top-selling products by revenue from the maintained leaderboard
+    if _warehouses is not None:
+        # Sales are booked at the sites, which the leaderboard does not follow
+        top_selling_products = _warehouses.top_sellers(as_of_date, 5)
+    else:
+        leaderboard = get_sales_leaderboard()
+        if _transaction_writer is not None:
+            # Worker mode: other processes record sales, pick them up from the ledger first
+            get_ledger_events().catch_up()
+        top_selling_products = leaderboard.top_sellers(as_of_date, k=5)
 
     return {
         "as_of_date": as_of_date,
@@ -547,16 +1237,12 @@ def search_quote_history(search_terms: List[str], limit: int = 5) -> List[Dict]:
             - order_date
     """
     conditions = []
-    params = {}
+    params = []
 
     # Build SQL WHERE clause using LIKE filters for each search term
-    for i, term in enumerate(search_terms):
-        param_name = f"term_{i}"
-        conditions.append(
-            f"(LOWER(qr.response) LIKE :{param_name} OR "
-            f"LOWER(q.quote_explanation) LIKE :{param_name})"
-        )
-        params[param_name] = f"%{term.lower()}%"
+    for term in search_terms:
+        conditions.append("(LOWER(qr.response) LIKE ? OR LOWER(q.quote_explanation) LIKE ?)")
+        params.extend([f"%{term.lower()}%"] * 2)
 
     # Combine conditions; fallback to always-true if no terms provided
     where_clause = " AND ".join(conditions) if conditions else "1=1"
@@ -575,13 +1261,99 @@ def search_quote_history(search_terms: List[str], limit: int = 5) -> List[Dict]:
         JOIN quote_requests qr ON q.request_id = qr.id
         WHERE {where_clause}
         ORDER BY q.order_date DESC
-        LIMIT {limit}
+        LIMIT ?
+    """
+    params.append(limit)
+
+    # Execute parameterized query
+    return get_data_access().query(query, tuple(params))
+
+
+def get_quote_lines(
+    item_name: str,
+    min_quantity: Optional[int] = None,
+    max_quantity: Optional[int] = None,
+    event_type: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Retrieve the parsed historical quote lines for one catalog item.
+
+    Reads the `quote_lines` table built by `init_database`, so the lookup is a range scan
+    on the (item_name, quantity) index instead of a LIKE over every explanation.
+
+    Args:
+        item_name (str): The catalog item to look up.
+        min_quantity (int, optional): Smallest quantity to include.
+        max_quantity (int, optional): Largest quantity to include (exclusive).
+        event_type (str, optional): Only include quotes for this event type.
+
+    Returns:
+        List[Dict]: Matching lines ordered by quantity, each with fields request_id,
+                    item_name, item_text, quantity, unit_price, discount_rate,
+                    order_size, event_type and job_type.
+    """
+    conditions = ["item_name = ?"]
+    params: List[Any] = [item_name]
+    if min_quantity is not None:
+        conditions.append("quantity >= ?")
+        params.append(min_quantity)
+    if max_quantity is not None:
+        conditions.append("quantity < ?")
+        params.append(max_quantity)
+    if event_type:
+        conditions.append("event_type = ?")
+        params.append(event_type)
+
+    query = f"""
+        SELECT request_id, item_name, item_text, quantity, unit_price, discount_rate,
+               order_size, event_type, job_type
+        FROM quote_lines
+        WHERE {" AND ".join(conditions)}
+        ORDER BY quantity, request_id
+    """
+    return get_data_access().query(query, tuple(params))
+
+def get_discount_distribution(item_name: str, quantity: int) -> Dict:
     """
+    Summarize the historical discounts quoted for an item at a comparable quantity.
 
-    # Execute parameterized query
-    with db_engine.connect() as conn:
-        result = conn.execute(text(query), params)
-        return [dict(row) for row in result]
+    Lines are bucketed by `quote_lines.QUANTITY_BANDS`; only lines whose discount rate
+    could be read from (or implied by) the original explanation count towards the rates.
+
+    Args:
+        item_name (str): The catalog item to look up.
+        quantity (int): The requested quantity, used to pick the band.
+
+    Returns:
+        Dict: A dictionary with the following keys:
+            - 'item_name': The item looked up.
+            - 'quantity_band': The band label, e.g. '500-999'.
+            - 'quotes': Number of historical lines in the band.
+            - 'discounted_quotes': Number of those lines with a known discount rate.
+            - 'min_discount', 'median_discount', 'mean_discount', 'max_discount':
+              Rate statistics over the known rates, None if there are none.
+            - 'mean_unit_price': Mean quoted unit price in the band, None if never stated.
+    """
+    from statistics import median
+
+    from quote_lines import quantity_band
+
+    label, low, high = quantity_band(quantity)
+    lines = get_quote_lines(item_name, min_quantity=low, max_quantity=high if high != float("inf") else None)
+    rates = [line["discount_rate"] for line in lines if line["discount_rate"] is not None]
+    prices = [line["unit_price"] for line in lines if line["unit_price"] is not None]
+
+    return {
+        "item_name": item_name,
+        "quantity_band": label,
+        "quotes": len(lines),
+        "discounted_quotes": len(rates),
+        "min_discount": min(rates) if rates else None,
+        "median_discount": median(rates) if rates else None,
+        "mean_discount": sum(rates) / len(rates) if rates else None,
+        "max_discount": max(rates) if rates else None,
+        "mean_unit_price": sum(prices) / len(prices) if prices else None,
+    }
 
 ########################
 ########################
@@ -592,17 +1364,8 @@ def search_quote_history(search_terms: List[str], limit: int = 5) -> List[Dict]:
 ########################
 
 
-# Set up and load your env parameters and instantiate your model.
-load_dotenv()
-
-API_KEY = os.getenv("OPENAI_API_KEY")
-API_BASE = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1")
-MODEL_ID = os.getenv("OPENAI_MODEL_ID", "gpt-4o-mini")
-
-client = OpenAI(
-    api_key=API_KEY,
-    base_url=API_BASE,
-)
+# Env parameters and the model client are loaded lazily, see `get_settings()` and
+# `get_openai_client()` at the top of this module.
 
 """Set up tools for your agents to use, these should be methods that combine the database functions above
  and apply criteria to them to ensure that the flow of the system is correct."""
@@ -619,11 +1382,14 @@ class Tool:
 
 # Base class for all agents
 class Agent:
-    def __init__(self, name: str, model: str = MODEL_ID, tools: List[Tool] = None):
+    # Number of messages kept in an agent's memory; older ones are discarded
+    memory_limit = 100
+
+    def __init__(self, name: str, model: str = None, tools: List[Tool] = None):
         self.name = name
-        self.model = model
+        self.model = model or get_model_id()
         self.tools = tools or []
-        self.memory = []
+        self.memory = deque(maxlen=self.memory_limit)
     
     def run(self, task: str, *args, **kwargs):
         # This will be implemented by specific agent types
@@ -632,7 +1398,14 @@ class Agent:
     def add_to_memory(self, message: Dict):
         self.memory.append(message)
 
+# Pricing and reorder policy, shared with the what-if simulator in simulator.py
+VOLUME_DISCOUNT_THRESHOLD = 1000  # Orders above this many units in total get the volume discount
+VOLUME_DISCOUNT_RATE = 0.15
+REORDER_MIN_QUANTITY = 500  # Smallest stock order placed when an item is at or below its minimum level
+REORDER_LEVEL_MULTIPLIER = 2  # Reorders top stock up to this multiple of the minimum level
+
 # Tools for inventory agent
+@ledger_memoize
 def check_stock_level(item_name: str, as_of_date: str) -> Dict:
     """
     Check the current stock level of a specific item.
@@ -644,8 +1417,7 @@ def check_stock_level(item_name: str, as_of_date: str) -> Dict:
     Returns:
         Dict: A dictionary containing item name and current stock
     """
-    stock_info = get_stock_level(item_name, as_of_date)
-    return {"item_name": item_name, "current_stock": stock_info["current_stock"].iloc[0]}
+    return {"item_name": item_name, "current_stock": get_ledger().stock_level(item_name, as_of_date)}
 
 def check_inventory_status(as_of_date: str) -> Dict:
     """
@@ -669,17 +1441,15 @@ def check_reorder_requirements(as_of_date: str) -> List[Dict]:
     Returns:
         List[Dict]: A list of items that need reordering with quantities
     """
+    if _warehouses is not None:
+        return _site_reorder_requirements(as_of_date)
+
     # Get current inventory
     current_inventory = get_all_inventory(as_of_date)
     
-    # Get minimum stock levels from inventory table
-    inventory_df = pd.read_sql("SELECT * FROM inventory", db_engine)
-    
-    # Identify items that need reordering
+    # Identify items that need reordering, using minimum stock levels from the inventory table
     reorder_items = []
-    for _, item in inventory_df.iterrows():
-        item_name = item["item_name"]
-        min_level = item["min_stock_level"]
+    for item_name, _, _, _, min_level in get_data_access().inventory_items():
         current_level = current_inventory.get(item_name, 0)
         
         if current_level <= min_level:
@@ -687,12 +1457,59 @@ def check_reorder_requirements(as_of_date: str) -> List[Dict]:
                 "item_name": item_name,
                 "current_stock": current_level,
                 "min_stock_level": min_level,
-                "reorder_quantity": max(500, min_level * 2 - current_level)  # Simple reorder formula
+                "reorder_quantity": max(REORDER_MIN_QUANTITY, min_level * REORDER_LEVEL_MULTIPLIER - current_level)
             })
     
     return reorder_items
 
-def place_stock_order(item_name: str, quantity: int, date: str) -> Dict:
+def _site_reorder_requirements(as_of_date: str) -> List[Dict]:
+    # The network reorders an item when a single ledger would: when its stock across all
+    # sites is at or below the sites' combined minimum level, by at least REORDER_MIN_QUANTITY
+    # units in total. The order is split across the sites by how far each is below its own
+    # reorder target, so the restock volume does not grow with the number of sites. The
+    # stock and minimum levels of all sites are read in parallel
+    site_levels = _warehouses.site_stock_levels(as_of_date)
+    site_min_levels = _warehouses.min_stock_levels()
+    sites = list(site_min_levels)
+    reorder_items = []
+    for item_name, _, _, _, _ in get_data_access().inventory_items():
+        if not all(item_name in site_min_levels[site] for site in sites):
+            continue
+        min_level = sum(site_min_levels[site][item_name] for site in sites)
+        current_level = sum(site_levels[site].get(item_name, 0) for site in sites)
+        if current_level > min_level:
+            continue
+
+        quantity = max(REORDER_MIN_QUANTITY, min_level * REORDER_LEVEL_MULTIPLIER - current_level)
+        site_current = {site: max(site_levels[site].get(item_name, 0), 0) for site in sites}
+        needs = [
+            max(site_min_levels[site][item_name] * REORDER_LEVEL_MULTIPLIER - site_current[site], 0)
+            for site in sites
+        ]
+        for site, units in zip(sites, _allocate_units(quantity, needs)):
+            if units:
+                reorder_items.append({
+                    "item_name": item_name,
+                    "warehouse": site,
+                    "current_stock": site_current[site],
+                    "min_stock_level": site_min_levels[site][item_name],
+                    "reorder_quantity": units
+                })
+    return reorder_items
+
+def _allocate_units(total: int, weights: List[int]) -> List[int]:
+    # Split `total` units in proportion to `weights` (equally if all are zero); the units
+    # lost to rounding go to the largest weights
+    if not any(weights):
+        weights = [1] * len(weights)
+    total_weight = sum(weights)
+    units = [total * weight // total_weight for weight in weights]
+    largest = sorted(range(len(weights)), key=lambda index: -weights[index])
+    for index in largest[:total - sum(units)]:
+        units[index] += 1
+    return units
+
+def place_stock_order(item_name: str, quantity: int, date: str, warehouse: Optional[str] = None) -> Dict:
     """
     Place an order for more stock of a specific item.
     
@@ -700,21 +1517,17 @@ def place_stock_order(item_name: str, quantity: int, date: str) -> Dict:
         item_name (str): The name of the item to order
         quantity (int): The quantity to order
         date (str): The date of the order
+        warehouse (str, optional): Site receiving the stock when the ledger is partitioned
         
     Returns:
         Dict: Order details including delivery date and transaction ID
     """
     # Get item price from inventory
-    inventory_df = pd.read_sql(
-        "SELECT * FROM inventory WHERE item_name = :item_name",
-        db_engine,
-        params={"item_name": item_name}
-    )
+    unit_price = get_data_access().unit_price(item_name)
     
-    if inventory_df.empty:
+    if unit_price is None:
         return {"error": f"Item {item_name} not found in inventory"}
     
-    unit_price = inventory_df["unit_price"].iloc[0]
     total_price = unit_price * quantity
     
     # Check if we have enough cash
@@ -729,15 +1542,21 @@ def place_stock_order(item_name: str, quantity: int, date: str) -> Dict:
     delivery_date = get_supplier_delivery_date(date, quantity)
     
     # Create transaction
-    transaction_id = create_transaction(
-        item_name=item_name,
-        transaction_type="stock_orders",
-        quantity=quantity,
-        price=total_price,
-        date=date
-    )
+    try:
+        transaction_id = create_transaction(
+            item_name=item_name,
+            transaction_type="stock_orders",
+            quantity=quantity,
+            price=total_price,
+            date=date,
+            warehouse=warehouse
+        )
+    except RuntimeError as e:
+        # The ledger writer of a parallel run refuses a stock order that other workers'
+        # stock orders have left no cash for
+        return {"error": f"Stock order of {quantity} units of {item_name} refused: {e}"}
     
-    return {
+    order = {
         "item_name": item_name,
         "quantity": quantity,
         "unit_price": unit_price,
@@ -746,15 +1565,19 @@ def place_stock_order(item_name: str, quantity: int, date: str) -> Dict:
         "delivery_date": delivery_date,
         "transaction_id": transaction_id
     }
+    if warehouse is not None:
+        order["warehouse"] = warehouse
+    return order
 
 # Tools for quoting agent
-def calculate_quote(
+@ledger_memoize
+def build_quote(
     items: List[Dict[str, Union[str, int]]],
     date: str,
     request_context: Dict = None
-) -> Dict:
+) -> Quote:
     """
-    Calculate a quote for a customer request.
+    Calculate a quote for a customer request as a typed `Quote` record.
     
     Args:
         items (List[Dict]): List of items and quantities requested
@@ -762,90 +1585,98 @@ def calculate_quote(
         request_context (Dict, optional): Additional context about the request
         
     Returns:
-        Dict: Quote details including pricing and availability
+        Quote: Quote details including pricing and availability
     """
     # Get current inventory
     current_inventory = get_all_inventory(date)
+    # With several sites, each line is sourced from the stock left at the sites (a private copy)
+    site_levels = None
+    if _warehouses is not None:
+        site_levels = {site: dict(levels) for site, levels in _warehouses.site_stock_levels(date).items()}
     
     # Get item prices from inventory
-    inventory_df = pd.read_sql("SELECT * FROM inventory", db_engine)
+    unit_prices = {item_name: unit_price for item_name, _, unit_price, _, _ in get_data_access().inventory_items()}
     
-    # Initialize response
-    response = {
-        "date": date,
-        "items": [],
-        "total_amount": 0.0,
-        "all_items_available": True,
-        "explanation": "",
-        "context": request_context or {}
-    }
+    quote = Quote(date=date, context=request_context)
     
     # Process each requested item
     for item in items:
         item_name = item["item_name"]
         quantity = item["quantity"]
         
-        # Get item details
-        item_info = inventory_df[inventory_df["item_name"] == item_name]
-        
-        if item_info.empty:
+        if item_name not in unit_prices:
             # Item not in catalog
-            response["items"].append({
-                "item_name": item_name,
-                "quantity": quantity,
-                "available": False,
-                "reason": "Item not in catalog"
-            })
-            response["all_items_available"] = False
+            quote.lines.append(QuoteLine(item_name, quantity, False, reason="Item not in catalog"))
+            quote.all_items_available = False
             continue
         
-        unit_price = item_info["unit_price"].iloc[0]
-        available_stock = current_inventory.get(item_name, 0)
+        unit_price = unit_prices[item_name]
+        available_stock = int(current_inventory.get(item_name, 0))
+        if site_levels is not None:
+            # Stock left at the sites after the earlier lines of this quote
+            available_stock = sum(max(levels.get(item_name, 0), 0) for levels in site_levels.values())
         
         if available_stock < quantity:
             # Not enough stock
-            response["items"].append({
-                "item_name": item_name,
-                "quantity": quantity,
-                "available": False,
-                "available_stock": available_stock,
-                "unit_price": unit_price,
-                "reason": f"Insufficient stock. Only {available_stock} units available."
-            })
-            response["all_items_available"] = False
+            quote.lines.append(QuoteLine(
+                item_name,
+                quantity,
+                False,
+                unit_price=unit_price,
+                available_stock=available_stock,
+                reason=f"Insufficient stock. Only {available_stock} units available."
+            ))
+            quote.all_items_available = False
         else:
             # Item available
             item_total = unit_price * quantity
-            response["items"].append({
-                "item_name": item_name,
-                "quantity": quantity,
-                "available": True,
-                "unit_price": unit_price,
-                "item_total": item_total
-            })
-            response["total_amount"] += item_total
+            sources = _warehouses.source(item_name, quantity, site_levels) if site_levels is not None else None
+            quote.lines.append(QuoteLine(
+                item_name, quantity, True, unit_price=unit_price, item_total=item_total, sources=sources
+            ))
+            quote.total_amount += item_total
     
     # Apply volume discount if applicable
     total_quantity = sum(item["quantity"] for item in items)
-    if total_quantity > 1000:
-        discount = 0.15  # 15% discount for large orders
-        original_amount = response["total_amount"]
-        response["total_amount"] *= (1 - discount)
-        response["discount_applied"] = {
-            "rate": discount,
-            "amount": original_amount * discount,
-            "reason": "Volume discount for orders over 1000 units"
-        }
+    if total_quantity > VOLUME_DISCOUNT_THRESHOLD:
+        discount = VOLUME_DISCOUNT_RATE
+        original_amount = quote.total_amount
+        quote.total_amount *= (1 - discount)
+        quote.discount_rate = discount
+        quote.discount_amount = original_amount * discount
+        quote.discount_reason = f"Volume discount for orders over {VOLUME_DISCOUNT_THRESHOLD} units"
     
     # Generate explanation
-    if response["all_items_available"]:
-        response["explanation"] = "All requested items are available. "
-        if response.get("discount_applied"):
-            response["explanation"] += f"A {response['discount_applied']['rate']*100}% discount was applied due to the large order size."
+    if quote.all_items_available:
+        quote.explanation = "All requested items are available. "
+        if quote.discount_rate is not None:
+            quote.explanation += f"A {quote.discount_rate*100}% discount was applied due to the large order size."
     else:
-        response["explanation"] = "Some items are not available in the requested quantities. See item details for more information."
+        quote.explanation = "Some items are not available in the requested quantities. See item details for more information."
+    
+    quoting_log.debug(
+        "Quoted %d lines for %s: total %.2f, all available: %s",
+        len(quote.lines), date, quote.total_amount, quote.all_items_available,
+    )
+    return quote
+
+def calculate_quote(
+    items: List[Dict[str, Union[str, int]]],
+    date: str,
+    request_context: Dict = None
+) -> Dict:
+    """
+    Calculate a quote for a customer request.
     
-    return response
+    Args:
+        items (List[Dict]): List of items and quantities requested
+        date (str): Date of the quote
+        request_context (Dict, optional): Additional context about the request
+        
+    Returns:
+        Dict: Quote details including pricing and availability
+    """
+    return build_quote(items, date, request_context).to_dict()
 
 def search_similar_quotes(request_context: Dict) -> List[Dict]:
     """
@@ -885,61 +1716,82 @@ def search_similar_quotes(request_context: Dict) -> List[Dict]:
     # Search for similar quotes
     return search_quote_history(search_terms)
 
+def get_discount_history(items: List[Dict]) -> Dict[str, Dict]:
+    """
+    Look up the historical discount distribution for each requested item.
+
+    Args:
+        items (List[Dict]): Requested items with 'item_name' and 'quantity' keys.
+
+    Returns:
+        Dict[str, Dict]: `get_discount_distribution` results keyed by item name.
+    """
+    return {
+        item["item_name"]: get_discount_distribution(item["item_name"], item["quantity"])
+        for item in items
+        if item.get("item_name") and item.get("quantity")
+    }
+
 # Tools for ordering agent
-def process_order(quote: Dict, date: str) -> Dict:
+def place_order(quote: Quote, date: str) -> Order:
     """
-    Process an approved quote into an order.
+    Process an approved quote into a typed `Order` record.
     
     Args:
-        quote (Dict): The quote to process
+        quote (Quote): The quote to process
         date (str): The date of the order
         
     Returns:
-        Dict: Order details including status and transaction IDs
+        Order: Order details including status and transaction IDs
     """
-    if not quote["all_items_available"]:
-        return {
-            "status": "failed",
-            "reason": "Cannot process order with unavailable items",
-            "date": date
-        }
+    if not quote.all_items_available:
+        return Order("failed", date, reason="Cannot process order with unavailable items")
     
-    # Initialize response
-    response = {
-        "status": "processing",
-        "date": date,
-        "items": [],
-        "total_amount": quote["total_amount"],
-        "transactions": []
-    }
+    order = Order("processing", date, total_amount=quote.total_amount, lines=[])
     
-    # Process each item in the quote
-    for item in quote["items"]:
-        if not item["available"]:
+    # One sales transaction per site each line ships from
+    sales = []
+    for line in quote.lines:
+        if not line.available:
             # This shouldn't happen if all_items_available is True
-            response["status"] = "failed"
-            response["reason"] = f"Item {item['item_name']} is not available"
-            return response
-        
-        # Create sales transaction
-        transaction_id = create_transaction(
-            item_name=item["item_name"],
-            transaction_type="sales",
-            quantity=item["quantity"],
-            price=item["item_total"] if "discount_applied" not in quote else item["item_total"] * (1 - quote["discount_applied"]["rate"]),
-            date=date
-        )
-        
-        response["items"].append({
-            "item_name": item["item_name"],
-            "quantity": item["quantity"],
-            "transaction_id": transaction_id
-        })
+            order.status = "failed"
+            order.reason = f"Item {line.item_name} is not available"
+            return order
         
-        response["transactions"].append(transaction_id)
+        line_price = quote.line_price(line)
+        for warehouse, quantity in line.sources or ((None, line.quantity),):
+            sales.append((line.item_name, "sales", quantity, line_price * quantity / line.quantity, warehouse))
+    
+    # The lines are recorded together, so a refused order leaves no sale behind
+    try:
+        transaction_ids = create_transactions(sales, date)
+    except RuntimeError as e:
+        # The ledger writer of a parallel run refuses an order another worker's sales
+        # have already made impossible
+        ordering_log.warning("Order of %s refused: %s", ", ".join(item_name for item_name, *_ in sales), e)
+        order.status = "failed"
+        order.reason = str(e)
+        return order
+    
+    for (item_name, _, quantity, _, _), transaction_id in zip(sales, transaction_ids):
+        order.lines.append((item_name, quantity, transaction_id))
+        ordering_log.debug("Recorded sale of %s units of %s (transaction %s)", quantity, item_name, transaction_id)
+    
+    order.status = "completed"
+    return order
+
+def process_order(quote: Dict, date: str) -> Dict:
+    """
+    Process an approved quote into an order.
     
-    response["status"] = "completed"
-    return response
+    Args:
+        quote (Dict): The quote to process
+        date (str): The date of the order
+        
+    Returns:
+        Dict: Order details including status and transaction IDs
+    """
+    return place_order(Quote.from_dict(quote), date).to_dict()
 
 def generate_order_summary(order: Dict) -> str:
     """
@@ -1009,7 +1861,8 @@ class InventoryAgent(Agent):
             return self.tools[3].execute(
                 kwargs["item_name"], 
                 kwargs["quantity"], 
-                kwargs["date"]
+                kwargs["date"],
+                kwargs.get("warehouse")
             )
         else:
             return {"error": f"Unknown task: {task}"}
@@ -1019,7 +1872,9 @@ class QuotingAgent(Agent):
     def __init__(self):
         tools = [
             Tool("calculate_quote", calculate_quote, "Calculate a quote for a customer request"),
-            Tool("search_similar", search_similar_quotes, "Search for similar historical quotes")
+            Tool("search_similar", search_similar_quotes, "Search for similar historical quotes"),
+            Tool("build_quote", build_quote, "Calculate a quote as a typed Quote record"),
+            Tool("discount_history", get_discount_history, "Historical discounts per item and quantity band")
         ]
         super().__init__("Quoting Agent", tools=tools)
     
@@ -1032,6 +1887,14 @@ class QuotingAgent(Agent):
             )
         elif task == "search_similar":
             return self.tools[1].execute(kwargs["request_context"])
+        elif task == "build_quote":
+            return self.tools[2].execute(
+                kwargs["items"], 
+                kwargs["date"], 
+                kwargs.get("request_context")
+            )
+        elif task == "discount_history":
+            return self.tools[3].execute(kwargs["items"])
         else:
             return {"error": f"Unknown task: {task}"}
 
@@ -1041,7 +1904,9 @@ class OrderingAgent(Agent):
         tools = [
             Tool("process_order", process_order, "Process an approved quote into an order"),
             Tool("generate_summary", generate_order_summary, "Generate a customer-friendly summary"),
-            Tool("get_financial", get_financial_snapshot, "Get a financial snapshot")
+            Tool("get_financial", get_financial_snapshot, "Get a financial snapshot"),
+            Tool("place_order", place_order, "Process a typed Quote into a typed Order"),
+            Tool("get_cash", get_cash_balance, "Get the cash balance")
         ]
         super().__init__("Ordering Agent", tools=tools)
     
@@ -1052,16 +1917,142 @@ class OrderingAgent(Agent):
             return self.tools[1].execute(kwargs["order"])
         elif task == "get_financial":
             return self.tools[2].execute(kwargs["date"])
+        elif task == "place_order":
+            return self.tools[3].execute(kwargs["quote"], kwargs["date"])
+        elif task == "get_cash":
+            return self.tools[4].execute(kwargs["date"])
         else:
             return {"error": f"Unknown task: {task}"}
 
+def match_catalog_items(raw_items: List[Dict], item_names: List[str]) -> List[Dict]:
+    """
+    Map item names extracted by the model onto catalog items, dropping anything that does not match.
+
+    Args:
+        raw_items (List[Dict]): Objects with "item_name" and "quantity" fields, as returned by the model.
+        item_names (List[str]): Names of the stocked items.
+
+    Returns:
+        List[Dict]: The matched items with integer quantities.
+    """
+    extracted_items = []
+    for item in raw_items:
+        if "item_name" in item and "quantity" in item:
+            # Find the closest matching item in inventory
+            closest_match = None
+            for inv_item in item_names:
+                if item["item_name"].lower() in inv_item.lower() or inv_item.lower() in item["item_name"].lower():
+                    closest_match = inv_item
+                    break
+            
+            if closest_match:
+                extracted_items.append({
+                    "item_name": closest_match,
+                    "quantity": int(item["quantity"])
+                })
+    return extracted_items
+
 # Orchestrator Agent - Manages the workflow between agents
 class OrchestratorAgent:
-    def __init__(self):
+    # Batched item extraction: requests per LLM call, and a rough prompt size limit
+    # (estimated at 4 characters per token) above which a batch is split
+    extraction_batch_size = 8
+    extraction_max_prompt_tokens = 8000
+    # Picks a model per call by complexity (see model_router.py); None sends every call to
+    # the configured model
+    model_router: Optional[ModelRouter] = None
+    # Deadlines, hedging and a circuit breaker for every model call (see llm_policy.py);
+    # None lets each call wait for the client's own timeout
+    call_policy: Optional[CallPolicy] = None
+
+    def __init__(self, history_capacity: int = 1000, history_log_path: Optional[str] = None):
         self.inventory_agent = InventoryAgent()
         self.quoting_agent = QuotingAgent()
         self.ordering_agent = OrderingAgent()
-        self.request_history = []
+        # Recent requests stay in memory; older ones spill to `history_log_path` if given,
+        # and are dropped otherwise
+        self.request_history = RequestHistory(capacity=history_capacity, log_path=history_log_path)
+        # LLM calls and tokens spent on item extraction
+        self.extraction_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.request_graph = self._build_request_graph()
+
+    def close(self) -> None:
+        """Spill the request history to its log, if any, and close the log."""
+        self.request_history.close()
+
+    def _build_request_graph(self) -> StepGraph:
+        """
+        Steps of `process_request` and what each needs. A step only runs when a later step
+        or `process_request` reads its value; the unused lookups (`inventory_status`,
+        `similar_quotes`) are declared for consumers that want them but cost nothing otherwise.
+        """
+        graph = StepGraph()
+        graph.add("items", lambda request: self.extract_items_from_request(request), requires=("request",))
+        graph.add(
+            "context",
+            lambda request, job_type, event_type: self.extract_context_from_request(request, job_type, event_type),
+            requires=("request", "job_type", "event_type"),
+        )
+        graph.add(
+            "inventory_status",
+            lambda date: self.inventory_agent.run("check_inventory", date=date),
+            requires=("date",),
+        )
+        graph.add(
+            "quote",
+            lambda items, date, context: self.quoting_agent.run(
+                "build_quote", items=items, date=date, request_context=context
+            ),
+            requires=("items", "date", "context"),
+        )
+        graph.add(
+            "similar_quotes",
+            lambda context: self.quoting_agent.run("search_similar", request_context=context),
+            requires=("context",),
+        )
+        graph.add("result", self._settle_quote, requires=("quote", "date"))
+        # Reorders see the stock left after the sale, and the cash balance the stock orders
+        graph.add("reorders", self._reorder_low_stock, requires=("result", "date"))
+        graph.add(
+            "cash_balance",
+            lambda reorders, date: self.ordering_agent.run("get_cash", date=date),
+            requires=("reorders", "date"),
+        )
+        graph.add(
+            "response",
+            lambda result, request, date: self.generate_response(result, request, date),
+            requires=("result", "request", "date"),
+        )
+        return graph
+    
+    def _record_extraction_usage(self, response) -> None:
+        self.extraction_usage["calls"] += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.extraction_usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self.extraction_usage["completion_tokens"] += usage.completion_tokens or 0
+
+    def _complete(
+        self,
+        kind: str,
+        default_model: str,
+        call: Callable[[str, Optional[float]], Any],
+        validate: Callable[[Any], Any],
+        request: str = "",
+    ) -> Any:
+        """Run `call(model, timeout)` on `default_model`, or on the model `model_router` picks for it."""
+        call = self._bounded(call)
+        if self.model_router is None:
+            return validate(call(default_model))
+        decision = self.model_router.route(kind, request=request)
+        return self.model_router.complete(decision, call, validate)
+
+    def _bounded(self, call: Callable[[str, Optional[float]], Any]) -> Callable[[str], Any]:
+        """Run `call(model, timeout)` under `call_policy`, if any, as a call of the model alone."""
+        policy = self.call_policy
+        if policy is None:
+            return lambda model: call(model, None)
+        return lambda model: policy.run(lambda timeout: call(model, timeout))
     
     def extract_items_from_request(self, request: str) -> List[Dict]:
         """
@@ -1075,8 +2066,7 @@ class OrchestratorAgent:
             List[Dict]: List of items and quantities extracted from the request
         """
         # First, get all inventory items for reference
-        inventory_df = pd.read_sql("SELECT * FROM inventory", db_engine)
-        item_names = inventory_df["item_name"].tolist()
+        item_names = [item[0] for item in get_data_access().inventory_items()]
         
         # Create a prompt to extract items and quantities
         prompt = f"""
@@ -1093,41 +2083,134 @@ class OrchestratorAgent:
         Output only the JSON list, nothing else.
         """
         
-        try:
-            response = client.chat.completions.create(
-                model=self.quoting_agent.model,
+        def call(model: str, timeout: Optional[float]):
+            return get_openai_client(timeout).chat.completions.create(
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.0,
                 response_format={"type": "json_object"}
             )
+
+        def parse(response) -> List[Dict]:
+            self._record_extraction_usage(response)
             
             # Parse the response
             content = response.choices[0].message.content
             items_data = ast.literal_eval(content)
             
             # Validate and clean up the extracted items
-            extracted_items = []
-            for item in items_data.get("items", []):
-                if "item_name" in item and "quantity" in item:
-                    # Find the closest matching item in inventory
-                    closest_match = None
-                    for inv_item in item_names:
-                        if item["item_name"].lower() in inv_item.lower() or inv_item.lower() in item["item_name"].lower():
-                            closest_match = inv_item
-                            break
-                    
-                    if closest_match:
-                        extracted_items.append({
-                            "item_name": closest_match,
-                            "quantity": int(item["quantity"])
-                        })
-            
-            return extracted_items
-        
+            return match_catalog_items(items_data.get("items", []), item_names)
+
+        try:
+            return self._complete("extract_items", self.quoting_agent.model, call, parse, request=request)
         except Exception as e:
-            print(f"Error extracting items: {e}")
+            orchestrator_log.error("Error extracting items: %s", e)
             return []
     
+    def extract_items_batch(self, requests: Dict[Any, str]) -> Dict[Any, List[Dict]]:
+        """
+        Extract items and quantities for many requests, several requests per model call.
+
+        The catalog and instructions are sent once per call, and the model returns one item
+        list per request ID. Batches hold at most `extraction_batch_size` requests and are
+        split further when the prompt would exceed `extraction_max_prompt_tokens`, or when the
+        model rejects or truncates it. Requests whose result is missing or malformed are
+        retried one at a time with `extract_items_from_request`.
+
+        Args:
+            requests (Dict): Customer requests keyed by request ID.
+
+        Returns:
+            Dict: The extracted items per request ID, as `extract_items_from_request` returns them.
+        """
+        item_names = [item[0] for item in get_data_access().inventory_items()]
+
+        results = {}
+        batch: Dict[Any, str] = {}
+        batch_chars = 0
+        for request_id, request in requests.items():
+            request_chars = len(request) + len(str(request_id)) + 8
+            if batch and (
+                len(batch) >= self.extraction_batch_size
+                or (batch_chars + request_chars) / 4 > self.extraction_max_prompt_tokens
+            ):
+                results.update(self._extract_items_batch(batch, item_names))
+                batch, batch_chars = {}, 0
+            batch[request_id] = request
+            batch_chars += request_chars
+        if batch:
+            results.update(self._extract_items_batch(batch, item_names))
+        return results
+
+    def _extract_items_batch(self, batch: Dict[Any, str], item_names: List[str]) -> Dict[Any, List[Dict]]:
+        if len(batch) == 1:
+            (request_id, request), = batch.items()
+            return {request_id: self.extract_items_from_request(request)}
+
+        keys = {str(request_id): request_id for request_id in batch}
+        prompt = f"""
+        For each customer request below, extract all paper products and their quantities.
+        Only include items that are explicitly mentioned with quantities.
+        Format your response as a JSON object with a "results" field that maps every request ID
+        to a list of objects, each with "item_name" and "quantity" fields. Use an empty list for
+        requests without any items.
+        
+        Available items in inventory:
+        {', '.join(item_names)}
+        
+        Customer requests by request ID:
+        {json.dumps({key: batch[request_id] for key, request_id in keys.items()}, indent=2)}
+        
+        Output only the JSON object, nothing else.
+        """
+
+        def call(model: str, timeout: Optional[float]):
+            return get_openai_client(timeout).chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                response_format={"type": "json_object"}
+            )
+
+        try:
+            # Batches always go to the fast model; requests it gets wrong are retried
+            # one at a time, where they are routed individually
+            response = self._bounded(call)(
+                self.model_router.fast_model if self.model_router is not None else self.quoting_agent.model
+            )
+            self._record_extraction_usage(response)
+        except Exception as e:
+            if getattr(e, "code", None) != "context_length_exceeded":
+                orchestrator_log.error("Error extracting items for %d requests: %s", len(batch), e)
+                return {request_id: self.extract_items_from_request(request) for request_id, request in batch.items()}
+            return self._split_extraction_batch(batch, item_names)
+
+        if response.choices[0].finish_reason == "length":
+            # The answer did not fit: ask about fewer requests at a time
+            return self._split_extraction_batch(batch, item_names)
+
+        try:
+            per_request = json.loads(response.choices[0].message.content)["results"]
+        except (ValueError, KeyError, TypeError) as e:
+            orchestrator_log.warning("Unparseable batched extraction for %d requests, retrying one by one: %s", len(batch), e)
+            per_request = {}
+
+        results = {}
+        for key, request_id in keys.items():
+            try:
+                results[request_id] = match_catalog_items(per_request[key], item_names)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results[request_id] = self.extract_items_from_request(batch[request_id])
+        return results
+
+    def _split_extraction_batch(self, batch: Dict[Any, str], item_names: List[str]) -> Dict[Any, List[Dict]]:
+        request_ids = list(batch)
+        half = len(request_ids) // 2
+        orchestrator_log.debug("Splitting an extraction batch of %d requests", len(batch))
+        results = self._extract_items_batch({request_id: batch[request_id] for request_id in request_ids[:half]}, item_names)
+        results.update(self._extract_items_batch({request_id: batch[request_id] for request_id in request_ids[half:]}, item_names))
+        return results
+
     def extract_context_from_request(self, request: str, job_type: str = None, event_type: str = None) -> Dict:
         """
         Extract contextual information from a customer request.
@@ -1158,17 +2241,20 @@ class OrchestratorAgent:
         Output only the JSON object, nothing else.
         """
         
-        try:
-            response = client.chat.completions.create(
-                model=self.quoting_agent.model,
+        def call(model: str, timeout: Optional[float]):
+            return get_openai_client(timeout).chat.completions.create(
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.0,
                 response_format={"type": "json_object"}
             )
-            
+
+        try:
             # Parse the response
-            content = response.choices[0].message.content
-            context_data = ast.literal_eval(content)
+            context_data = self._complete(
+                "extract_context", self.quoting_agent.model, call,
+                lambda response: ast.literal_eval(response.choices[0].message.content), request=request,
+            )
             
             # Add job_type and event_type if provided
             if job_type:
@@ -1179,7 +2265,7 @@ class OrchestratorAgent:
             return context_data
         
         except Exception as e:
-            print(f"Error extracting context: {e}")
+            orchestrator_log.error("Error extracting context: %s", e)
             return {"job_type": job_type, "event_type": event_type} if (job_type or event_type) else {}
     
     def generate_response(self, process_result: Dict, request: str, date: str) -> str:
@@ -1194,6 +2280,13 @@ class OrchestratorAgent:
         Returns:
             str: A customer-friendly response
         """
+        router = self.model_router
+        if router is not None:
+            # Trivial outcomes are rendered from the result without a model call
+            decision = router.route("response", request=request, result=process_result)
+            if decision.route == "template":
+                return router.render(process_result)
+
         # Create a prompt for generating a response
         prompt = f"""
         Generate a polite and professional response to the customer based on the processing result.
@@ -1216,17 +2309,27 @@ class OrchestratorAgent:
         Output only the response text, nothing else.
         """
         
-        try:
-            response = client.chat.completions.create(
-                model=MODEL_ID,
+        def call(model: str, timeout: Optional[float]):
+            return get_openai_client(timeout).chat.completions.create(
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7
             )
-            
-            return response.choices[0].message.content
+
+        def content(response) -> str:
+            text = response.choices[0].message.content
+            if not text:
+                raise ValueError("empty response")
+            return text
+
+        try:
+            # With `call_policy`, an open circuit fails at once and lands on the fallbacks below
+            if router is None:
+                return self._bounded(call)(get_model_id()).choices[0].message.content
+            return router.complete(decision, self._bounded(call), content)
         
         except Exception as e:
-            print(f"Error generating response: {e}")
+            orchestrator_log.error("Error generating response: %s", e)
             
             # Fallback response
             if process_result.get("status") == "completed":
@@ -1236,7 +2339,15 @@ class OrchestratorAgent:
             else:
                 return "Thank you for your inquiry. We will process your request and get back to you soon."
     
-    def process_request(self, request: str, date: str, job_type: str = None, event_type: str = None) -> str:
+    def process_request(
+        self,
+        request: str,
+        date: str,
+        job_type: str = None,
+        event_type: str = None,
+        customer: str = None,
+        items: Optional[List[Dict]] = None
+    ) -> str:
         """
         Process a customer request through the multi-agent system.
         
@@ -1245,112 +2356,211 @@ class OrchestratorAgent:
             date (str): The date of the request
             job_type (str, optional): The type of job if known
             event_type (str, optional): The type of event if known
+            customer (str, optional): Customer identifier for the request history (defaults to job_type)
+            items (List[Dict], optional): Items already extracted from the request, e.g. by
+                                          `extract_items_batch`; extracted here if omitted
             
         Returns:
             str: A response to the customer
         """
-        # Step 1: Extract items and context from the request
-        items = self.extract_items_from_request(request)
-        context = self.extract_context_from_request(request, job_type, event_type)
-        
-        if not items:
+        with unit_of_work(version=get_ledger_version):
+            return self._process_request(request, date, job_type, event_type, customer, items)
+
+    def _process_request(
+        self,
+        request: str,
+        date: str,
+        job_type: Optional[str],
+        event_type: Optional[str],
+        customer: Optional[str],
+        items: Optional[List[Dict]],
+    ) -> str:
+        inputs = {"request": request, "date": date, "job_type": job_type, "event_type": event_type}
+        if items is not None:
+            inputs["items"] = items
+        run = self.request_graph.start(**inputs)
+
+        # Step 1: Extract items and context from the request; the two model calls are independent
+        run.prefetch("items", "context")
+        if not run["items"]:
             return "I'm sorry, but I couldn't identify any specific paper products in your request. Could you please provide more details about what items and quantities you need?"
-        
-        # Step 2: Check inventory for requested items
-        inventory_status = self.inventory_agent.run("check_inventory", date=date)
-        
-        # Step 3: Calculate a quote
-        quote = self.quoting_agent.run(
-            "calculate_quote", 
-            items=items, 
-            date=date, 
-            request_context=context
-        )
-        
-        # Step 4: Look for similar quotes for reference
-        similar_quotes = self.quoting_agent.run(
-            "search_similar", 
-            request_context=context
+
+        # Steps 2-4: Quote, sell if everything is available, then reorder low stock
+        with _settlement_lock:
+            result = run["result"]
+            run["reorders"]
+
+        # Save a compact summary of the request to history
+        self.request_history.append(
+            request=request,
+            date=date,
+            items=run["items"],
+            status=result["status"],
+            total_amount=run["quote"].total_amount,
+            cash_balance=run["cash_balance"],
+            customer=customer or job_type
         )
-        
-        # Step 5: Process the order if all items are available
-        if quote.get("all_items_available", False):
+
+        # Generate customer response
+        return run["response"]
+
+    def _settle_quote(self, quote: Quote, date: str) -> Dict:
+        """Place the order if every quoted item is available; otherwise return the quote only."""
+        if quote.all_items_available:
             order = self.ordering_agent.run(
-                "process_order", 
+                "place_order", 
                 quote=quote, 
                 date=date
             )
             
             # Generate order summary
-            if order.get("status") == "completed":
-                result = {
+            if order.status == "completed":
+                return {
                     "status": "completed",
-                    "order": order,
-                    "total_amount": quote["total_amount"],
-                    "explanation": quote.get("explanation", "")
-                }
-            else:
-                result = {
-                    "status": "failed",
-                    "reason": order.get("reason", "Unknown error processing order"),
-                    "quote": quote
+                    "order": order.to_dict(),
+                    "total_amount": quote.total_amount,
+                    "explanation": quote.explanation
                 }
-        else:
-            # Just return the quote if not all items are available
-            result = {
-                "status": "quote_only",
-                "quote": quote,
-                "reason": "Not all requested items are available"
+            return {
+                "status": "failed",
+                "reason": order.reason or "Unknown error processing order",
+                "quote": quote.to_dict()
             }
-        
-        # Check if we need to reorder any inventory
+
+        # Just return the quote if not all items are available
+        return {
+            "status": "quote_only",
+            "quote": quote.to_dict(),
+            "reason": "Not all requested items are available"
+        }
+
+    def _reorder_low_stock(self, result: Dict, date: str) -> List[Dict]:
+        """Place stock orders for every item at or below its minimum level; returns the items checked."""
         reorder_items = self.inventory_agent.run("check_reorder", date=date)
         for item in reorder_items:
-            print(f"Reordering {item['reorder_quantity']} units of {item['item_name']}")
+            inventory_log.info(
+                "Reordering %s units of %s", item["reorder_quantity"], item["item_name"],
+                extra={"item_name": item["item_name"], "quantity": item["reorder_quantity"], "date": date},
+            )
             reorder_result = self.inventory_agent.run(
                 "place_order",
                 item_name=item["item_name"],
                 quantity=item["reorder_quantity"],
-                date=date
+                date=date,
+                warehouse=item.get("warehouse")
             )
             if "error" in reorder_result:
-                print(f"Error reordering {item['item_name']}: {reorder_result['error']}")
-        
-        # Get updated financial status
-        financial = self.ordering_agent.run("get_financial", date=date)
-        
-        # Save request and processing details to history
-        self.request_history.append({
-            "request": request,
-            "date": date,
-            "items": items,
-            "context": context,
-            "quote": quote,
-            "result": result,
-            "financial": financial
-        })
-        
-        # Generate customer response
-        return self.generate_response(result, request, date)
+                inventory_log.warning(
+                    "Error reordering %s: %s", item["item_name"], reorder_result["error"],
+                    extra={"item_name": item["item_name"], "date": date},
+                )
+        return reorder_items
 
 # Run your test scenarios by writing them here. Make sure to keep track of them.
 
-def run_test_scenarios():
-    
-    print("Initializing Database...")
-    init_database(db_engine)
-    
+def load_test_requests(path: str = "quote_requests_sample.csv") -> Optional[pd.DataFrame]:
+    """
+    Load the sample customer requests, parse their dates and sort them chronologically.
+
+    Args:
+        path (str, optional): CSV file with 'job', 'need_size', 'event', 'request' and 'request_date' columns.
+
+    Returns:
+        pd.DataFrame or None: The sorted requests, or None if the file could not be loaded.
+    """
+    import pandas as pd
+
     try:
-        quote_requests_sample = pd.read_csv("quote_requests_sample.csv")
+        quote_requests_sample = pd.read_csv(path)
         quote_requests_sample["request_date"] = pd.to_datetime(
             quote_requests_sample["request_date"], format="%m/%d/%y", errors="coerce"
         )
         quote_requests_sample.dropna(subset=["request_date"], inplace=True)
-        quote_requests_sample = quote_requests_sample.sort_values("request_date")
+        return quote_requests_sample.sort_values("request_date")
     except Exception as e:
-        print(f"FATAL: Error loading test data: {e}")
+        runner_log.critical("Error loading test data: %s", e)
+        return None
+
+def run_test_scenarios(
+    results_path: str = "test_results.csv",
+    results_format: Optional[str] = None,
+    flush_every: int = 1,
+    keep_results: bool = True,
+    requests_path: str = "quote_requests_sample.csv",
+    checkpoint_path: Optional[str] = "run_checkpoint.json",
+    resume: bool = False,
+    extraction_batch_size: int = 1,
+    schedule_policy: Optional[str] = None,
+    route_models: bool = False,
+    llm_deadline: Optional[float] = None
+):
+    """
+    Run the sample requests through the multi-agent system.
+
+    Each result is appended to `results_path` as soon as its request completes, so a crash
+    midway keeps all finished work. Every flush of the results file also saves a checkpoint
+    (see checkpoint.py); with `resume=True` the run rolls the ledger back to the last
+    checkpoint and continues after the last committed request instead of starting over.
+
+    Args:
+        results_path (str, optional): Where to stream results. Default is 'test_results.csv'.
+        results_format (str, optional): 'csv', 'jsonl' or 'parquet'; inferred from the extension if omitted.
+        flush_every (int, optional): Flush the results file after this many results. Default is 1.
+        keep_results (bool, optional): Also collect results in memory and return them. Default is True.
+        requests_path (str, optional): CSV file with the requests to process.
+        checkpoint_path (str, optional): Checkpoint file, or None to disable checkpointing.
+        resume (bool, optional): Continue the run recorded in `checkpoint_path`. Default is False.
+        extraction_batch_size (int, optional): Extract the items of this many upcoming requests
+                                               with one model call (see `extract_items_batch`).
+                                               Default is 1, one call per request.
+        schedule_policy (str, optional): Order each day's requests by 'edf' (earliest deadline
+                                         first), 'size_weighted' or 'fifo' (see scheduler.py)
+                                         instead of file order, and report latency per
+                                         priority class. Default is None, file order.
+        route_models (bool, optional): Route each model call to a template, the fast model or
+                                       the strong model by complexity (see model_router.py),
+                                       and report calls, fallbacks and latency per route.
+                                       Default is False, every call uses the configured model.
+        llm_deadline (float, optional): Give each model call this many seconds, hedge slow
+                                        calls with a duplicate request and fail fast while the
+                                        provider is degraded (see llm_policy.py), and report
+                                        p50/p95/p99 latency and hedging. Default is None, calls
+                                        wait for the client's own timeout.
+
+    Returns:
+        List[Dict] or None: The results processed by this call if `keep_results` is True.
+    """
+    quote_requests_sample = load_test_requests(requests_path)
+    if quote_requests_sample is None:
         return
 
+    data_access = get_data_access()
+    requests_digest = file_digest(requests_path)
+    checkpoint = RunCheckpoint.load(checkpoint_path) if (resume and checkpoint_path) else None
+    already_written = set()
+
+    if checkpoint is not None:
+        if checkpoint.requests_digest != requests_digest or checkpoint.results_path != results_path:
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different run; start without resume")
+        # A resumed run keeps the database, so it has to be readable as it is
+        check_database()
+        # Undo ledger writes of requests that had not been committed when the run stopped
+        removed = data_access.delete_transactions_after(checkpoint.transaction_high_water)
+        ledger_rewound()
+        already_written = set(committed_result_ids(results_path, results_format))
+        runner_log.info(
+            "Resuming after request %s (%d done, %d uncommitted transactions rolled back)",
+            checkpoint.last_request_id, len(checkpoint.completed), removed,
+        )
+    else:
+        if resume:
+            runner_log.info("No checkpoint found at %s, starting a new run", checkpoint_path)
+        runner_log.info("Initializing Database...")
+        init_database(get_db_engine())
+        if checkpoint_path:
+            checkpoint = RunCheckpoint(checkpoint_path, requests_digest, results_path)
+            checkpoint.commit(data_access.max_transaction_id())
+
     # Get initial state
     initial_date = quote_requests_sample["request_date"].min().strftime("%Y-%m-%d")
     report = generate_financial_report(initial_date)
@@ -1367,69 +2577,293 @@ def run_test_scenarios():
     
     # Initialize the orchestrator agent
     orchestrator = OrchestratorAgent()
-
-    results = []
+    orchestrator.extraction_batch_size = extraction_batch_size
+    if route_models:
+        from model_router import ModelRouter
+        orchestrator.model_router = ModelRouter.from_settings(get_settings())
+    if llm_deadline is not None:
+        from llm_policy import CallPolicy
+        orchestrator.call_policy = CallPolicy(deadline=llm_deadline)
+
+    # Requests still to process: (row index, row, request date, checkpoint key)
+    pending = []
     for idx, row in quote_requests_sample.iterrows():
         request_date = row["request_date"].strftime("%Y-%m-%d")
+        key = request_key(row["request"], request_date)
+        if checkpoint is None or not checkpoint.is_done(idx + 1, key):
+            pending.append((idx, row, request_date, key))
+    extracted: Dict[int, List[Dict]] = {}
+    processed = set()
+    scheduler = None
+
+    results = [] if keep_results else None
+    resuming = resume and checkpoint is not None and bool(checkpoint.completed)
+    def on_flush() -> None:
+        # Saved results and the checkpoint never get ahead of the ledger in the database file
+        data_access.flush()
+        if checkpoint is not None:
+            checkpoint.commit()
+
+    with open_result_sink(
+        results_path, results_format, flush_every=flush_every, append=resuming, on_flush=on_flush
+    ) as sink:
+        def handle_request(position: int) -> None:
+            nonlocal current_cash, current_inventory
+            idx, row, request_date, key = pending[position]
+            if extraction_batch_size > 1 and idx + 1 not in extracted:
+                # Extract the items of this and the next unprocessed requests with a single model call
+                upcoming = [pending[position]] + [
+                    entry for entry in pending
+                    if entry[0] != idx and entry[0] + 1 not in processed and entry[0] + 1 not in extracted
+                ]
+                extracted.update(orchestrator.extract_items_batch({
+                    upcoming_idx + 1: f"{upcoming_row['request']} (Date of request: {upcoming_date})"
+                    for upcoming_idx, upcoming_row, upcoming_date, _ in upcoming[:extraction_batch_size]
+                }))
+
+            runner_log.info(
+                "\n=== Request %d ===\nContext: %s organizing %s\nRequest Date: %s\n"
+                "Cash Balance: $%.2f\nInventory Value: $%.2f",
+                idx + 1, row["job"], row["event"], request_date, current_cash, current_inventory,
+            )
 
-        print(f"\n=== Request {idx+1} ===")
-        print(f"Context: {row['job']} organizing {row['event']}")
-        print(f"Request Date: {request_date}")
-        print(f"Cash Balance: ${current_cash:.2f}")
-        print(f"Inventory Value: ${current_inventory:.2f}")
-
-        # Process request
-        request_with_date = f"{row['request']} (Date of request: {request_date})"
-
-        ############
-        ############
-        ############
-        # USE YOUR MULTI AGENT SYSTEM TO HANDLE THE REQUEST
-        ############
-        ############
-        ############
-
-        response = orchestrator.process_request(
-            request=request_with_date,
-            date=request_date,
-            job_type=row['job'],
-            event_type=row['event']
-        )
-
-        # Update state
-        report = generate_financial_report(request_date)
-        current_cash = report["cash_balance"]
-        current_inventory = report["inventory_value"]
-
-        print(f"Response: {response}")
-        print(f"Updated Cash: ${current_cash:.2f}")
-        print(f"Updated Inventory: ${current_inventory:.2f}")
+            # Process request
+            request_with_date = f"{row['request']} (Date of request: {request_date})"
+
+            ############
+            ############
+            ############
+            # USE YOUR MULTI AGENT SYSTEM TO HANDLE THE REQUEST
+            ############
+            ############
+            ############
+
+            # The request and the report read after it share one read cache
+            with unit_of_work(version=get_ledger_version):
+                response = orchestrator.process_request(
+                    request=request_with_date,
+                    date=request_date,
+                    job_type=row['job'],
+                    event_type=row['event'],
+                    items=extracted.pop(idx + 1, None)
+                )
+
+                # Update state
+                report = generate_financial_report(request_date)
+            current_cash = report["cash_balance"]
+            current_inventory = report["inventory_value"]
+
+            runner_log.info(
+                "Response: %s\nUpdated Cash: $%.2f\nUpdated Inventory: $%.2f", response, current_cash, current_inventory,
+                extra={"request_id": idx + 1, "cash_balance": current_cash, "inventory_value": current_inventory},
+            )
 
-        results.append(
-            {
+            result = {
                 "request_id": idx + 1,
                 "request_date": request_date,
                 "cash_balance": current_cash,
                 "inventory_value": current_inventory,
                 "response": response,
             }
-        )
-
-        time.sleep(1)
+            if checkpoint is not None:
+                checkpoint.mark_pending(idx + 1, key, data_access.max_transaction_id())
+            if idx + 1 not in already_written:
+                sink.write(result)
+            if results is not None:
+                results.append(result)
+            processed.add(idx + 1)
+
+            time.sleep(1)
+
+        if schedule_policy is None:
+            for position in range(len(pending)):
+                handle_request(position)
+        else:
+            # Requests arrive on their request date; each day's requests are dispatched by priority
+            scheduler = RequestScheduler(handle_request, policy=schedule_policy)
+            with scheduler:
+                for request_date, positions in groupby(range(len(pending)), key=lambda position: pending[position][2]):
+                    futures = [
+                        scheduler.submit(
+                            pending[position][0] + 1,
+                            size=pending[position][1].get("need_size"),
+                            deadline=parse_deadline(pending[position][1]["request"]),
+                            request_date=request_date,
+                            position=position,
+                        )
+                        for position in positions
+                    ]
+                    for future in futures:
+                        future.result()
+
+    usage = orchestrator.extraction_usage
+    runner_log.info(
+        "Item extraction: %d model calls, %d prompt tokens, %d completion tokens",
+        usage["calls"], usage["prompt_tokens"], usage["completion_tokens"], extra=usage,
+    )
+    if scheduler is not None:
+        for priority_class, latency in scheduler.latency_report().items():
+            runner_log.info(
+                "%s requests: %d, mean wait %.2fs, mean latency %.2fs, p95 latency %.2fs",
+                priority_class, latency["count"], latency["mean_wait"], latency["mean_latency"], latency["p95_latency"],
+                extra={"priority_class": priority_class, **latency},
+            )
+    if orchestrator.model_router is not None:
+        log_model_routes(orchestrator.model_router)
+    if orchestrator.call_policy is not None:
+        log_llm_calls(orchestrator.call_policy)
 
     # Final report
     final_date = quote_requests_sample["request_date"].max().strftime("%Y-%m-%d")
     final_report = generate_financial_report(final_date)
-    print("\n===== FINAL FINANCIAL REPORT =====")
-    print(f"Final Cash: ${final_report['cash_balance']:.2f}")
-    print(f"Final Inventory: ${final_report['inventory_value']:.2f}")
+    runner_log.info(
+        "\n===== FINAL FINANCIAL REPORT =====\nFinal Cash: $%.2f\nFinal Inventory: $%.2f",
+        final_report["cash_balance"], final_report["inventory_value"],
+    )
 
-    # Save results
-    pd.DataFrame(results).to_csv("test_results.csv", index=False)
+    orchestrator.close()
+    data_access.flush()
+    if checkpoint is not None:
+        checkpoint.finish()
     return results
 
+def log_model_routes(router: ModelRouter, **extra) -> None:
+    """Log the calls, fallback rate and latency of each model route used so far."""
+    for route, route_stats in router.stats().items():
+        runner_log.info(
+            "%s route: %d calls (%.0f%%), fallback rate %.1f%%, p50 latency %.2fs, p95 latency %.2fs",
+            route, route_stats["calls"], route_stats["share"] * 100, route_stats["fallback_rate"] * 100,
+            route_stats["p50_latency"], route_stats["p95_latency"],
+            extra={"route": route, **route_stats, **extra},
+        )
+
+def log_llm_calls(policy: CallPolicy, **extra) -> None:
+    """Log the outcomes, hedging and latency percentiles of the model calls made so far."""
+    llm_stats = policy.stats()
+    runner_log.info(
+        "Model calls: %d, %d failed (%d past the deadline, %d rejected by the open circuit), "
+        "%d hedged (%d won by the hedge), p50 latency %.2fs, p95 latency %.2fs, p99 latency %.2fs",
+        llm_stats["calls"], llm_stats["failed"] + llm_stats["rejected"], llm_stats["deadline_exceeded"],
+        llm_stats["rejected"], llm_stats["hedged"], llm_stats["hedge_wins"], llm_stats.get("p50_latency", 0.0),
+        llm_stats.get("p95_latency", 0.0), llm_stats.get("p99_latency", 0.0),
+        extra={**llm_stats, **extra},
+    )
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Munder Difflin multi-agent test scenarios.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes. Values above 1 start a single ledger-writer process "
+             "that owns all transaction writes (default: 1, run serially in this process).",
+    )
+    parser.add_argument(
+        "--results-path", default="test_results.csv",
+        help="File that results are streamed to as each request completes (default: test_results.csv).",
+    )
+    parser.add_argument(
+        "--results-format", choices=RESULT_FORMATS, default=None,
+        help="Results file format; inferred from the --results-path extension if omitted.",
+    )
+    parser.add_argument(
+        "--flush-every", type=int, default=1,
+        help="Flush the results file after this many results (default: 1).",
+    )
+    parser.add_argument(
+        "--checkpoint", default="run_checkpoint.json",
+        help="Checkpoint file saved whenever results are flushed (default: run_checkpoint.json).",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue the run recorded in --checkpoint instead of starting over.",
+    )
+    parser.add_argument(
+        "--extract-batch-size", type=int, default=1,
+        help="Extract the items of this many requests with one model call, sending the catalog "
+             "once per call (default: 1, one call per request).",
+    )
+    parser.add_argument(
+        "--schedule", choices=SCHEDULE_POLICIES, default=None,
+        help="Dispatch each day's requests by priority (edf: earliest deadline first, size_weighted: "
+             "small orders first at equal deadlines) and log latency per priority class (default: file order).",
+    )
+    parser.add_argument(
+        "--route-models", action="store_true",
+        help="Send each model call to a template, OPENAI_FAST_MODEL_ID or OPENAI_STRONG_MODEL_ID "
+             "depending on its complexity, and log calls, fallbacks and latency per route.",
+    )
+    parser.add_argument(
+        "--llm-deadline", type=float, default=None, metavar="SECONDS",
+        help="Give each model call at most this many seconds, send a duplicate request when a call "
+             "runs past the p95 latency, and use the fallback replies while the provider keeps "
+             "failing; log p50/p95/p99 latency (default: no deadline).",
+    )
+    parser.add_argument(
+        "--storage", choices=("sqlite", "memory"), default="sqlite",
+        help="Keep the ledger in SQLite, or in memory and write it to the database whenever "
+             "results are saved (default: sqlite).",
+    )
+    parser.add_argument(
+        "--warehouses", default=None, metavar="SPEC",
+        help="Partition inventory across fulfillment sites, e.g. 'east=0.5,west=0.3,central=0.2' "
+             "(default: a single ledger).",
+    )
+    parser.add_argument(
+        "--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+        help="Minimum level of log records to output (default: INFO).",
+    )
+    parser.add_argument(
+        "--log-json", action="store_true",
+        help="Write log records as one JSON object per line.",
+    )
+    parser.add_argument(
+        "--log-file", default=None,
+        help="Append log records to this file instead of stdout.",
+    )
+    return parser.parse_args(argv)
+
 # Execute the test scenarios when the script is run
 if __name__ == "__main__":
-    print("Starting The Beaver's Choice Paper Company Multi-Agent System...")
-    run_test_scenarios()
-    print("Test scenarios completed. Results saved to test_results.csv")
\ No newline at end of file
+    # Helper modules import `project_starter`; make them share this module's state.
+    sys.modules.setdefault("project_starter", sys.modules[__name__])
+
+    args = parse_args()
+    configure_logging(args.log_level, json_output=args.log_json, log_file=args.log_file)
+    runner_log.info("Starting The Beaver's Choice Paper Company Multi-Agent System...")
+    sink_options = {
+        "results_path": args.results_path,
+        "results_format": args.results_format,
+        "flush_every": args.flush_every,
+        "extraction_batch_size": args.extract_batch_size,
+        "route_models": args.route_models,
+        "llm_deadline": args.llm_deadline,
+    }
+    if args.storage != "sqlite":
+        if args.workers > 1:
+            sys.exit("--storage memory is only supported for serial runs (--workers 1)")
+        use_storage(args.storage)
+    if args.warehouses:
+        if args.workers > 1:
+            sys.exit("--warehouses is only supported for serial runs (--workers 1)")
+        if args.resume:
+            sys.exit("--resume is not supported with --warehouses")
+        from warehouses import parse_warehouse_shares
+        try:
+            # The scenario run initializes the database, which creates the sites
+            use_warehouses(parse_warehouse_shares(args.warehouses), create=False)
+        except ValueError as e:
+            sys.exit(f"Invalid --warehouses: {e}")
+    if args.workers > 1:
+        if args.resume:
+            sys.exit("--resume is only supported for serial runs (--workers 1)")
+        if args.schedule:
+            sys.exit("--schedule is only supported for serial runs (--workers 1)")
+        from ledger_service import run_parallel_scenarios
+        run_parallel_scenarios(args.workers, **sink_options)
+    else:
+        run_test_scenarios(
+            keep_results=False, checkpoint_path=None if args.warehouses else args.checkpoint, resume=args.resume,
+            schedule_policy=args.schedule, **sink_options
+        )
+    runner_log.info("Test scenarios completed. Results saved to %s", args.results_path)
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Structured line items parsed from the free-text quote history.
+
+Each historical quote in quotes.csv explains its pricing in prose ("500 sheets of A4
+paper at $0.05 each ... a 10% discount"). Matching new requests against that prose at
+quote time means a LIKE scan and a re-parse on every lookup, so `init_database` parses
+every explanation once with `parse_quote_explanation` and stores the result in the
+indexed `quote_lines` table. The parser is deliberately conservative: a mention is kept
+only when it names a catalog item or at least one of the catalog's product nouns, and
+fields it cannot read from the text are left as None rather than guessed.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Quantity bands used to bucket historical lines, as (label, low, high) with `high`
+# exclusive; a line of quantity q falls in the first band with low <= q < high.
+QUANTITY_BANDS: Tuple[Tuple[str, int, float], ...] = (
+    ("1-99", 1, 100),
+    ("100-499", 100, 500),
+    ("500-999", 500, 1000),
+    ("1000-4999", 1000, 5000),
+    ("5000+", 5000, float("inf")),
+)
+
+_UNIT_WORDS = r"(?:reams?|sheets?|boxes|box|packs?|packets?|rolls?|units?|pieces?|pads?|sets?|bundles?|cases?|cartons?)"
+
+# A bare quantity: not part of a price ($0.05), a percentage (10%), a date (April 15,
+# 2025), a decimal or a product code (A4), followed by an optional unit word and the
+# item phrase, which runs up to the next preposition, verb or punctuation.
+_LINE = re.compile(
+    r"(?<![\w$.,])(\d{1,3}(?:,\d{3})+|\d+)(?![\d%]|,\d|\.\d)"
+    r"\s+(?:" + _UNIT_WORDS + r"\s+(?:of\s+)?)?"
+    r"(?P<item>[A-Za-z][\w\-/ ]*?)"
+    r"(?=\s+(?:at|for|priced|will|would|is|are|was|were|which|to|totals?|totaling|costs?|with|in"
+    r"|that|remain|on|from|as|comes?|due|and)\b|\s*[(,.;:!?]|$)"
+)
+_UNIT_PRICE = re.compile(r"\$(\d+(?:,\d{3})*(?:\.\d+)?)\s*(?:each|apiece|per\s+\w+|a\s+\w+)")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*(?:bulk\s+)?discount", re.IGNORECASE)
+
+
+def _tokens(text: str) -> List[str]:
+    # Lower-cased words with a trailing plural "s" dropped, so "flyers" matches "Flyers"
+    # and "envelopes" matches "Envelopes"
+    return [word[:-1] if word.endswith("s") and len(word) > 3 else word for word in re.findall(r"[a-z0-9]+", text.lower())]
+
+
+class _Catalog:
+    """Token index over the catalog names used to resolve item phrases."""
+
+    def __init__(self, names: Iterable[str]):
+        self.names = [(name, frozenset(_tokens(name))) for name in names]
+        # Head nouns ("paper", "cup", "cardstock") mark a phrase as a product mention
+        # even when it does not resolve to a single catalog item
+        self.nouns = frozenset(_tokens(name)[-1] for name, _ in self.names)
+
+    def resolve(self, phrase: str) -> Optional[str]:
+        words = _tokens(phrase)
+        if not words:
+            return None
+        head = words[-1]
+        best, best_rank = None, (False, 0)
+        for name, tokens in self.names:
+            # Among fully-contained names, one sharing the phrase's head noun wins
+            # ("paper napkins" over "decorative paper"), then the longest
+            rank = (head in tokens, len(tokens))
+            if tokens <= set(words) and rank > best_rank:
+                best, best_rank = name, rank
+        return best
+
+    def is_product(self, phrase: str) -> bool:
+        return any(word in self.nouns for word in _tokens(phrase))
+
+
+def parse_quote_explanation(
+    explanation: str, catalog_names: Iterable[str], total_amount: Optional[float] = None
+) -> List[Dict]:
+    """
+    Extract the line items mentioned in one quote explanation.
+
+    Args:
+        explanation (str): The free-text quote explanation.
+        catalog_names (Iterable[str]): Catalog item names to resolve item phrases against.
+        total_amount (float, optional): The quote's final total. When every line carries
+            a unit price and the text states no explicit percentage, the discount rate is
+            implied from the gap between the list total and this amount.
+
+    Returns:
+        List[Dict]: One dict per mentioned item, in order of appearance, with keys
+                    'item_name' (catalog name, or None if the phrase names no single
+                    catalog item), 'item_text' (the phrase as written), 'quantity',
+                    'unit_price' (None if not stated next to the quantity) and
+                    'discount_rate' (the quote-level rate, or None if unknown).
+    """
+    catalog = catalog_names if isinstance(catalog_names, _Catalog) else _Catalog(catalog_names)
+    matches = list(_LINE.finditer(explanation))
+
+    lines = []
+    seen = set()
+    for index, match in enumerate(matches):
+        phrase = re.sub(r"^(?:of|the)\s+", "", match.group("item").strip())
+        if not catalog.is_product(phrase):
+            continue
+        item_name = catalog.resolve(phrase)
+        quantity = int(match.group(1).replace(",", ""))
+        # A later sentence restating the same line ("... totaling $25 for 500 sheets")
+        if (item_name or phrase.lower(), quantity) in seen:
+            continue
+        seen.add((item_name or phrase.lower(), quantity))
+
+        # The unit price belongs to this line only if it appears before the next
+        # quantity mention and within the same sentence
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(explanation)
+        clause = re.split(r"\.\s", explanation[match.end():end], maxsplit=1)[0]
+        price = _UNIT_PRICE.search(clause)
+        lines.append({
+            "item_name": item_name,
+            "item_text": phrase,
+            "quantity": quantity,
+            "unit_price": float(price.group(1).replace(",", "")) if price else None,
+        })
+
+    discount_rate = None
+    percent = _PERCENT.search(explanation)
+    if percent:
+        discount_rate = float(percent.group(1)) / 100
+    elif lines and total_amount is not None and all(line["unit_price"] is not None for line in lines):
+        list_total = sum(line["quantity"] * line["unit_price"] for line in lines)
+        implied = 1 - total_amount / list_total if list_total else None
+        # A total above list, or a gap this large, means the text missed a line
+        if implied is not None and 0 <= implied < 0.5:
+            discount_rate = round(implied, 4)
+    for line in lines:
+        line["discount_rate"] = discount_rate
+    return lines
+
+
+def parse_quote_history(quotes: Iterable[Dict], catalog_names: Iterable[str]) -> List[Dict]:
+    """
+    Parse every historical quote into flat `quote_lines` rows.
+
+    Args:
+        quotes (Iterable[Dict]): Quote rows with 'request_id', 'quote_explanation',
+            'total_amount', 'order_size', 'event_type' and 'job_type'.
+        catalog_names (Iterable[str]): Catalog item names to resolve item phrases against.
+
+    Returns:
+        List[Dict]: The parsed lines, each carrying its quote's 'request_id',
+                    'order_size', 'event_type' and 'job_type'.
+    """
+    catalog = _Catalog(catalog_names)
+    rows = []
+    for quote in quotes:
+        for line in parse_quote_explanation(quote["quote_explanation"] or "", catalog, quote.get("total_amount")):
+            line["request_id"] = quote["request_id"]
+            line["order_size"] = quote.get("order_size")
+            line["event_type"] = quote.get("event_type")
+            line["job_type"] = quote.get("job_type")
+            rows.append(line)
+    return rows
+
+
+def quantity_band(quantity: int) -> Tuple[str, int, float]:
+    """Return the (label, low, high) entry of `QUANTITY_BANDS` containing `quantity`."""
+    for band in QUANTITY_BANDS:
+        if band[1] <= quantity < band[2]:
+            return band
+    return QUANTITY_BANDS[0]
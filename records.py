@@ -0,0 +1,234 @@
+"""
+Compact typed records for quotes, quote lines and orders.
+
+The tool functions in `project_starter` historically passed these around as nested
+dicts. The classes below use `__slots__` so that each record carries no per-instance
+`__dict__`, which keeps bulk quoting runs small and fast to construct. Every record
+converts back to the original dict shape with `to_dict()`, so the dict-returning tools
+remain thin adapters over these types.
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class QuoteLine:
+    """One requested item within a quote."""
+
+    __slots__ = ("item_name", "quantity", "available", "unit_price", "item_total", "available_stock", "reason", "sources")
+
+    def __init__(
+        self,
+        item_name: str,
+        quantity: int,
+        available: bool,
+        unit_price: Optional[float] = None,
+        item_total: Optional[float] = None,
+        available_stock: Optional[int] = None,
+        reason: Optional[str] = None,
+        sources: Optional[List[Tuple[str, int]]] = None,
+    ):
+        self.item_name = item_name
+        self.quantity = quantity
+        self.available = available
+        self.unit_price = unit_price
+        self.item_total = item_total
+        self.available_stock = available_stock
+        self.reason = reason
+        # (warehouse, units) per site the line ships from; None for a single ledger
+        self.sources = sources
+
+    def __repr__(self) -> str:
+        return f"QuoteLine({self.item_name!r}, quantity={self.quantity}, available={self.available})"
+
+    def to_dict(self) -> Dict:
+        line = {"item_name": self.item_name, "quantity": self.quantity, "available": self.available}
+        if self.available_stock is not None:
+            line["available_stock"] = self.available_stock
+        if self.unit_price is not None:
+            line["unit_price"] = self.unit_price
+        if self.item_total is not None:
+            line["item_total"] = self.item_total
+        if self.reason is not None:
+            line["reason"] = self.reason
+        if self.sources is not None:
+            line["sources"] = [{"warehouse": warehouse, "quantity": units} for warehouse, units in self.sources]
+        return line
+
+    @classmethod
+    def from_dict(cls, line: Dict) -> "QuoteLine":
+        return cls(
+            item_name=line["item_name"],
+            quantity=line["quantity"],
+            available=line["available"],
+            unit_price=line.get("unit_price"),
+            item_total=line.get("item_total"),
+            available_stock=line.get("available_stock"),
+            reason=line.get("reason"),
+            sources=[(source["warehouse"], source["quantity"]) for source in line["sources"]] if line.get("sources") else None,
+        )
+
+
+class Quote:
+    """A priced quote for a customer request."""
+
+    __slots__ = (
+        "date", "lines", "total_amount", "all_items_available", "explanation", "context",
+        "discount_rate", "discount_amount", "discount_reason",
+    )
+
+    def __init__(
+        self,
+        date: str,
+        lines: Optional[List[QuoteLine]] = None,
+        total_amount: float = 0.0,
+        all_items_available: bool = True,
+        explanation: str = "",
+        context: Optional[Dict] = None,
+        discount_rate: Optional[float] = None,
+        discount_amount: float = 0.0,
+        discount_reason: str = "",
+    ):
+        self.date = date
+        self.lines = lines if lines is not None else []
+        self.total_amount = total_amount
+        self.all_items_available = all_items_available
+        self.explanation = explanation
+        self.context = context or {}
+        self.discount_rate = discount_rate
+        self.discount_amount = discount_amount
+        self.discount_reason = discount_reason
+
+    def __repr__(self) -> str:
+        return (
+            f"Quote(date={self.date!r}, lines={len(self.lines)}, total_amount={self.total_amount:.2f}, "
+            f"all_items_available={self.all_items_available})"
+        )
+
+    def line_price(self, line: QuoteLine) -> float:
+        """Price charged for `line` once the quote-level discount is applied."""
+        if self.discount_rate is None:
+            return line.item_total
+        return line.item_total * (1 - self.discount_rate)
+
+    def to_dict(self) -> Dict:
+        quote = {
+            "date": self.date,
+            "items": [line.to_dict() for line in self.lines],
+            "total_amount": self.total_amount,
+            "all_items_available": self.all_items_available,
+            "explanation": self.explanation,
+            "context": self.context,
+        }
+        if self.discount_rate is not None:
+            quote["discount_applied"] = {
+                "rate": self.discount_rate,
+                "amount": self.discount_amount,
+                "reason": self.discount_reason,
+            }
+        return quote
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=_json_default)
+
+    @classmethod
+    def from_dict(cls, quote: Dict) -> "Quote":
+        discount = quote.get("discount_applied") or {}
+        return cls(
+            date=quote.get("date"),
+            lines=[QuoteLine.from_dict(line) for line in quote.get("items", [])],
+            total_amount=quote.get("total_amount", 0.0),
+            all_items_available=quote.get("all_items_available", False),
+            explanation=quote.get("explanation", ""),
+            context=quote.get("context"),
+            discount_rate=discount.get("rate"),
+            discount_amount=discount.get("amount", 0.0),
+            discount_reason=discount.get("reason", ""),
+        )
+
+
+class Order:
+    """The outcome of turning a quote into sales transactions."""
+
+    __slots__ = ("status", "date", "total_amount", "lines", "reason")
+
+    def __init__(
+        self,
+        status: str,
+        date: str,
+        total_amount: Optional[float] = None,
+        lines: Optional[List[Tuple[str, int, int]]] = None,
+        reason: Optional[str] = None,
+    ):
+        self.status = status
+        self.date = date
+        self.total_amount = total_amount
+        # (item_name, quantity, transaction_id) per recorded sale; None if nothing was attempted
+        self.lines = lines
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"Order(status={self.status!r}, date={self.date!r}, lines={len(self.lines or ())})"
+
+    @property
+    def transactions(self) -> List[int]:
+        return [transaction_id for _, _, transaction_id in self.lines or ()]
+
+    def to_dict(self) -> Dict:
+        if self.lines is None:
+            return {"status": self.status, "reason": self.reason, "date": self.date}
+
+        order = {
+            "status": self.status,
+            "date": self.date,
+            "items": [
+                {"item_name": item_name, "quantity": quantity, "transaction_id": transaction_id}
+                for item_name, quantity, transaction_id in self.lines
+            ],
+            "total_amount": self.total_amount,
+            "transactions": self.transactions,
+        }
+        if self.reason is not None:
+            order["reason"] = self.reason
+        return order
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=_json_default)
+
+
+def _json_default(value):
+    # NumPy scalars coming from pandas lookups
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def quotes_to_dataframe(quotes: Iterable[Quote]):
+    """
+    Flatten quotes into a DataFrame with one row per quote line.
+
+    Args:
+        quotes (Iterable[Quote]): The quotes to flatten.
+
+    Returns:
+        pd.DataFrame: Columns 'quote_index', 'date', 'item_name', 'quantity', 'available',
+                      'unit_price', 'line_price', 'discount_rate' and 'quote_total'.
+    """
+    import pandas as pd
+
+    columns = {
+        "quote_index": [], "date": [], "item_name": [], "quantity": [], "available": [],
+        "unit_price": [], "line_price": [], "discount_rate": [], "quote_total": [],
+    }
+    for index, quote in enumerate(quotes):
+        for line in quote.lines:
+            columns["quote_index"].append(index)
+            columns["date"].append(quote.date)
+            columns["item_name"].append(line.item_name)
+            columns["quantity"].append(line.quantity)
+            columns["available"].append(line.available)
+            columns["unit_price"].append(line.unit_price)
+            columns["line_price"].append(quote.line_price(line) if line.available else None)
+            columns["discount_rate"].append(quote.discount_rate or 0.0)
+            columns["quote_total"].append(quote.total_amount)
+    return pd.DataFrame(columns)
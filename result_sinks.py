@@ -0,0 +1,229 @@
+"""
+Streaming writers for test-run results.
+
+`run_test_scenarios` used to keep every result in memory and write `test_results.csv`
+once at the end, so a crash lost all completed work. A `ResultSink` instead appends
+each result as soon as it is produced. A write flushes to disk once `flush_every`
+records are pending or `flush_interval` seconds have passed since the last flush. The
+interval is only checked on a write, so an idle sink keeps its pending records until
+the next write or `close()`; there is no timer thread because `on_flush` saves the run's
+checkpoint, which must happen on the thread writing the results. Memory use does not
+grow with the number of results: CSV and JSONL sinks hold one line at a time, and the
+Parquet sink holds at most one row group.
+
+Use `open_result_sink` to pick a format from the file extension:
+
+    with open_result_sink("test_results.jsonl") as sink:
+        sink.write({"request_id": 1, "response": "..."})
+"""
+
+import csv
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+RESULT_FORMATS = ("csv", "jsonl", "parquet")
+
+
+def _plain(value: Any) -> Any:
+    # NumPy scalars coming from pandas lookups
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class ResultSink(ABC):
+    """
+    Base class for streaming result writers.
+
+    Args:
+        path (str): Output file.
+        flush_every (int, optional): Flush after this many records. Default is 1.
+        flush_interval (float, optional): Also flush on a write made this many seconds or
+                                          more after the last flush. Default is 5.0.
+        append (bool, optional): Add to an existing file instead of replacing it. Default is False.
+        on_flush (Callable, optional): Called after every flush, once the records are on disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_every: int = 1,
+        flush_interval: float = 5.0,
+        append: bool = False,
+        on_flush: Optional[Callable[[], None]] = None,
+    ):
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1")
+
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.append = append
+        self.on_flush = on_flush
+        self.records_written = 0
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def write(self, record: Dict) -> None:
+        """Write one result record, flushing if a threshold has been reached."""
+        self._write({key: _plain(value) for key, value in record.items()})
+        self.records_written += 1
+        self._pending += 1
+
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Push buffered records to disk."""
+        self._flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def close(self) -> None:
+        """Flush remaining records and release the file."""
+        self.flush()
+        self._close()
+
+    @abstractmethod
+    def _write(self, record: Dict) -> None:
+        """Buffer or write one record."""
+
+    @abstractmethod
+    def _flush(self) -> None:
+        """Put the records written so far on disk."""
+
+    @abstractmethod
+    def _close(self) -> None:
+        """Release the file."""
+
+
+class CsvResultSink(ResultSink):
+    """
+    Appends results as CSV rows. The header is taken from `fieldnames` or the first record.
+    """
+
+    def __init__(self, path: str, fieldnames: Optional[List[str]] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        has_rows = self.append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.fieldnames = fieldnames
+        self._header_written = has_rows
+        if has_rows and fieldnames is None:
+            with open(path, newline="", encoding="utf-8") as f:
+                self.fieldnames = next(csv.reader(f))
+        self._file = open(path, "a" if self.append else "w", newline="", encoding="utf-8")
+        self._writer = None
+
+    def _write(self, record: Dict) -> None:
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(record)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+            if not self._header_written:
+                self._writer.writeheader()
+                self._header_written = True
+        self._writer.writerow(record)
+
+    def _flush(self) -> None:
+        self._file.flush()
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class JsonlResultSink(ResultSink):
+    """
+    Appends results as one JSON object per line.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, "a" if self.append else "w", encoding="utf-8")
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, default=str))
+        self._file.write("\n")
+
+    def _flush(self) -> None:
+        self._file.flush()
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultSink(ResultSink):
+    """
+    Writes results to a Parquet file, one row group per flush.
+
+    Requires `pyarrow`. Parquet files cannot be appended to, so `append=True` is rejected;
+    the file becomes readable once the sink is closed.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        if self.append:
+            raise ValueError("Parquet result files cannot be appended to; use CSV or JSONL to resume runs")
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Writing Parquet results requires pyarrow: pip install pyarrow") from e
+
+        self._rows: List[Dict] = []
+        self._writer = None
+
+    def _write(self, record: Dict) -> None:
+        self._rows.append(record)
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = pa.Table.from_pylist(self._rows)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pylist(self._rows, schema=self._writer.schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+_SINKS = {"csv": CsvResultSink, "jsonl": JsonlResultSink, "parquet": ParquetResultSink}
+
+
+def open_result_sink(path: str, result_format: Optional[str] = None, **kwargs) -> ResultSink:
+    """
+    Open a result sink for `path`.
+
+    Args:
+        path (str): Output file.
+        result_format (str, optional): One of 'csv', 'jsonl' or 'parquet'. Inferred from the
+                                       file extension if omitted.
+        **kwargs: Passed to the sink (`flush_every`, `flush_interval`, `append`, ...).
+
+    Returns:
+        ResultSink: An open sink; close it (or use it as a context manager) when done.
+    """
+    if result_format is None:
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        result_format = {"json": "jsonl", "ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+
+    if result_format not in _SINKS:
+        raise ValueError(f"Unsupported result format {result_format!r}; expected one of {', '.join(RESULT_FORMATS)}")
+    return _SINKS[result_format](path, **kwargs)
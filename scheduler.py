@@ -0,0 +1,315 @@
+"""
+Deadline-aware scheduling of customer requests.
+
+Requests state a delivery deadline ("delivered by April 15, 2025") and a size
+(`need_size`), but used to be processed strictly in arrival order, so an urgent small
+order could wait behind several large multi-item ones. `RequestScheduler` sits in front
+of `OrchestratorAgent.process_request` and dispatches queued requests by priority:
+
+    fifo            arrival order
+    edf             earliest deadline first
+    size_weighted   earliest size-weighted deadline first: the slack until the deadline is
+                    stretched by `SIZE_WEIGHTS`, so a small order with the same deadline
+                    goes before a large one
+
+Each request belongs to a priority class ('urgent' when its deadline is at most
+`URGENT_DAYS` away, otherwise its size). A class can be capped to a number of requests
+processed at once, e.g. `class_limits={"large": 1}` keeps large orders from occupying
+every worker. Waiting requests age: every second in the queue counts as `aging` seconds
+closer to the deadline, so low-priority requests cannot starve. Queue wait and processing
+time are recorded per class:
+
+    with RequestScheduler(orchestrator.process_request, policy="edf", max_concurrency=2) as scheduler:
+        future = scheduler.submit(1, request=text, date="2025-04-07", size="small")
+    scheduler.latency_report()
+"""
+
+import contextvars
+import heapq
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date as date_type, datetime
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+
+from latency_stats import percentile
+
+POLICIES = ("fifo", "edf", "size_weighted")
+
+# Slack multiplier per request size for the size-weighted policy
+SIZE_WEIGHTS = {"small": 1.0, "medium": 2.0, "large": 4.0}
+
+# Requests due within this many days of their request date are in the 'urgent' class
+URGENT_DAYS = 3
+
+# Deadline assumed for requests that do not state one, in days after the request date
+DEFAULT_SLACK_DAYS = 30
+
+PRIORITY_CLASSES = ("urgent", "small", "medium", "large")
+
+_SECONDS_PER_DAY = 86400.0
+
+_DEADLINE_PATTERN = re.compile(
+    r"\b(?:by|before|until|no later than)\s+(?:\w+day,?\s+)?"
+    r"(January|February|March|April|May|June|July|August|September|October|November|December)"
+    r"\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})",
+    re.IGNORECASE,
+)
+
+
+def parse_deadline(request: str) -> Optional[str]:
+    """
+    The delivery deadline stated in a request, e.g. "delivered by April 15, 2025".
+
+    Returns:
+        str or None: The deadline as 'YYYY-MM-DD', or None if the request states none.
+    """
+    match = _DEADLINE_PATTERN.search(request)
+    if match is None:
+        return None
+    month, day, year = match.groups()
+    try:
+        return datetime.strptime(f"{month} {day} {year}", "%B %d %Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def priority_class(size: Optional[str], deadline: Optional[str], request_date: Optional[str]) -> str:
+    """'urgent' if the deadline is at most `URGENT_DAYS` after the request date, otherwise the size."""
+    if deadline is not None and request_date is not None:
+        if (_to_date(deadline) - _to_date(request_date)).days <= URGENT_DAYS:
+            return "urgent"
+    return size if size in SIZE_WEIGHTS else "medium"
+
+
+class ScheduledRequest:
+    """
+    A request in the scheduler, with its priority and timings (monotonic seconds).
+    """
+
+    __slots__ = (
+        "request_id", "kwargs", "priority_class", "deadline", "size",
+        "submitted", "started", "finished", "future", "sort_key", "context",
+    )
+
+    def __init__(self, request_id: Any, kwargs: Dict, priority_class: str, deadline: Optional[str], size: Optional[str]):
+        self.request_id = request_id
+        self.kwargs = kwargs
+        self.priority_class = priority_class
+        self.deadline = deadline
+        self.size = size
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future: Future = Future()
+        self.sort_key = None
+        # The handler runs in the submitter's context variables
+        self.context = contextvars.copy_context()
+
+    def __lt__(self, other: "ScheduledRequest") -> bool:
+        return self.sort_key < other.sort_key
+
+
+class RequestScheduler:
+    """
+    Priority queues and worker threads in front of a request handler.
+
+    Args:
+        handler (Callable): Processes one request; called with the keyword arguments given to `submit`.
+        policy (str, optional): One of `POLICIES`. Default is 'edf'.
+        max_concurrency (int, optional): Requests processed at once. Default is 1.
+        class_limits (Dict[str, int], optional): Most requests of a priority class processed at once.
+        aging (float, optional): Deadline seconds gained per second of waiting. Default is one hour.
+
+    Raises:
+        ValueError: If `policy` is unknown.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        policy: str = "edf",
+        max_concurrency: int = 1,
+        class_limits: Optional[Dict[str, int]] = None,
+        aging: float = 3600.0,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.handler = handler
+        self.policy = policy
+        self.max_concurrency = max_concurrency
+        self.class_limits = dict(class_limits or {})
+        self.aging = aging
+
+        self._queues: Dict[str, List[ScheduledRequest]] = {}
+        self._running: Dict[str, int] = {}
+        self._completed: Dict[str, List[ScheduledRequest]] = {}
+        self._condition = threading.Condition()
+        self._sequence = count()
+        self._workers: List[threading.Thread] = []
+        self._closed = False
+
+    @property
+    def queued(self) -> int:
+        """Requests waiting to be dispatched."""
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def submit(
+        self,
+        request_id: Any,
+        size: Optional[str] = None,
+        deadline: Optional[str] = None,
+        request_date: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Future:
+        """
+        Queue a request.
+
+        Args:
+            request_id: Identifies the request in the latency records.
+            size (str, optional): 'small', 'medium' or 'large', e.g. the request's `need_size`.
+            deadline (str, optional): Delivery deadline; parsed from `kwargs['request']` if omitted.
+            request_date (str, optional): Date of the request; defaults to `kwargs['date']`.
+            **kwargs: Passed to the handler, e.g. `request` and `date` for `process_request`.
+
+        Returns:
+            Future: Resolves to the handler's result.
+
+        Raises:
+            RuntimeError: If the scheduler was closed.
+        """
+        request_date = request_date or kwargs.get("date")
+        if deadline is None and isinstance(kwargs.get("request"), str):
+            deadline = parse_deadline(kwargs["request"])
+        scheduled = ScheduledRequest(
+            request_id, kwargs, priority_class(size, deadline, request_date), deadline, size
+        )
+        scheduled.sort_key = (self._priority(scheduled, request_date) + self.aging * scheduled.submitted, next(self._sequence))
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed scheduler")
+            heapq.heappush(self._queues.setdefault(scheduled.priority_class, []), scheduled)
+            if len(self._workers) < self.max_concurrency:
+                worker = threading.Thread(target=self._work, name=f"scheduler-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+        return scheduled.future
+
+    def _priority(self, scheduled: ScheduledRequest, request_date: Optional[str]) -> float:
+        # Seconds; waiting lowers the effective value by `aging` per second, which is the
+        # same for every queued request and so is folded into the static sort key
+        if self.policy == "fifo":
+            return 0.0
+        reference = _timestamp(request_date) if request_date else time.time()
+        deadline = _timestamp(scheduled.deadline) if scheduled.deadline else reference + DEFAULT_SLACK_DAYS * _SECONDS_PER_DAY
+        if self.policy == "edf":
+            return deadline
+        slack = max(deadline - reference, 0.0) + _SECONDS_PER_DAY
+        return reference + slack * SIZE_WEIGHTS.get(scheduled.size, SIZE_WEIGHTS["medium"])
+
+    def _next(self) -> Optional[ScheduledRequest]:
+        # The highest-priority head among classes below their concurrency limit
+        best = None
+        for priority_class, queue in self._queues.items():
+            if not queue:
+                continue
+            limit = self.class_limits.get(priority_class)
+            if limit is not None and self._running.get(priority_class, 0) >= limit:
+                continue
+            if best is None or queue[0] < best:
+                best = queue[0]
+        if best is not None:
+            heapq.heappop(self._queues[best.priority_class])
+            self._running[best.priority_class] = self._running.get(best.priority_class, 0) + 1
+        return best
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                scheduled = self._next()
+                while scheduled is None:
+                    if self._closed and not any(self._queues.values()):
+                        return
+                    self._condition.wait()
+                    scheduled = self._next()
+
+            scheduled.started = time.monotonic()
+            if scheduled.future.set_running_or_notify_cancel():
+                try:
+                    result = scheduled.context.run(self.handler, **scheduled.kwargs)
+                except BaseException as e:
+                    scheduled.future.set_exception(e)
+                else:
+                    scheduled.future.set_result(result)
+            scheduled.finished = time.monotonic()
+
+            with self._condition:
+                self._running[scheduled.priority_class] -= 1
+                self._completed.setdefault(scheduled.priority_class, []).append(scheduled)
+                self._condition.notify_all()
+
+    def join(self) -> None:
+        """Wait until every submitted request has been processed."""
+        with self._condition:
+            while any(self._queues.values()) or any(self._running.values()):
+                self._condition.wait()
+
+    def close(self, wait: bool = True) -> None:
+        """Stop accepting requests; queued ones are still processed."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def __enter__(self) -> "RequestScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def latency_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Latency of the processed requests per priority class, in seconds.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per class: 'count', mean and p95 of the queue 'wait',
+                                         mean 'service' time, and mean, p95 and max 'latency'
+                                         from submission to completion.
+        """
+        with self._condition:
+            completed = {priority_class: list(requests) for priority_class, requests in self._completed.items()}
+
+        report = {}
+        for priority_class in sorted(completed, key=_class_order):
+            requests = completed[priority_class]
+            waits = sorted(r.started - r.submitted for r in requests)
+            latencies = sorted(r.finished - r.submitted for r in requests)
+            report[priority_class] = {
+                "count": len(requests),
+                "mean_wait": sum(waits) / len(waits),
+                "p95_wait": percentile(waits, 0.95),
+                "mean_service": sum(r.finished - r.started for r in requests) / len(requests),
+                "mean_latency": sum(latencies) / len(latencies),
+                "p95_latency": percentile(latencies, 0.95),
+                "max_latency": latencies[-1],
+            }
+        return report
+
+
+def _class_order(priority_class: str) -> int:
+    return PRIORITY_CLASSES.index(priority_class) if priority_class in PRIORITY_CLASSES else len(PRIORITY_CLASSES)
+
+
+def _to_date(value: str) -> date_type:
+    return datetime.fromisoformat(value[:10]).date()
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value[:10]).timestamp()
@@ -0,0 +1,427 @@
+"""
+HTTP entry point for the Munder Difflin multi-agent system.
+
+A small asyncio HTTP/1.1 server (standard library only) that a front end can call
+instead of starting a Python process per request:
+
+    POST /requests    {"request": ..., "date": "YYYY-MM-DD", "job_type": ..., "event_type": ..., "customer": ...,
+                       "need_size": "small" | "medium" | "large", "deadline": "YYYY-MM-DD"}
+                      -> {"response": ...}   full `OrchestratorAgent.process_request` pipeline
+    POST /quotes      {"items": [{"item_name": ..., "quantity": ...}], "date": ..., "context": {...}}
+                      -> the `calculate_quote` dict
+    GET  /inventory?date=YYYY-MM-DD    -> `check_inventory_status`
+    GET  /financials?date=YYYY-MM-DD   -> `get_financial_snapshot`
+    GET  /health                       -> queue depth, in-flight work and latency per priority class
+
+Customer requests pass through a bounded admission queue served by a fixed number of
+worker threads, which take the most urgent request first (see `scheduler`); when the
+queue is full the server answers 429 with a Retry-After header instead of piling up
+work. Identical requests that arrive while one is in flight share its result rather
+than running (and ordering) twice. Read-only endpoints are answered from a response
+cache keyed on the ledger version (see `ledger_memoize`), so repeated
+reads between two ledger writes never leave the event loop.
+
+Run it with:
+
+    python service.py --port 8080 --workers 2 --queue-size 32
+"""
+
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from logging_config import configure_logging, get_logger
+from scheduler import POLICIES, RequestScheduler
+
+log = get_logger("service")
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+# Read-only responses kept before the cache is cleared
+MAX_CACHED_RESPONSES = 1024
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """An error answered with `status` and a JSON body holding `message`."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class OrderIntakeService:
+    """
+    Asyncio HTTP server in front of an `OrchestratorAgent`.
+
+    Args:
+        host (str, optional): Interface to listen on. Default is '127.0.0.1'.
+        port (int, optional): Port to listen on. Default is 8080.
+        workers (int, optional): Customer requests processed concurrently. Default is 1.
+        queue_size (int, optional): Customer requests admitted beyond those being processed
+                                    before the server answers 429. Default is 32.
+        orchestrator (OrchestratorAgent, optional): Created on start if omitted.
+        schedule_policy (str, optional): Order of queued requests, one of `scheduler.POLICIES`.
+                                         Default is 'edf', earliest deadline first.
+        class_limits (Dict[str, int], optional): Most requests of a priority class processed at
+                                                 once, e.g. {"large": 1}.
+        model_router (ModelRouter, optional): Routes the orchestrator's model calls by
+                                              complexity (see model_router.py); its per-route
+                                              stats are reported by /health.
+        call_policy (CallPolicy, optional): Deadlines, hedging and a circuit breaker for the
+                                            orchestrator's model calls (see llm_policy.py); its
+                                            stats are reported by /health.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        workers: int = 1,
+        queue_size: int = 32,
+        orchestrator=None,
+        schedule_policy: str = "edf",
+        class_limits: Optional[Dict[str, int]] = None,
+        model_router=None,
+        call_policy=None,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.orchestrator = orchestrator
+        self.model_router = model_router
+        self.call_policy = call_policy
+        self.scheduler = RequestScheduler(
+            self._process, policy=schedule_policy, max_concurrency=workers, class_limits=class_limits
+        )
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="intake")
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+        self._cache: Dict[Tuple, bytes] = {}
+        self._cache_version = None
+        self._request_ids = count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {"admitted": 0, "rejected": 0, "coalesced": 0, "cache_hits": 0}
+
+    async def start(self) -> None:
+        """Create the orchestrator if needed and start listening."""
+        import project_starter as ps
+
+        if self.orchestrator is None:
+            self.orchestrator = await self._run_blocking(ps.OrchestratorAgent)
+        if self.model_router is not None:
+            self.orchestrator.model_router = self.model_router
+        if self.call_policy is not None:
+            self.orchestrator.call_policy = self.call_policy
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info("Listening on http://%s:%d with %d workers, %s scheduling and an admission queue of %d",
+                 self.host, self.port, self.workers, self.scheduler.policy, self.queue_size)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Stop accepting connections; admitted requests are still processed."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.scheduler.close(wait=False)
+        self._executor.shutdown(wait=False)
+        if self.orchestrator is not None:
+            self.orchestrator.close()
+
+    def _run_blocking(self, func: Callable, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # Customer requests: admission control, scheduling and coalescing
+
+    def _process(self, **request: Any) -> Dict:
+        try:
+            return {"response": self.orchestrator.process_request(**request)}
+        except Exception:
+            log.exception("Error processing request")
+            raise
+
+    async def submit(self, key: Tuple, size: Optional[str] = None, deadline: Optional[str] = None) -> Dict:
+        """
+        Admit a customer request, or join an identical one already in flight.
+
+        Args:
+            key (Tuple): The request's (request, date, job_type, event_type, customer).
+            size (str, optional): 'small', 'medium' or 'large'; used for scheduling.
+            deadline (str, optional): Delivery deadline; parsed from the request if omitted.
+
+        Raises:
+            HTTPError: 429 if the admission queue is full.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        if self.scheduler.queued >= self.queue_size:
+            self.stats["rejected"] += 1
+            raise HTTPError(429, "Too many requests in progress, retry later", {"Retry-After": "1"})
+        request, date, job_type, event_type, customer = key
+        future = asyncio.wrap_future(self.scheduler.submit(
+            next(self._request_ids), size=size, deadline=deadline,
+            request=request, date=date, job_type=job_type, event_type=event_type, customer=customer,
+        ))
+        self.stats["admitted"] += 1
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    # Read-only endpoints: cached per ledger version
+
+    async def cached(self, key: Tuple, func: Callable, *args) -> bytes:
+        import project_starter as ps
+
+        version = ps.get_ledger_version()
+        if version != self._cache_version or len(self._cache) >= MAX_CACHED_RESPONSES:
+            self._cache.clear()
+            self._cache_version = version
+
+        body = self._cache.get(key)
+        if body is not None:
+            self.stats["cache_hits"] += 1
+            return body
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = self._in_flight[key] = asyncio.ensure_future(self._run_blocking(func, *args))
+            in_flight.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        body = _json_bytes(await asyncio.shield(in_flight))
+        if ps.get_ledger_version() == version:
+            self._cache[key] = body
+        return body
+
+    # HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = await _read_headers(reader)
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                except (ValueError, asyncio.IncompleteReadError):
+                    await _respond(writer, 400, _json_bytes({"error": "Malformed HTTP request"}), keep_alive=False)
+                    break
+                except HTTPError as e:
+                    await _respond(writer, e.status, _json_bytes({"error": e.message}), keep_alive=False)
+                    break
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                extra_headers = {}
+                try:
+                    status, payload = 200, await self._route(method, target, body)
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, _json_bytes({"error": e.message}), e.headers
+                except Exception as e:
+                    log.exception("Error handling %s %s", method, target)
+                    status, payload = 500, _json_bytes({"error": f"{type(e).__name__}: {e}"})
+                await _respond(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes) -> bytes:
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        routes = {
+            ("POST", "/requests"): self._post_request,
+            ("POST", "/quotes"): self._post_quote,
+            ("GET", "/inventory"): self._get_inventory,
+            ("GET", "/financials"): self._get_financials,
+            ("GET", "/health"): self._get_health,
+        }
+        handler = routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in routes):
+                raise HTTPError(405, f"{method} is not supported on {url.path}")
+            raise HTTPError(404, f"No endpoint at {url.path}")
+        return await handler(query, body)
+
+    async def _post_request(self, query: Dict[str, str], body: bytes) -> bytes:
+        data = _json_body(body, required=("request", "date"))
+        key = (data["request"], data["date"], data.get("job_type"), data.get("event_type"), data.get("customer"))
+        return _json_bytes(await self.submit(key, size=data.get("need_size"), deadline=data.get("deadline")))
+
+    async def _post_quote(self, query: Dict[str, str], body: bytes) -> bytes:
+        import project_starter as ps
+
+        data = _json_body(body, required=("items", "date"))
+        key = ("quote", json.dumps(data, sort_keys=True))
+        return await self.cached(key, ps.calculate_quote, data["items"], data["date"], data.get("context"))
+
+    async def _get_inventory(self, query: Dict[str, str], body: bytes) -> bytes:
+        import project_starter as ps
+
+        date = _required_param(query, "date")
+        return await self.cached(("inventory", date), ps.check_inventory_status, date)
+
+    async def _get_financials(self, query: Dict[str, str], body: bytes) -> bytes:
+        import project_starter as ps
+
+        date = _required_param(query, "date")
+        return await self.cached(("financials", date), ps.get_financial_snapshot, date)
+
+    async def _get_health(self, query: Dict[str, str], body: bytes) -> bytes:
+        health = {
+            "status": "ok",
+            "queue_depth": self.scheduler.queued,
+            "queue_size": self.queue_size,
+            "in_flight": len(self._in_flight),
+            **self.stats,
+            "latency": self.scheduler.latency_report(),
+        }
+        if self.model_router is not None:
+            health["model_routes"] = self.model_router.stats()
+        if self.call_policy is not None:
+            health["llm_calls"] = self.call_policy.stats()
+            if health["llm_calls"]["circuit"] != "closed":
+                health["status"] = "degraded"
+        return _json_bytes(health)
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            return headers
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+async def _respond(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes,
+    keep_alive: bool = True,
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    lines = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+def _json_bytes(value: Any) -> bytes:
+    return json.dumps(value, default=str).encode("utf-8")
+
+
+def _json_body(body: bytes, required: Tuple[str, ...]) -> Dict:
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    missing = [field for field in required if field not in data]
+    if missing:
+        raise HTTPError(400, f"Missing fields: {', '.join(missing)}")
+    return data
+
+
+def _required_param(query: Dict[str, str], name: str) -> str:
+    if name not in query:
+        raise HTTPError(400, f"Missing query parameter: {name}")
+    return query[name]
+
+
+def main(argv=None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the Munder Difflin multi-agent system over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Customer requests processed concurrently (default: 1).")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Requests admitted beyond those in progress before answering 429 (default: 32).")
+    parser.add_argument("--schedule", choices=POLICIES, default="edf",
+                        help="Order of queued requests (default: edf, earliest deadline first).")
+    parser.add_argument("--large-limit", type=int, default=None,
+                        help="Most large orders processed at once (default: no limit).")
+    parser.add_argument("--init-db", action="store_true", help="Reset the database before serving.")
+    parser.add_argument("--archive", default=None, metavar="DIR",
+                        help="Read closed months from the ledger archive in DIR (see archive.py).")
+    parser.add_argument("--route-models", action="store_true",
+                        help="Route model calls to a template, the fast or the strong model by complexity.")
+    parser.add_argument("--llm-deadline", type=float, default=None, metavar="SECONDS",
+                        help="Bound each model call to this many seconds, hedge slow calls and fall back "
+                             "while the provider keeps failing (default: no deadline).")
+    parser.add_argument("--log-level", default="INFO", help="Minimum level of log records (default: INFO).")
+    parser.add_argument("--log-json", action="store_true", help="Write log records as JSON lines.")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level, json_output=args.log_json)
+    import project_starter as ps
+    if args.archive:
+        ps.use_archive(args.archive)
+    if args.init_db:
+        ps.reset_database()
+    try:
+        ps.check_database()
+    except RuntimeError as e:
+        log.error("Cannot serve: %s", e)
+        return 1
+
+    model_router = None
+    if args.route_models:
+        from model_router import ModelRouter
+        model_router = ModelRouter.from_settings(ps.get_settings())
+
+    call_policy = None
+    if args.llm_deadline is not None:
+        from llm_policy import CallPolicy
+        call_policy = CallPolicy(deadline=args.llm_deadline)
+
+    service = OrderIntakeService(
+        args.host, args.port, workers=args.workers, queue_size=args.queue_size, schedule_policy=args.schedule,
+        class_limits={"large": args.large_limit} if args.large_limit else None, model_router=model_router,
+        call_policy=call_policy,
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
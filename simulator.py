@@ -0,0 +1,291 @@
+"""
+LLM-free what-if simulator for pricing and reorder policy.
+
+Evaluating a different volume discount or reorder formula used to mean re-running the
+whole agent pipeline, LLM calls included. The simulator instead replays a stream of
+already extracted requests (date plus item quantities) through the same quoting, sales
+and reordering rules as `build_quote`, `place_order` and `check_reorder_requirements`,
+entirely in NumPy. Every policy configuration is one row of the state arrays, so a whole
+parameter sweep advances in a single pass over the requests:
+
+    catalog = Catalog.from_ledger("2025-03-31")
+    stream = RequestStream.from_history(orchestrator.request_history.last(1000))
+    sweep = PolicySweep.grid(discount_rate=[0.05, 0.10, 0.15, 0.20], reorder_min_quantity=[250, 500, 1000])
+    results = simulate(catalog, stream, sweep)
+    results.to_dataframe().sort_values("final_cash")
+
+Requests are replayed in stream order against running totals, which matches the agents
+as long as requests arrive in date order. Stock orders count towards stock immediately,
+as they do in the ledger.
+"""
+
+import json
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Policy parameters and their values in the live system (see project_starter)
+POLICY_PARAMETERS = ("discount_threshold", "discount_rate", "reorder_min_quantity", "reorder_level_multiplier")
+
+
+def default_policy() -> Dict[str, float]:
+    """The pricing and reorder policy currently used by the agents."""
+    import project_starter as ps
+
+    return {
+        "discount_threshold": ps.VOLUME_DISCOUNT_THRESHOLD,
+        "discount_rate": ps.VOLUME_DISCOUNT_RATE,
+        "reorder_min_quantity": ps.REORDER_MIN_QUANTITY,
+        "reorder_level_multiplier": ps.REORDER_LEVEL_MULTIPLIER,
+    }
+
+
+class Catalog:
+    """
+    Stocked items and the starting position of a simulation.
+
+    Args:
+        item_names (Sequence[str]): Stocked items, in the order reorders are checked.
+        unit_prices (Sequence[float]): Catalog price per unit.
+        min_stock_levels (Sequence[int]): Reorder when stock is at or below this level.
+        initial_stock (Sequence[int]): Units on hand when the simulation starts.
+        initial_cash (float): Cash balance when the simulation starts.
+    """
+
+    def __init__(
+        self,
+        item_names: Sequence[str],
+        unit_prices: Sequence[float],
+        min_stock_levels: Sequence[int],
+        initial_stock: Sequence[int],
+        initial_cash: float,
+    ):
+        self.item_names = list(item_names)
+        self.index = {item_name: i for i, item_name in enumerate(self.item_names)}
+        self.unit_prices = np.asarray(unit_prices, dtype=np.float64)
+        self.min_stock_levels = np.asarray(min_stock_levels, dtype=np.int64)
+        self.initial_stock = np.asarray(initial_stock, dtype=np.int64)
+        self.initial_cash = float(initial_cash)
+
+    @classmethod
+    def from_ledger(cls, as_of_date: str) -> "Catalog":
+        """Read the catalog, stock and cash balance as of `as_of_date` from the ledger database."""
+        import project_starter as ps
+
+        data_access = ps.get_data_access()
+        items = data_access.inventory_items()
+        stock_levels = data_access.stock_levels(as_of_date)
+        return cls(
+            item_names=[item_name for item_name, _, _, _, _ in items],
+            unit_prices=[unit_price for _, _, unit_price, _, _ in items],
+            min_stock_levels=[min_level for _, _, _, _, min_level in items],
+            initial_stock=[stock_levels.get(item_name, 0) for item_name, _, _, _, _ in items],
+            initial_cash=data_access.cash_balance(as_of_date),
+        )
+
+
+class RequestStream:
+    """
+    Pre-extracted customer requests, compiled against a catalog-independent item list.
+
+    Args:
+        requests (Iterable): (date, items) pairs, where items are dicts with 'item_name' and
+                             'quantity' or (item_name, quantity) pairs.
+    """
+
+    def __init__(self, requests: Iterable[Tuple[str, Iterable]]):
+        self.dates: List[str] = []
+        self.lines: List[Tuple[Tuple[str, int], ...]] = []
+        for date, items in requests:
+            self.dates.append(date)
+            self.lines.append(tuple(
+                (item["item_name"], int(item["quantity"])) if isinstance(item, dict) else (item[0], int(item[1]))
+                for item in items
+            ))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_history(cls, records: Iterable) -> "RequestStream":
+        """Build a stream from `HistoryRecord`s, e.g. `RequestHistory.last(n)`, in the order they were processed."""
+        return cls((record.date, record.items) for record in sorted(records, key=lambda record: record.seq))
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "RequestStream":
+        """Read one {"date": ..., "items": [{"item_name": ..., "quantity": ...}]} object per line."""
+        with open(path, encoding="utf-8") as f:
+            return cls((request["date"], request["items"]) for request in map(json.loads, f) if request)
+
+    def compile(self, catalog: Catalog) -> List[Tuple[np.ndarray, np.ndarray, bool, int]]:
+        """
+        Per request: catalog indices and quantities of the stocked lines, whether any line is
+        not in the catalog, and the total quantity requested.
+        """
+        compiled = []
+        for lines in self.lines:
+            indices = [catalog.index[item_name] for item_name, _ in lines if item_name in catalog.index]
+            quantities = [quantity for item_name, quantity in lines if item_name in catalog.index]
+            compiled.append((
+                np.asarray(indices, dtype=np.intp),
+                np.asarray(quantities, dtype=np.int64),
+                len(indices) < len(lines),
+                sum(quantity for _, quantity in lines),
+            ))
+        return compiled
+
+
+class PolicySweep:
+    """
+    A batch of policy configurations, one value per configuration for each parameter.
+
+    Args:
+        **parameters: Arrays of equal length keyed by the names in `POLICY_PARAMETERS`.
+                      Missing parameters take their live value from `default_policy()`.
+    """
+
+    def __init__(self, **parameters: Sequence[float]):
+        unknown = set(parameters) - set(POLICY_PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown policy parameters: {', '.join(sorted(unknown))}")
+
+        sizes = {len(values) for values in parameters.values()}
+        if len(sizes) > 1:
+            raise ValueError("All policy parameters must have one value per configuration")
+        size = sizes.pop() if sizes else 1
+
+        defaults = default_policy()
+        self.parameters = {
+            name: np.asarray(parameters[name], dtype=np.float64) if name in parameters
+            else np.full(size, defaults[name], dtype=np.float64)
+            for name in POLICY_PARAMETERS
+        }
+
+    def __len__(self) -> int:
+        return len(self.parameters["discount_rate"])
+
+    @classmethod
+    def grid(cls, **axes: Sequence[float]) -> "PolicySweep":
+        """Every combination of the given parameter values."""
+        names = list(axes)
+        combinations = list(product(*(axes[name] for name in names)))
+        return cls(**{name: [combination[i] for combination in combinations] for i, name in enumerate(names)})
+
+
+class SimulationResult:
+    """
+    Outcome per configuration of a `simulate` run. Every attribute is an array with one
+    entry per configuration, aligned with the sweep's parameters.
+    """
+
+    METRICS = (
+        "final_cash", "inventory_value", "total_assets", "revenue", "reorder_spend",
+        "fill_rate", "orders_filled", "stockouts", "reorders", "reorders_declined",
+    )
+
+    def __init__(self, parameters: Dict[str, np.ndarray], **metrics: np.ndarray):
+        self.parameters = parameters
+        for name in self.METRICS:
+            setattr(self, name, metrics[name])
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return {**self.parameters, **{name: getattr(self, name) for name in self.METRICS}}
+
+    def to_dataframe(self):
+        """
+        Returns:
+            pd.DataFrame: One row per configuration, with its parameters and metrics.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.to_dict())
+
+
+def simulate(
+    catalog: Catalog,
+    requests: Union[RequestStream, Iterable[Tuple[str, Iterable]]],
+    sweep: Optional[PolicySweep] = None,
+) -> SimulationResult:
+    """
+    Replay `requests` through quoting, sales and reordering under every policy in `sweep`.
+
+    Per request, for every configuration at once:
+    - the quote is priced, with the volume discount if the total requested quantity is above
+      the threshold, and is only filled if every line is stocked and in stock,
+    - a filled order is sold: stock goes down and the discounted revenue is added to cash,
+    - every item at or below its minimum level is reordered, in catalog order, with
+      `max(reorder_min_quantity, min_level * reorder_level_multiplier - stock)` units,
+      unless the cash balance cannot cover it.
+
+    Args:
+        catalog (Catalog): Items, prices and starting position.
+        requests (RequestStream or Iterable): Pre-extracted requests, in processing order.
+        sweep (PolicySweep, optional): Configurations to evaluate. Default is the live policy.
+
+    Returns:
+        SimulationResult: Final cash, inventory value, fill rate, stockouts and more per configuration.
+    """
+    if not isinstance(requests, RequestStream):
+        requests = RequestStream(requests)
+    sweep = sweep or PolicySweep()
+    policy = sweep.parameters
+    configurations = len(sweep)
+
+    stock = np.tile(catalog.initial_stock, (configurations, 1))
+    cash = np.full(configurations, catalog.initial_cash)
+    revenue = np.zeros(configurations)
+    reorder_spend = np.zeros(configurations)
+    orders_filled = np.zeros(configurations, dtype=np.int64)
+    stockouts = np.zeros(configurations, dtype=np.int64)
+    reorders = np.zeros(configurations, dtype=np.int64)
+    reorders_declined = np.zeros(configurations, dtype=np.int64)
+
+    discount_factor = 1 - policy["discount_rate"]
+    reorder_min_quantity = policy["reorder_min_quantity"].astype(np.int64)
+    reorder_targets = np.ceil(np.outer(policy["reorder_level_multiplier"], catalog.min_stock_levels)).astype(np.int64)
+
+    for indices, quantities, has_unknown_items, total_quantity in requests.compile(catalog):
+        # Quote: every line is checked against the stock on hand before the order
+        # (the inventory snapshot the agents read leaves out items with no positive stock)
+        short = np.maximum(stock[:, indices], 0) < quantities
+        stockouts += short.sum(axis=1)
+        filled = ~short.any(axis=1) if not has_unknown_items else np.zeros(configurations, dtype=bool)
+
+        # Order: sell every line of a fully available quote
+        if len(indices):
+            gross = float(np.dot(catalog.unit_prices[indices], quantities))
+            sale = np.where(filled, gross * np.where(total_quantity > policy["discount_threshold"], discount_factor, 1.0), 0.0)
+            cash += sale
+            revenue += sale
+            for index, quantity in zip(indices, quantities):
+                stock[:, index] -= filled * quantity
+        orders_filled += filled
+
+        # Reorder: items at or below their minimum level, one at a time so each sees the remaining cash
+        for index in np.flatnonzero((stock <= catalog.min_stock_levels).any(axis=0)):
+            level = np.maximum(stock[:, index], 0)
+            due = level <= catalog.min_stock_levels[index]
+            quantity = np.maximum(reorder_min_quantity, reorder_targets[:, index] - level)
+            cost = catalog.unit_prices[index] * quantity
+            placed = due & (cash >= cost)
+            cash -= np.where(placed, cost, 0.0)
+            reorder_spend += np.where(placed, cost, 0.0)
+            stock[:, index] += placed * quantity
+            reorders += placed
+            reorders_declined += due & ~placed
+
+    inventory_value = stock @ catalog.unit_prices
+    return SimulationResult(
+        policy,
+        final_cash=cash,
+        inventory_value=inventory_value,
+        total_assets=cash + inventory_value,
+        revenue=revenue,
+        reorder_spend=reorder_spend,
+        fill_rate=orders_filled / max(len(requests), 1),
+        orders_filled=orders_filled,
+        stockouts=stockouts,
+        reorders=reorders,
+        reorders_declined=reorders_declined,
+    )
@@ -0,0 +1,157 @@
+"""
+Lazily evaluated dependency graphs of processing steps.
+
+A `StepGraph` declares named steps and the inputs or other steps each one needs. A
+`StepRun` evaluates a step only when its value is first asked for, after the steps it
+depends on, and at most once, so declared steps that nothing consumes cost nothing:
+
+    graph = StepGraph()
+    graph.add("items", extract_items, requires=("request",))
+    graph.add("context", extract_context, requires=("request", "job_type"))
+    graph.add("quote", build_quote, requires=("items", "date", "context"))
+
+    run = graph.start(request=text, job_type="office manager", date="2025-04-07")
+    run["quote"]    # runs items and context concurrently, then quote
+
+When a step needs several dependencies that have not been computed yet and do not depend
+on each other, all but one run on a shared thread pool while the last runs in the calling
+thread. `prefetch` starts independent steps the same way ahead of a consumer that may
+need them. Steps receive their dependencies as keyword arguments.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# Threads shared by every step graph for running independent steps concurrently
+MAX_STEP_THREADS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_STEP_THREADS, thread_name_prefix="step")
+    return _executor
+
+
+class Step:
+    """A named function and the inputs or steps whose values it takes as keyword arguments."""
+
+    __slots__ = ("name", "func", "requires")
+
+    def __init__(self, name: str, func: Callable[..., Any], requires: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.requires: Tuple[str, ...] = tuple(requires)
+
+
+class StepGraph:
+    """
+    Declared steps of a pipeline.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, Step] = {}
+
+    def add(self, name: str, func: Callable[..., Any], requires: Sequence[str] = ()) -> "StepGraph":
+        """
+        Declare a step.
+
+        Args:
+            name (str): Name under which its value is read, and by which other steps require it.
+            func (Callable): Called with one keyword argument per required name.
+            requires (Sequence[str], optional): Inputs or steps the step depends on.
+
+        Raises:
+            ValueError: If a step with that name exists or a required step would form a cycle.
+        """
+        if name in self.steps:
+            raise ValueError(f"Step {name!r} is already declared")
+        if name in requires or any(self._depends_on(required, name) for required in requires):
+            raise ValueError(f"Step {name!r} would depend on itself")
+        self.steps[name] = Step(name, func, requires)
+        return self
+
+    def _depends_on(self, name: str, target: str) -> bool:
+        step = self.steps.get(name)
+        return step is not None and (target in step.requires or any(self._depends_on(r, target) for r in step.requires))
+
+    def start(self, **inputs: Any) -> "StepRun":
+        """
+        Begin an evaluation with the given inputs. An input named like a step replaces that step.
+        """
+        return StepRun(self, inputs)
+
+
+class StepRun:
+    """
+    One evaluation of a `StepGraph`; read step values with `run[name]`.
+    """
+
+    def __init__(self, graph: StepGraph, inputs: Dict[str, Any]):
+        self.graph = graph
+        self._values: Dict[str, Any] = dict(inputs)
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        """Whether the value of `name` is available without running anything."""
+        return name in self._values
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+
+        with self._lock:
+            future = self._pending.get(name)
+            owner = future is None
+            if owner:
+                if name not in self.graph.steps:
+                    raise KeyError(f"No input or step named {name!r}")
+                future = self._pending[name] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            step = self.graph.steps[name]
+            self._evaluate(step.requires)
+            value = step.func(**{required: self._values[required] for required in step.requires})
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                del self._pending[name]
+            raise
+        self._values[name] = value
+        future.set_result(value)
+        return value
+
+    def prefetch(self, *names: str) -> None:
+        """Start computing `names` concurrently; their values are read later with `run[name]`."""
+        self._evaluate(names, wait=False)
+
+    def _evaluate(self, names: Sequence[str], wait: bool = True) -> None:
+        missing = [name for name in names if name not in self._values]
+        if not missing:
+            return
+        if len(missing) == 1 and wait:
+            self[missing[0]]
+            return
+
+        executor = _get_executor()
+        inline = missing[-1] if wait else None
+        # Steps on other threads see the caller's context variables, e.g. its unit of work
+        futures = [
+            executor.submit(contextvars.copy_context().run, self.__getitem__, name)
+            for name in missing if name != inline
+        ]
+        if inline is not None:
+            self[inline]
+        if wait:
+            for future in futures:
+                future.result()
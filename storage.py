@@ -0,0 +1,399 @@
+"""
+Pluggable storage for the ledger and the catalog.
+
+The helpers in `project_starter` read and write through the storage backend returned by
+`get_data_access()`, which `use_storage` selects:
+
+- "sqlite" (`DataAccess`): every transaction is committed to the database file as it is made.
+- "memory" (`MemoryLedger`): the catalog and the transactions are loaded from the database
+  into NumPy column arrays, and every ledger read and write is served from memory. Dates are
+  held as integer day numbers (see `ledger_dates`), and each item keeps an index of its
+  transaction days in sorted order with running net units, so an as-of stock read is one
+  binary search over integers. `flush()` writes the transactions recorded since
+  the load (or the last flush) back to the database, replacing any rolled back since.
+
+Both backends answer the same queries with the same results: dates are compared as day
+numbers, as in SQLite's `transaction_day` column, and sums are accumulated in transaction order. Ad-hoc SQL (`query`, e.g. the
+quote history search) always runs against the database file.
+
+    ledger = open_storage("memory", "munder_difflin.db")
+    ledger.insert_transaction("A4 paper", "sales", 100, 5.0, "2025-04-07")
+    ledger.stock_level("A4 paper", "2025-04-07")
+    ledger.flush()
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from data_access import DataAccess
+from ledger_dates import day_number, iso_dates
+
+STORAGE_BACKENDS = ("sqlite", "memory")
+
+# Transaction types stored in column arrays as their position in this tuple
+TRANSACTION_TYPES = ("stock_orders", "sales")
+_STOCK_ORDER, _SALE = 0, 1
+
+
+class StorageBackend(Protocol):
+    """The queries every storage backend answers."""
+
+    database_path: str
+
+    def stock_level(self, item_name: str, as_of_date: str) -> int: ...
+    def stock_levels(self, as_of_date: str) -> Dict[str, int]: ...
+    def cash_balance(self, as_of_date: str) -> float: ...
+    def insert_transaction(
+        self, item_name: Optional[str], transaction_type: str, quantity: Optional[int], price: float, date_str: str
+    ) -> int: ...
+    def insert_transactions(
+        self, rows: List[Tuple[Optional[str], str, Optional[int], float, str]], validate: Optional[Callable[[], None]] = None
+    ) -> List[int]: ...
+    def max_transaction_id(self) -> int: ...
+    def transactions_after(self, transaction_id: int) -> List[Tuple]: ...
+    def delete_transactions_after(self, transaction_id: int) -> int: ...
+    def delete_transactions(self, transaction_ids: List[int]) -> int: ...
+    def unit_price(self, item_name: str) -> Optional[float]: ...
+    def inventory_items(self) -> List[Tuple[str, str, float, int, int]]: ...
+    def top_sellers(self, as_of_date: str, limit: int = 5) -> List[Dict]: ...
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict]: ...
+    def flush(self) -> int: ...
+    def close(self) -> None: ...
+
+
+def open_storage(backend: str, database_path: str) -> StorageBackend:
+    """
+    Open a storage backend over the SQLite database at `database_path`.
+
+    Args:
+        backend (str): One of 'sqlite' or 'memory'.
+        database_path (str): The database file; the memory backend loads from and flushes to it.
+
+    Raises:
+        ValueError: If `backend` is not supported.
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported storage backend {backend!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
+    data_access = DataAccess(database_path)
+    return MemoryLedger(data_access) if backend == "memory" else data_access
+
+
+class _DateIndex:
+    """Rows of one item ordered by transaction day, with the running net units."""
+
+    __slots__ = ("rows", "days", "totals", "counted", "stale")
+
+    def __init__(self):
+        self.rows: List[int] = []
+        self.days: Optional[np.ndarray] = None
+        self.totals: Optional[np.ndarray] = None
+        # Running count of rows with units, which SQL's SUM does not skip
+        self.counted: Optional[np.ndarray] = None
+        self.stale = True
+
+
+class MemoryLedger:
+    """
+    In-memory ledger with column arrays, loaded from and flushed to a SQLite database.
+
+    Args:
+        backing (DataAccess): The database to load the catalog and transactions from, and to flush to.
+    """
+
+    def __init__(self, backing: DataAccess):
+        self.backing = backing
+        self.database_path = backing.database_path
+        # Agents, steps and warehouse fan-out read from several threads
+        self._lock = threading.RLock()
+        self.reload()
+
+    def reload(self) -> None:
+        """Discard everything held in memory and load the catalog and transactions from the database."""
+        catalog = self.backing.inventory_items()
+        rows = self.backing.transactions_after(0)
+        with self._lock:
+            self._catalog = list(catalog)
+            self._unit_prices = {item_name: unit_price for item_name, _, unit_price, _, _ in self._catalog}
+            self._item_names: List[Optional[str]] = []
+            self._item_codes: Dict[str, int] = {}
+            self._indexes: Dict[int, _DateIndex] = {}
+            # Item codes in item name order, the order SQL's GROUP BY returns them in
+            self._name_order: List[int] = []
+            self._by_date: Optional[Tuple[np.ndarray, ...]] = None
+            self._size = 0
+            self._allocate(max(2 * len(rows), 1024))
+            for row in rows:
+                self._append(*row)
+            self._flushed_id = self.max_transaction_id()
+
+    def _allocate(self, capacity: int) -> None:
+        size = self._size
+        columns = {
+            "_ids": np.int64, "_items": np.int32, "_types": np.int8, "_units": np.int64,
+            "_units_null": np.bool_, "_prices": np.float64, "_days": np.int32,
+        }
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if size:
+                column[:size] = getattr(self, name)[:size]
+            setattr(self, name, column)
+
+    def _append(
+        self,
+        transaction_id: int,
+        item_name: Optional[str],
+        transaction_type: str,
+        units: Optional[int],
+        price: float,
+        date_str: str,
+    ) -> None:
+        day = day_number(date_str)
+        if self._size == len(self._ids):
+            self._allocate(2 * len(self._ids))
+
+        item = -1
+        if item_name is not None:
+            item = self._item_codes.get(item_name)
+            if item is None:
+                item = self._item_codes[item_name] = len(self._item_names)
+                self._item_names.append(item_name)
+                self._indexes[item] = _DateIndex()
+                self._name_order = sorted(self._item_codes.values(), key=self._item_names.__getitem__)
+
+        row = self._size
+        self._ids[row] = transaction_id
+        self._items[row] = item
+        self._types[row] = TRANSACTION_TYPES.index(transaction_type)
+        self._units[row] = units or 0
+        self._units_null[row] = units is None
+        self._prices[row] = price
+        self._days[row] = day
+        self._size += 1
+        self._by_date = None
+
+        if item >= 0:
+            index = self._indexes[item]
+            index.rows.append(row)
+            index.stale = True
+
+    def _date_index(self, item: int) -> _DateIndex:
+        index = self._indexes[item]
+        if index.stale:
+            rows = np.array(index.rows, dtype=np.int64)
+            days = self._days[rows]
+            order = np.argsort(days, kind="stable")
+            index.days = days[order]
+            index.totals = np.cumsum(self._stock_deltas(rows)[order])
+            index.counted = np.cumsum(~self._units_null[rows][order])
+            index.stale = False
+        return index
+
+    def _ledger_by_date(self) -> Tuple[np.ndarray, ...]:
+        # All rows ordered by date: days, item codes shifted by one (0 for no item),
+        # net units and whether the row has units
+        if self._by_date is None:
+            rows = np.argsort(self._days[:self._size], kind="stable")
+            self._by_date = (
+                self._days[rows], self._items[rows] + 1, self._stock_deltas(rows), ~self._units_null[rows],
+            )
+        return self._by_date
+
+    def _stock_deltas(self, rows: np.ndarray) -> np.ndarray:
+        types = self._types[rows]
+        units = self._units[rows]
+        return np.where(types == _STOCK_ORDER, units, np.where(types == _SALE, -units, 0))
+
+    def _level(self, item: int, as_of_date: str) -> Tuple[int, Optional[int]]:
+        # (rows on or before the date, net units or None if none of them has units)
+        index = self._date_index(item)
+        count = int(np.searchsorted(index.days, day_number(as_of_date), side="right"))
+        if not count or not index.counted[count - 1]:
+            return count, None
+        return count, int(index.totals[count - 1])
+
+    def stock_level(self, item_name: str, as_of_date: str) -> int:
+        """Net units of `item_name` on or before `as_of_date`."""
+        with self._lock:
+            item = self._item_codes.get(item_name)
+            units = None if item is None else self._level(item, as_of_date)[1]
+        return units or 0
+
+    def stock_levels(self, as_of_date: str) -> Dict[str, int]:
+        """Net units of every item with at least one transaction, including zero or negative stock."""
+        levels = {}
+        with self._lock:
+            days, items, deltas, has_units = self._ledger_by_date()
+            count = int(np.searchsorted(days, day_number(as_of_date), side="right"))
+            slots = len(self._item_names) + 1
+            rows = np.bincount(items[:count], minlength=slots)
+            with_units = np.bincount(items[:count], weights=has_units[:count], minlength=slots)
+            units = np.bincount(items[:count], weights=deltas[:count], minlength=slots)
+            for item in self._name_order:
+                if rows[item + 1]:
+                    levels[self._item_names[item]] = int(units[item + 1]) if with_units[item + 1] else None
+        return levels
+
+    def cash_balance(self, as_of_date: str) -> float:
+        """Sales revenue minus stock purchase costs on or before `as_of_date`."""
+        with self._lock:
+            size = self._size
+            rows = np.flatnonzero(self._days[:size] <= day_number(as_of_date))
+            types = self._types[rows]
+            prices = self._prices[rows]
+            cash = np.where(types == _SALE, prices, np.where(types == _STOCK_ORDER, -prices, 0.0))
+        # A running sum adds in transaction order, like SQLite's SUM
+        return float(np.cumsum(cash)[-1]) if len(cash) else 0.0
+
+    def insert_transaction(
+        self,
+        item_name: Optional[str],
+        transaction_type: str,
+        quantity: Optional[int],
+        price: float,
+        date_str: str,
+    ) -> int:
+        """Record one transaction and return its ID."""
+        with self._lock:
+            transaction_id = self.max_transaction_id() + 1
+            self._append(transaction_id, item_name, transaction_type, quantity, price, date_str)
+        return transaction_id
+
+    def insert_transactions(
+        self,
+        rows: List[Tuple[Optional[str], str, Optional[int], float, str]],
+        validate: Optional[Callable[[], None]] = None,
+    ) -> List[int]:
+        """
+        Record several transactions together and return their IDs.
+
+        Args:
+            rows (List[Tuple]): (item_name, transaction_type, quantity, price, date_str) per transaction.
+            validate (Callable, optional): Called once they are recorded; if it raises, none of them is kept.
+        """
+        with self._lock:
+            before = self.max_transaction_id()
+            transaction_ids = [self.insert_transaction(*row) for row in rows]
+            if validate is not None:
+                try:
+                    validate()
+                except BaseException:
+                    self.delete_transactions_after(before)
+                    raise
+        return transaction_ids
+
+    def max_transaction_id(self) -> int:
+        """The largest transaction ID, or 0 if the ledger is empty."""
+        with self._lock:
+            return int(self._ids[self._size - 1]) if self._size else 0
+
+    def transactions_after(self, transaction_id: int) -> List[Tuple]:
+        """(id, item_name, transaction_type, units, price, transaction_date) of every transaction with an ID above `transaction_id`."""
+        with self._lock:
+            start = int(np.searchsorted(self._ids[:self._size], transaction_id, side="right"))
+            dates = iso_dates(self._days[start:self._size]).tolist()
+            return [
+                (
+                    int(self._ids[row]),
+                    self._item_names[self._items[row]] if self._items[row] >= 0 else None,
+                    TRANSACTION_TYPES[self._types[row]],
+                    None if self._units_null[row] else int(self._units[row]),
+                    float(self._prices[row]),
+                    date,
+                )
+                for row, date in zip(range(start, self._size), dates)
+            ]
+
+    def delete_transactions_after(self, transaction_id: int) -> int:
+        """Delete every transaction with an ID above `transaction_id` and return how many were removed."""
+        with self._lock:
+            keep = int(np.searchsorted(self._ids[:self._size], transaction_id, side="right"))
+            removed = self._size - keep
+            if removed:
+                self._size = keep
+                self._by_date = None
+                for index in self._indexes.values():
+                    if index.rows and index.rows[-1] >= keep:
+                        index.rows = [row for row in index.rows if row < keep]
+                        index.stale = True
+            # The next flush removes them from the database as well
+            self._flushed_id = min(self._flushed_id, transaction_id)
+        return removed
+
+    def delete_transactions(self, transaction_ids: List[int]) -> int:
+        """
+        Delete the given transactions, in memory and in the database, and return how many were removed.
+
+        Pending transactions are flushed first and the ledger is then reloaded from the database.
+        """
+        with self._lock:
+            self.flush()
+            removed = self.backing.delete_transactions(transaction_ids)
+            self.reload()
+        return removed
+
+    def unit_price(self, item_name: str) -> Optional[float]:
+        """Catalog unit price of `item_name`, or None if the item is not stocked."""
+        return self._unit_prices.get(item_name)
+
+    def inventory_items(self) -> List[Tuple[str, str, float, int, int]]:
+        """(item_name, category, unit_price, current_stock, min_stock_level) for every stocked item."""
+        return list(self._catalog)
+
+    def top_sellers(self, as_of_date: str, limit: int = 5) -> List[Dict]:
+        """Best-selling items by revenue on or before `as_of_date`; a negative `limit` returns all."""
+        totals: Dict[int, List] = {}
+        with self._lock:
+            size = self._size
+            rows = np.flatnonzero((self._types[:size] == _SALE) & (self._days[:size] <= day_number(as_of_date)))
+            # Summed in date order, as SQLite reads them through the (item_name, transaction_day) index
+            rows = rows[np.argsort(self._days[rows], kind="stable")]
+            for row in rows.tolist():
+                entry = totals.setdefault(int(self._items[row]), [None, 0.0])
+                if not self._units_null[row]:
+                    entry[0] = (entry[0] or 0) + int(self._units[row])
+                entry[1] += float(self._prices[row])
+            item_names = list(self._item_names)
+
+        # Grouped by item name, as the SQL GROUP BY does, then ranked by revenue
+        sellers = sorted(
+            ((item_names[item] if item >= 0 else None, units, revenue) for item, (units, revenue) in totals.items()),
+            key=lambda seller: (seller[0] is not None, seller[0] or ""),
+        )
+        sellers.sort(key=lambda seller: seller[2], reverse=True)
+        if limit >= 0:
+            sellers = sellers[:limit]
+        return [
+            {"item_name": item_name, "total_units": units, "total_revenue": revenue}
+            for item_name, units, revenue in sellers
+        ]
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """
+        Run an ad-hoc query against the database file and return its rows as dicts.
+
+        Transactions recorded in memory are only visible to it after `flush()`.
+        """
+        return self.backing.query(sql, params)
+
+    def flush(self) -> int:
+        """
+        Write the transactions recorded since the load or the last flush to the database.
+
+        Transactions rolled back in memory are removed from the database too, so afterwards
+        its ledger matches the one in memory.
+
+        Returns:
+            int: The number of transactions written.
+        """
+        with self._lock:
+            rows = self.transactions_after(self._flushed_id)
+            self.backing.replace_transactions_after(self._flushed_id, rows)
+            self._flushed_id = self.max_transaction_id()
+        return len(rows)
+
+    def close(self) -> None:
+        """Close the calling thread's database connection; unflushed transactions stay in memory."""
+        self.backing.close()
+
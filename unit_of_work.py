@@ -0,0 +1,127 @@
+"""
+Request-scoped read cache.
+
+A `UnitOfWork` spans one customer request: `process_request` and, in the batch runner,
+the financial report read right after it. While one is active, the `DataAccess` read
+queries decorated with `unit_of_work_read` run at most once per distinct arguments:
+
+- catalog reads (`inventory_items`, `unit_price`) for the whole unit of work, since
+  transactions never change the catalog,
+- ledger reads (stock levels, cash balance) per ledger version, so a write made during
+  the request is always seen by the reads after it.
+
+The active unit of work lives in a context variable, so it reaches every agent and tool
+called inside it without being passed explicitly, including steps that `step_graph` and
+`scheduler` run on other threads. It is discarded when the outermost scope ends:
+
+    with unit_of_work(version=get_ledger_version):
+        response = orchestrator.process_request(...)
+        report = generate_financial_report(date)
+
+Outside a unit of work the decorated reads always query the database.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """
+    Read cache of one unit of work.
+
+    Args:
+        version (Callable, optional): Returns the current ledger version; ledger reads are
+                                      cached per version. Default treats the ledger as unchanging.
+    """
+
+    def __init__(self, version: Optional[Callable[[], Any]] = None):
+        self.version = version or (lambda: None)
+        self.reads: Dict[Any, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self.closed = False
+
+    def read(self, key: Any, loader: Callable[[], Any], ledger: bool = True) -> Any:
+        """
+        The cached value of `key`, loading it with `loader` on the first read.
+
+        Args:
+            key: Identifies the read, e.g. (query name, arguments).
+            loader (Callable): Runs the read.
+            ledger (bool, optional): Whether the value depends on ledger transactions. Default is True.
+        """
+        if self.closed:
+            return loader()
+
+        version = self.version() if ledger else None
+        try:
+            value = self.reads[key, version]
+        except KeyError:
+            self.misses += 1
+            value = loader()
+            # Keep the value only if no write happened while reading it
+            if not ledger or self.version() == version:
+                self.reads[key, version] = value
+            return value
+        self.hits += 1
+        return value
+
+    def commit(self) -> None:
+        """End the unit of work and discard its cache."""
+        self.closed = True
+        self.reads.clear()
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    """The active unit of work, or None outside one."""
+    return _current.get()
+
+
+@contextmanager
+def unit_of_work(version: Optional[Callable[[], Any]] = None) -> Iterator[UnitOfWork]:
+    """
+    Run the block in a unit of work, or join the one already active.
+
+    Args:
+        version (Callable, optional): Ledger version source for a new unit of work (see `UnitOfWork`).
+    """
+    active = _current.get()
+    if active is not None and not active.closed:
+        yield active
+        return
+
+    work = UnitOfWork(version)
+    token = _current.set(work)
+    try:
+        yield work
+    finally:
+        _current.reset(token)
+        work.commit()
+
+
+def unit_of_work_read(ledger: bool = True) -> Callable:
+    """
+    Cache a `DataAccess` read method's result in the active unit of work, keyed by the
+    database, the method's name and its arguments.
+
+    Args:
+        ledger (bool, optional): Whether the result depends on ledger transactions, and so is
+                                 cached per ledger version. Default is True.
+    """
+    def decorator(method: Callable) -> Callable:
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            work = _current.get()
+            if work is None:
+                return method(self, *args)
+            return work.read((self.database_path, name, args), lambda: method(self, *args), ledger=ledger)
+
+        return wrapper
+
+    return decorator
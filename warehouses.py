@@ -0,0 +1,269 @@
+"""
+Multi-warehouse inventory partitioned into one SQLite file per fulfillment site.
+
+With a single ledger, stock is one pool and every write takes the same SQLite write
+lock. `WarehouseNetwork` splits the ledger by site: each site has its own database
+file holding its `transactions` and its share of the `inventory` minimum levels, so
+sites are written concurrently and each partition stays small. The main database keeps
+the catalog, the quote history and the request log.
+
+Reads fan out to every site in parallel and are merged: total stock per item, the
+company cash balance (cash moves with the sales and stock orders booked at each site),
+top sellers. Quotes source each line from the best site, i.e. the one with the most
+stock that can ship the whole line, and split a line across sites only when no single
+site can; each sale is then booked at the site it ships from. Reorders are checked for
+the network as a whole, as on a single ledger, and each stock order is split across the
+sites by how far each is below its own reorder target.
+
+    network = WarehouseNetwork.partition(get_data_access(), {"east": 0.5, "west": 0.3, "central": 0.2})
+    network.site_stock_levels("2025-04-07")["east"]["A4 paper"]
+"""
+
+import contextvars
+import math
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from data_access import DataAccess
+from ledger_dates import day_number
+
+# Site database files are created here, named munder_difflin_<site>.db
+WAREHOUSE_DIR = "warehouses"
+
+_SITE_SCHEMA = """
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT, transaction_type TEXT, units INTEGER, price REAL, transaction_date TEXT,
+        transaction_day INTEGER
+    );
+    CREATE INDEX idx_transactions_item_day ON transactions (item_name, transaction_day);
+    CREATE TABLE inventory (
+        item_name TEXT, category TEXT, unit_price REAL, current_stock INTEGER, min_stock_level INTEGER
+    );
+"""
+
+T = TypeVar("T")
+
+
+def parse_warehouse_shares(spec: str) -> Dict[str, float]:
+    """
+    Parse 'east=0.5,west=0.3,central=0.2' (or 'east,west' for equal shares) into site shares.
+
+    Raises:
+        ValueError: If a share is not a positive number or a site is listed twice.
+    """
+    shares: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, share = part.strip().partition("=")
+        if not name:
+            continue
+        if name in shares:
+            raise ValueError(f"Warehouse {name!r} is listed twice")
+        shares[name] = float(share) if share else 1.0
+        if shares[name] <= 0:
+            raise ValueError(f"Warehouse {name!r} needs a positive share")
+    return shares
+
+
+def split_units(units: int, shares: Dict[str, float]) -> Dict[str, int]:
+    """Split `units` proportionally to `shares`, handing the remainder to the largest fractions."""
+    total = sum(shares.values())
+    exact = {site: units * share / total for site, share in shares.items()}
+    split = {site: math.floor(value) for site, value in exact.items()}
+    for site in sorted(exact, key=lambda site: split[site] - exact[site])[:units - sum(split.values())]:
+        split[site] += 1
+    return split
+
+
+class WarehouseNetwork:
+    """
+    Fulfillment sites with partitioned ledgers.
+
+    Args:
+        main (DataAccess): The main database, holding the catalog and the quote history.
+        sites (Dict[str, DataAccess]): One ledger partition per site; the first site is the default
+                                       for transactions not booked at a particular site.
+    """
+
+    def __init__(self, main: DataAccess, sites: Dict[str, DataAccess]):
+        if not sites:
+            raise ValueError("A warehouse network needs at least one site")
+        self.main = main
+        self.sites = dict(sites)
+        self.default_site = next(iter(self.sites))
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sites), thread_name_prefix="warehouse")
+
+    @classmethod
+    def partition(
+        cls,
+        main: DataAccess,
+        shares: Dict[str, float],
+        directory: str = WAREHOUSE_DIR,
+    ) -> "WarehouseNetwork":
+        """
+        Create one site database per share from the ledger in `main`, replacing existing ones.
+
+        Every stock order is split across sites by share, as is each item's minimum stock level
+        (rounded up); transactions without an item, such as the starting cash, go to the first site.
+        """
+        os.makedirs(directory, exist_ok=True)
+        catalog = main.inventory_items()
+        transactions = main.transactions_after(0)
+        first_site = next(iter(shares))
+
+        sites = {}
+        for site, share in shares.items():
+            path = os.path.join(directory, f"munder_difflin_{site}.db")
+            for stale in (path, f"{path}-wal", f"{path}-shm"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            conn = sqlite3.connect(path)
+            try:
+                with conn:
+                    conn.executescript(_SITE_SCHEMA)
+                    fraction = share / sum(shares.values())
+                    conn.executemany(
+                        "INSERT INTO inventory VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (item_name, category, unit_price, split_units(stock, shares)[site], math.ceil(min_level * fraction))
+                            for item_name, category, unit_price, stock, min_level in catalog
+                        ],
+                    )
+                    rows = []
+                    for _, item_name, transaction_type, units, price, transaction_date in transactions:
+                        if item_name is None or not units:
+                            if site == first_site:
+                                rows.append((item_name, transaction_type, units, price, transaction_date, day_number(transaction_date)))
+                            continue
+                        site_units = split_units(units, shares)[site]
+                        if site_units:
+                            rows.append((
+                                item_name, transaction_type, site_units, price * site_units / units,
+                                transaction_date, day_number(transaction_date),
+                            ))
+                    conn.executemany(
+                        "INSERT INTO transactions (item_name, transaction_type, units, price, transaction_date, transaction_day) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            finally:
+                conn.close()
+            sites[site] = DataAccess(path)
+        return cls(main, sites)
+
+    def fan_out(self, read: Callable[[DataAccess], T]) -> Dict[str, T]:
+        """Run `read` against every site in parallel and return its result per site."""
+        # Each task runs in the caller's context, so the active unit of work is shared
+        futures = {
+            site: self._executor.submit(contextvars.copy_context().run, read, data_access)
+            for site, data_access in self.sites.items()
+        }
+        return {site: future.result() for site, future in futures.items()}
+
+    def site(self, name: Optional[str]) -> DataAccess:
+        """
+        The ledger partition of site `name`, or of the default site if None.
+
+        Raises:
+            KeyError: If there is no such site.
+        """
+        if name is None:
+            return self.sites[self.default_site]
+        if name not in self.sites:
+            raise KeyError(f"Unknown warehouse {name!r}")
+        return self.sites[name]
+
+    def site_stock_levels(self, as_of_date: str) -> Dict[str, Dict[str, int]]:
+        """Net units per item at each site."""
+        return self.fan_out(lambda data_access: data_access.stock_levels(as_of_date))
+
+    def stock_levels(self, as_of_date: str) -> Dict[str, int]:
+        """Net units per item across all sites."""
+        totals: Dict[str, int] = {}
+        for levels in self.site_stock_levels(as_of_date).values():
+            for item_name, units in levels.items():
+                totals[item_name] = totals.get(item_name, 0) + units
+        return totals
+
+    def stock_level(self, item_name: str, as_of_date: str) -> int:
+        """Net units of `item_name` across all sites."""
+        return sum(self.fan_out(lambda data_access: data_access.stock_level(item_name, as_of_date)).values())
+
+    def cash_balance(self, as_of_date: str) -> float:
+        """Company cash: sales minus stock purchases booked at every site."""
+        return sum(self.fan_out(lambda data_access: data_access.cash_balance(as_of_date)).values())
+
+    def min_stock_levels(self) -> Dict[str, Dict[str, int]]:
+        """Minimum stock level per item at each site."""
+        return self.fan_out(
+            lambda data_access: {item_name: min_level for item_name, _, _, _, min_level in data_access.inventory_items()}
+        )
+
+    def inventory_items(self) -> List[Tuple[str, str, float, int, int]]:
+        """The company catalog, from the main database."""
+        return self.main.inventory_items()
+
+    def unit_price(self, item_name: str) -> Optional[float]:
+        return self.main.unit_price(item_name)
+
+    def insert_transaction(
+        self,
+        item_name: Optional[str],
+        transaction_type: str,
+        quantity: Optional[int],
+        price: float,
+        date_str: str,
+        warehouse: Optional[str] = None,
+    ) -> int:
+        """Book one transaction at `warehouse` (the default site if None) and return its ID there."""
+        return self.site(warehouse).insert_transaction(item_name, transaction_type, quantity, price, date_str)
+
+    def top_sellers(self, as_of_date: str, limit: int = 5) -> List[Dict]:
+        """Best-selling items by revenue across all sites."""
+        totals: Dict[Optional[str], List] = {}
+        # Every site's full ranking is needed to merge them exactly
+        for sellers in self.fan_out(lambda data_access: data_access.top_sellers(as_of_date, -1)).values():
+            for seller in sellers:
+                entry = totals.setdefault(seller["item_name"], [None, 0.0])
+                if seller["total_units"] is not None:
+                    entry[0] = (entry[0] or 0) + seller["total_units"]
+                entry[1] += seller["total_revenue"]
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {"item_name": item_name, "total_units": units, "total_revenue": revenue}
+            for item_name, (units, revenue) in ranked
+        ]
+
+    def source(self, item_name: str, quantity: int, site_levels: Dict[str, Dict[str, int]]) -> Optional[List[Tuple[str, int]]]:
+        """
+        Choose the sites a line ships from and deduct the units from `site_levels`.
+
+        The site with the most stock ships the whole line if it can; otherwise the line is
+        split across sites, largest stock first.
+
+        Returns:
+            List[Tuple[str, int]] or None: (site, units) per shipment, or None if all sites
+                                           together hold fewer than `quantity` units.
+        """
+        stock = {site: max(levels.get(item_name, 0), 0) for site, levels in site_levels.items()}
+        if sum(stock.values()) < quantity:
+            return None
+
+        shipments = []
+        remaining = quantity
+        for site in sorted(stock, key=lambda site: (-stock[site], site)):
+            if remaining <= 0:
+                break
+            units = min(stock[site], remaining)
+            if units:
+                shipments.append((site, units))
+                site_levels[site][item_name] = site_levels[site].get(item_name, 0) - units
+                remaining -= units
+        return shipments
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for data_access in self.sites.values():
+            data_access.close()